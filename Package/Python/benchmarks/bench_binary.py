@@ -0,0 +1,53 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from generators import best_of, generate_records
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary encoding vs Bellande text and json")
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    formatter = Bellande_Format(backend="lexer")
+    data = {"records": generate_records(args.records)}
+    text = formatter.to_bellande_string(data)
+    binary = formatter.dumps_binary(data)
+    encoded_json = json.dumps(data)
+
+    paths = [
+        ("text", len(text.encode("utf-8")), lambda: formatter.to_bellande_string(data),
+         lambda: formatter.parse_content(text)),
+        ("binary", len(binary), lambda: formatter.dumps_binary(data), lambda: formatter.loads_binary(binary)),
+        ("json", len(encoded_json), lambda: json.dumps(data), lambda: json.loads(encoded_json)),
+    ]
+    print(f"{'format':>8} {'size (KB)':>10} {'encode (ms)':>12} {'decode (ms)':>12}")
+    for name, size, encode, decode in paths:
+        print(f"{name:>8} {size / 1024:10.1f} {best_of(encode, args.repeat) * 1000:12.1f} "
+              f"{best_of(decode, args.repeat) * 1000:12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from generators import generate_section_lines
+
+def write_config(path: str, sections: int):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n".join(generate_section_lines(sections)))
+
+def measure(formatter: Bellande_Format, path: str, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        formatter.parse_bellande(path)
+    return (time.perf_counter() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Repeated parse_bellande calls with and without the parse cache")
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.bellande")
+        write_config(path, args.sections)
+
+        formatter = Bellande_Format()
+        print(f"   uncached: {measure(formatter, path, args.calls) * 1e6:10.1f} us/call")
+        formatter.enable_cache()
+        formatter.parse_bellande(path)
+        print(f"     cached: {measure(formatter, path, args.calls) * 1e6:10.1f} us/call")
+        formatter.enable_cache(hash_content=True)
+        formatter.parse_bellande(path)
+        os.utime(path)
+        print(f"hash (touch): {measure(formatter, path, 1) * 1e6:10.1f} us/call")
+        print(formatter.cache_stats())
+
+if __name__ == "__main__":
+    main()
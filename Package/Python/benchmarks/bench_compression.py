@@ -0,0 +1,72 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.core.compression import Compression, DEFAULT_BLOCK_SIZE
+from generators import generate_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Huffman encode/decode throughput")
+    parser.add_argument("--sizes", default="1,16", help="Comma separated sizes in MB, e.g. 1,64,1024")
+    parser.add_argument("--no-numpy", action="store_true")
+    parser.add_argument("--workers", default="", help="Comma separated worker counts for block mode, e.g. 1,2,4,8")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    compression = Compression()
+    if args.no_numpy:
+        compression.use_numpy = False
+    print(f"numpy: {compression.use_numpy}")
+
+    for size_mb in (float(size) for size in args.sizes.split(",")):
+        data = generate_bytes(int(size_mb * 1024 * 1024))
+
+        start = time.perf_counter()
+        encoded, metadata = compression.encode_data(data)
+        encode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoded = compression.decode_data(encoded, metadata)
+        decode_time = time.perf_counter() - start
+
+        assert decoded == data
+        mb = len(data) / (1024 * 1024)
+        print(f"{mb:8.1f} MB  ratio {len(encoded) / len(data):.3f}  "
+              f"encode {mb / encode_time:8.2f} MB/s  decode {mb / decode_time:8.2f} MB/s")
+
+        for workers in (int(count) for count in args.workers.split(",") if count):
+            start = time.perf_counter()
+            blob = compression.compress_blocks(data, block_size=args.block_size, workers=workers)
+            encode_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            decoded = compression.decompress(blob, workers=workers)
+            decode_time = time.perf_counter() - start
+
+            assert decoded == data
+            print(f"{'':8}    blocks, {workers:3d} workers  "
+                  f"encode {mb / encode_time:8.2f} MB/s  decode {mb / decode_time:8.2f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from bellande_parser.core.custom_types import Complex, BinaryData, DateTime, TimeDelta
+from generators import best_of, generate_typed_document
+
+class LinearFormat(Bellande_Format):
+    # Registry scan used before the dispatch cache, kept as the baseline
+    def _format_value(self, value):
+        for type_name, serializer in self.type_registry.serializers.items():
+            try:
+                if isinstance(value, self.type_registry.types[type_name]):
+                    return f"type:{type_name}:{serializer(value)}"
+            except Exception:
+                continue
+        return super()._format_value(value)
+
+    def _process_value(self, value):
+        for type_name, deserializer in self.type_registry.deserializers.items():
+            if value.startswith(f"type:{type_name}:"):
+                return deserializer(value[len(f"type:{type_name}:"):])
+        return super()._process_value(value)
+
+def register_types(formatter: Bellande_Format):
+    for name, helper, type_class in (("complex", Complex(), complex), ("binary", BinaryData(), bytes),
+                                     ("datetime", DateTime(), datetime), ("timedelta", TimeDelta(), timedelta)):
+        formatter.type_registry.register(name, type_class, helper.serialize, helper.deserialize)
+    for i in range(12):
+        extra = type(f"Extra{i}", (), {})
+        formatter.type_registry.register(f"extra{i}", extra, lambda value: "x", lambda text, extra=extra: extra())
+
+def main():
+    parser = argparse.ArgumentParser(description="Custom type dispatch cost on mixed documents")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    document = generate_typed_document(args.records)
+    for label, formatter in (("linear scan", LinearFormat()), ("dispatch cache", Bellande_Format())):
+        register_types(formatter)
+        text = formatter.to_bellande_string(document)
+        write = best_of(lambda: formatter.to_bellande_string(document), args.repeat)
+        parse = best_of(lambda: formatter.parse_content(text), args.repeat)
+        print(f"{label:>15}: serialize {write * 1000:8.1f} ms  parse {parse * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+#!/usr/bin/env python3
+
+import argparse
+import copy
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from bellande_parser.core.diff import apply_patch, diff, merge
+from generators import generate_inventory, timed
+
+def change(document: dict, edits: int, seed: int) -> dict:
+    # A few ports, one inserted and one removed user, each in a copy of only the touched containers
+    rng = random.Random(seed)
+    new = dict(document)
+    new["services"] = dict(document["services"])
+    for _ in range(edits):
+        key = f"service_{rng.randrange(len(new['services']))}"
+        new["services"][key] = dict(new["services"][key], port=rng.randint(1024, 65535))
+    users = list(document["users"])
+    users.insert(rng.randrange(len(users)), {"id": -seed, "name": "new", "role": "user"})
+    users.pop(rng.randrange(len(users)))
+    new["users"] = users
+    return new
+
+def main():
+    parser = argparse.ArgumentParser(description="Patch size and diff/apply/merge time against document size")
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--edits", type=int, default=5)
+    args = parser.parse_args()
+
+    formatter = Bellande_Format(backend="lexer")
+    print(f"{args.edits} edits per side")
+    print(f"{'size':>7} {'document (KB)':>14} {'patch (B)':>10} {'keys':>6} {'diff (ms)':>10} "
+          f"{'apply (ms)':>11} {'merge (ms)':>11}")
+    for size in map(int, args.sizes.split(",")):
+        document = generate_inventory(size, size)
+        ours = change(document, args.edits, 1)
+        theirs = change(document, args.edits, 2)
+        full = len(formatter.to_bellande_string(ours).encode())
+        for keys in (None, "id"):
+            patch, diff_seconds = timed(diff, document, ours, keys)
+            text = formatter.patch_to_bellande(patch)
+            result, apply_seconds = timed(apply_patch, document, formatter.parse_patch(text))
+            assert result == ours
+            (merged, conflicts), merge_seconds = timed(merge, document, ours, theirs, keys)
+            print(f"{size:>7} {full / 1024:14.0f} {len(text.encode()):10} {keys or '-':>6} "
+                  f"{diff_seconds * 1000:10.2f} {apply_seconds * 1000:11.2f} {merge_seconds * 1000:11.2f}")
+
+    # Mostly unchanged lists never reach the LCS, only the changed middle does
+    values = list(range(1000000))
+    edited = copy.copy(values)
+    edited[500000] = -1
+    patch, diff_seconds = timed(diff, values, edited)
+    print(f"1000000 item list, one change: {len(patch)} operation, {diff_seconds * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from generators import generate_flat_document
+
+def main():
+    parser = argparse.ArgumentParser(description="Bellande_Format.encrypt/decrypt throughput")
+    parser.add_argument("--size", type=float, default=1.0, help="Document size in MB")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size for CTR mode")
+    args = parser.parse_args()
+
+    formatter = Bellande_Format()
+    key = formatter.encryption.generate_key()
+    document = generate_flat_document(int(args.size * 1024 * 1024))
+    mb = len(formatter.to_bellande_string(document).encode()) / (1024 * 1024)
+
+    for mode in ("cbc", "ctr"):
+        workers = args.workers if mode == "ctr" else None
+        start = time.perf_counter()
+        encrypted = formatter.encrypt(document, key, mode, workers)
+        encrypt_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decrypted = formatter.decrypt(encrypted, key, mode, workers)
+        decrypt_time = time.perf_counter() - start
+
+        assert decrypted == document
+        print(f"{mode}: {mb:.2f} MB  encrypt {mb / encrypt_time:6.2f} MB/s  decrypt {mb / decrypt_time:6.2f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import copy
+import hashlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.core.types import BellandeValue
+from generators import generate_services
+
+class FullCopyValue:
+    # Previous scheme: old and new values in every version, checksum over str(value)
+    def __init__(self, value):
+        self.value = value
+        self.history = []
+        self.checksum = hashlib.sha256(str(value).encode()).hexdigest()
+
+    def update(self, new_value, author):
+        old_value = self.value
+        self.value = new_value
+        self.checksum = hashlib.sha256(str(new_value).encode()).hexdigest()
+        self.history.append((author, {"old": old_value, "new": new_value}, self.checksum))
+
+def edits(document: dict, count: int, seed: int = 1):
+    # Each edit is a new document with one leaf changed, as callers of update build it
+    rng = random.Random(seed)
+    current = document
+    for _ in range(count):
+        key = f"service_{rng.randrange(len(current))}"
+        current = dict(current)
+        current[key] = copy.deepcopy(current[key])
+        current[key]["port"] = rng.randint(1024, 65535)
+        yield current, key, current[key]["port"]
+
+def apply_edits(value, document, count, use_set):
+    for new_document, key, port in edits(document, count):
+        if use_set:
+            value.set((key, "port"), port, "bench")
+        else:
+            value.update(new_document, "bench")
+
+def run(factory, document, count, use_set=False):
+    # Timed without tracemalloc, which slows allocation heavy schemes unevenly, memory in a second pass
+    value = factory(copy.deepcopy(document))
+    start = time.perf_counter()
+    apply_edits(value, document, count, use_set)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        traced = factory(copy.deepcopy(document))
+        baseline = tracemalloc.get_traced_memory()[0]
+        apply_edits(traced, document, count, use_set)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return value, seconds, retained
+
+def main():
+    parser = argparse.ArgumentParser(description="Version history cost per edit, full copies vs deltas")
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--edits", type=int, default=500)
+    parser.add_argument("--snapshot-interval", type=int, default=32)
+    parser.add_argument("--max-versions", type=int, default=None)
+    args = parser.parse_args()
+
+    document = generate_services(args.sections)
+    print(f"{args.sections} sections, {args.edits} edits")
+    print(f"{'scheme':>12} {'per edit (ms)':>14} {'history (MB)':>13}")
+    cases = [("full copy", lambda value: FullCopyValue(value), False),
+             ("delta", lambda value: BellandeValue(value, snapshot_interval=args.snapshot_interval,
+                                                   max_versions=args.max_versions), False),
+             ("delta set", lambda value: BellandeValue(value, snapshot_interval=args.snapshot_interval,
+                                                       max_versions=args.max_versions), True)]
+    for label, factory, use_set in cases:
+        value, seconds, retained = run(factory, document, args.edits, use_set)
+        print(f"{label:>12} {seconds / args.edits * 1000:14.3f} {retained / 1024 / 1024:13.1f}")
+
+    value = run(cases[1][1], document, args.edits)[0]
+    for version in (value.history.first_version, (value.history.first_version + value.version) // 2,
+                    value.version - 1):
+        start = time.perf_counter()
+        value.value_at(version)
+        print(f"value_at({version}): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
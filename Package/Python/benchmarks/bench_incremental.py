@@ -0,0 +1,53 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from generators import generate_section_lines, timed
+
+def main():
+    parser = argparse.ArgumentParser(description="Full re-parse vs incremental update after a one line edit")
+    parser.add_argument("--sections", type=int, default=20000)
+    args = parser.parse_args()
+
+    formatter = Bellande_Format(backend="lexer")
+    lines = generate_section_lines(args.sections)
+    edited = list(lines)
+    target = len(lines) // 2 + 1
+    edited[target] = "  id: -1"
+    print(f"lines: {len(lines):,}")
+
+    full = timed(formatter.parse_lines, edited)[1]
+    print(f"      full parse: {full * 1000:8.2f} ms")
+
+    document = formatter.parse_incremental("\n".join(lines))
+    changes, edit = timed(document.apply_edits, [(target, target + 1, [edited[target]])])
+    print(f"     apply_edits: {edit * 1000:8.2f} ms  changed: {changes}")
+
+    document = formatter.parse_incremental("\n".join(lines))
+    content = "\n".join(edited)
+    diffed = timed(document.update, content)[1]
+    print(f"update (diffed): {diffed * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
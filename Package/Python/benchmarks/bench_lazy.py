@@ -0,0 +1,56 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from generators import generate_section_lines, timed
+
+def write_document(path: str, sections: int):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n".join(generate_section_lines(sections, values=20)))
+        file.write("\nsettings:\n  max_retries: 3\n  timeout: 1.5\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Full parse vs lazy access of a single key")
+    parser.add_argument("--sections", type=int, default=20000)
+    args = parser.parse_args()
+
+    formatter = Bellande_Format(backend="lexer")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "large.bellande")
+        write_document(path, args.sections)
+        print(f"file size: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        full = timed(lambda: formatter.parse_bellande(path)["settings"]["max_retries"])[1]
+        print(f"    full parse: {full * 1000:8.1f} ms")
+
+        def lazy():
+            with formatter.open_lazy(path) as document:
+                document["settings"]["max_retries"]
+
+        print(f"    lazy (scan): {timed(lazy)[1] * 1000:8.1f} ms")
+        print(f"lazy (sidecar): {timed(lazy)[1] * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
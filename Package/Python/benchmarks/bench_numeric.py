@@ -0,0 +1,50 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from bellande_parser.core.numeric import load_numpy
+from generators import best_of, generate_sensor_dump, traced_memory
+
+def main():
+    parser = argparse.ArgumentParser(description="Numeric list parsing per backend and numeric_lists mode")
+    parser.add_argument("--values", type=int, default=1000000)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    content = generate_sensor_dump(args.values, args.channels)
+    modes = ["list", "array"] + (["numpy"] if load_numpy() is not None else [])
+    print(f"{args.values} values, {len(content) / 1024 / 1024:.1f} MB")
+    print(f"{'backend':>8} {'mode':>6} {'parse (ms)':>11} {'result (MB)':>12} {'peak (MB)':>10}")
+    for backend in ("classic", "lexer"):
+        for mode in modes:
+            formatter = Bellande_Format(backend=backend, numeric_lists=mode)
+            seconds = best_of(lambda: formatter.parse_content(content), args.repeat)
+            lines = content.split("\n")
+            retained, peak = traced_memory(lambda: formatter.parse_lines(lines))
+            print(f"{backend:>8} {mode:>6} {seconds * 1000:11.1f} {retained / 1024 / 1024:12.1f} "
+                  f"{peak / 1024 / 1024:10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from bellande_parser.core.query import child, children, parse_query
+from generators import best_of, generate_inventory, traced_memory
+
+# What child() returns for an absent key or index
+NOT_FOUND = child({}, "")
+
+QUERIES = ["users[*].name", 'users[?role == "admin" and score > 50].id', "services.*.port",
+           "services.service_7.hosts[0]"]
+
+def interpret(data, expression):
+    # Previous approach: the expression is parsed on every call and walked step by step
+    current = [data]
+    for step in parse_query(expression):
+        selected = []
+        for value in current:
+            if step[0] in ("key", "index"):
+                item = child(value, step[1])
+                if item is not NOT_FOUND:
+                    selected.append(item)
+            elif step[0] == "wildcard":
+                selected.extend(children(value))
+            elif step[0] == "slice":
+                selected.extend(value[slice(*step[1:])])
+            else:
+                selected.extend(item for item in children(value) if step[2](item))
+        current = selected
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiled query plans vs interpreted evaluation, streaming pruning")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--services", type=int, default=20000)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    formatter = Bellande_Format(backend="lexer")
+    data = generate_inventory(args.services, args.users)
+    small = generate_inventory(20, 20)
+    text = formatter.to_bellande_string(data)
+
+    print(f"{'query':>46} {'interpreted (us)':>17} {'compiled (us)':>14}")
+    for expression in QUERIES:
+        assert interpret(small, expression) == formatter.select(small, expression)
+        interpreted = best_of(lambda: [interpret(small, expression) for _ in range(args.calls)], args.repeat)
+        compiled = best_of(lambda: [formatter.select(small, expression) for _ in range(args.calls)], args.repeat)
+        print(f"{expression:>46} {interpreted / args.calls * 1e6:17.1f} {compiled / args.calls * 1e6:14.1f}")
+
+    print(f"\n{len(text) / 1024 / 1024:.1f} MB document")
+    print(f"{'query':>46} {'parse+select (ms)':>18} {'iter_select (ms)':>17} {'peak (MB)':>16}")
+    for expression in QUERIES:
+        full = lambda: formatter.select(formatter.parse_content(text), expression)
+        streamed = lambda: list(formatter.iter_select(io.StringIO(text), expression))
+        assert full() == streamed()
+        full_seconds = best_of(full, args.repeat)
+        streamed_seconds = best_of(streamed, args.repeat)
+        peaks = f"{traced_memory(full)[1] / 1024 / 1024:.1f} / {traced_memory(streamed)[1] / 1024 / 1024:.1f}"
+        print(f"{expression:>46} {full_seconds * 1000:18.1f} {streamed_seconds * 1000:17.1f} {peaks:>16}")
+
+if __name__ == "__main__":
+    main()
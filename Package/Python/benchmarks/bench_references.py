@@ -0,0 +1,54 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from generators import best_of, generate_shared, traced_memory
+
+def main():
+    parser = argparse.ArgumentParser(description="Repeated subtrees written inline vs shared through references")
+    parser.add_argument("--keys", type=int, default=200, help="keys in the shared subtree")
+    parser.add_argument("--users", type=int, default=2000, help="places that use the subtree")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    formatter = Bellande_Format(backend="lexer")
+    print(f"{'layout':>10} {'size (KB)':>10} {'parse (ms)':>11} {'result (MB)':>12}")
+    for name, inline in (("inline", True), ("ref", False)):
+        lines = generate_shared(args.keys, args.users, inline).split("\n")
+        seconds = best_of(lambda: formatter.parse_lines(lines), args.repeat)
+        size = traced_memory(lambda: formatter.parse_lines(lines))[0]
+        print(f"{name:>10} {sum(map(len, lines)) / 1024:10.1f} {seconds * 1000:11.1f} {size / 1024 / 1024:12.1f}")
+
+    # Resolution alone, many references through the path index
+    lines = ["targets:"] + [f"  t{i}:\n    value: {i}" for i in range(args.users)] + ["uses:"]
+    lines += [f"  - ref:targets.t{i % args.users}.value" for i in range(args.users * 10)]
+    lines = "\n".join(lines).split("\n")
+    unresolved = formatter.parser_backends["lexer"]
+    parse_only = best_of(lambda: unresolved(lines), args.repeat)
+    total = best_of(lambda: formatter.parse_lines(lines), args.repeat)
+    print(f"{args.users * 10} references: parse {parse_only * 1000:.1f} ms, "
+          f"resolve {(total - parse_only) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_section_lines
+
+EAGER_IMPORTS = ("import bellande_parser.bellande_parser, bellande_parser.core.encryption, "
+                 "bellande_parser.core.compression, bellande_parser.core.validation, bellande_parser.core.batch; "
+                 "import numpy")
+
+
+def median_run(command, runs: int, env: dict) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def write_config(path: str, sections: int):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("\n".join(generate_section_lines(sections)))
+
+def wait_for(path: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not start")
+        time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup latency: imports, in-process runs and the parse server")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--sections", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    config = os.path.join(workdir, "config.bellande")
+    write_config(config, args.sections)
+    socket_path = os.path.join(workdir, "bellande.sock")
+    env = dict(os.environ, PYTHONPATH=SRC, BELLANDE_SOCKET=socket_path)
+    local_env = dict(env, BELLANDE_NO_SERVER="1")
+    cli = [sys.executable, "-m", "bellande_parser"]
+
+    rows = [("python startup", [sys.executable, "-c", "pass"], env),
+            ("import (lazy)", [sys.executable, "-c", "import bellande_parser.bellande_parser"], env),
+            ("import (all subsystems)", [sys.executable, "-c", EAGER_IMPORTS], env),
+            ("parse in process", cli + ["parse", config], local_env)]
+    results = [(label, median_run(command, args.runs, run_env)) for label, command, run_env in rows]
+
+    server = subprocess.Popen(cli + ["serve"], env=local_env, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(socket_path)
+        results.append(("parse via server", median_run(cli + ["parse", config], args.runs, env)))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{args.runs} runs each, {args.sections} sections")
+    for label, seconds in results:
+        print(f"{label:>24}: {seconds * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
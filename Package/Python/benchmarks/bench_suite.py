@@ -0,0 +1,255 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from bellande_parser.core.custom_types import DateTime
+from bellande_parser.core.types import SchemaDefinition
+from generators import PROFILES, generate_document, generate_records
+
+RECORD_SCHEMA = SchemaDefinition(
+    type="object",
+    properties={
+        "name": SchemaDefinition(type="string", pattern=r"^[a-zA-Z\s]+$"),
+        "age": SchemaDefinition(type="integer", minimum=0, maximum=150),
+        "email": SchemaDefinition(type="string", pattern=r"^[\w\.-]+@[\w\.-]+\.\w+$"),
+        "role": SchemaDefinition(type="string", enum=["admin", "user", "guest"]),
+        "tags": SchemaDefinition(type="array", properties={"items": SchemaDefinition(type="string")}),
+    },
+    required=["name", "email"]
+)
+
+# A case returns the callable to time, the bytes and the items it processes per call
+Case = Callable[[Bellande_Format, Dict[str, Any]], Tuple[Callable[[], Any], int, int]]
+
+def make_formatter(backend: str = "classic") -> Bellande_Format:
+    formatter = Bellande_Format(backend=backend)
+    handler = DateTime()
+    formatter.type_registry.register("datetime", datetime, handler.serialize, handler.deserialize)
+    return formatter
+
+def document_text(formatter: Bellande_Format, params: Dict[str, Any]) -> str:
+    document = generate_document(params["size"], params["depth"], params["list_length"],
+                                 params["custom_density"], params["seed"])
+    return formatter.to_bellande_string(document)
+
+def parse_case(backend: str) -> Case:
+    def setup(formatter: Bellande_Format, params: Dict[str, Any]):
+        parser = make_formatter(backend)
+        text = document_text(parser, params)
+        lines = text.split('\n')
+        return (lambda: parser.parse_lines(lines)), len(text.encode()), len(lines)
+    return setup
+
+def serialize_case(formatter: Bellande_Format, params: Dict[str, Any]):
+    document = generate_document(params["size"], params["depth"], params["list_length"],
+                                 params["custom_density"], params["seed"])
+    text = formatter.to_bellande_string(document)
+    return (lambda: formatter.to_bellande_string(document)), len(text.encode()), len(text.split('\n'))
+
+def validate_case(compiled: bool) -> Case:
+    def setup(formatter: Bellande_Format, params: Dict[str, Any]):
+        records = generate_records(params["size"] * 10, params["custom_density"], params["seed"])
+        size = len(json.dumps(records, default=str))
+        if compiled:
+            schema = formatter.validator.compile(RECORD_SCHEMA)
+            return (lambda: [schema.validate(record) for record in records]), size, len(records)
+        validate = formatter.validator.validate
+        return (lambda: [validate(record, RECORD_SCHEMA) for record in records]), size, len(records)
+    return setup
+
+def huffman_case(decode: bool) -> Case:
+    def setup(formatter: Bellande_Format, params: Dict[str, Any]):
+        data = document_text(formatter, params).encode()
+        compression = formatter.compression
+        if decode:
+            encoded, metadata = compression.encode_data(data)
+            return (lambda: compression.decode_data(encoded, metadata)), len(data), 1
+        return (lambda: compression.encode_data(data)), len(data), 1
+    return setup
+
+def encrypt_case(mode: str) -> Case:
+    def setup(formatter: Bellande_Format, params: Dict[str, Any]):
+        # AES in pure Python is slow, so the input is capped
+        data = document_text(formatter, params).encode()[:params["encrypt_bytes"]]
+        key = formatter.encryption.generate_key()
+        return (lambda: formatter.encryption.encrypt(data, key, mode)), len(data), 1
+    return setup
+
+CASES: Dict[str, Case] = {
+    "parse_lines[classic]": parse_case("classic"),
+    "parse_lines[lexer]": parse_case("lexer"),
+    "to_bellande_string": serialize_case,
+    "validate[interpreted]": validate_case(False),
+    "validate[compiled]": validate_case(True),
+    "huffman_encode": huffman_case(False),
+    "huffman_decode": huffman_case(True),
+    "encrypt[cbc]": encrypt_case("cbc"),
+    "encrypt[ctr]": encrypt_case("ctr"),
+}
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    # Nearest rank on an already sorted sample
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def measure(function: Callable[[], Any], size: int, items: int, repeat: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        function()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    # Peak memory is taken from a separate run, tracing slows everything down
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = percentile(latencies, 0.5)
+    return {
+        "repeat": repeat,
+        "bytes": size,
+        "items": items,
+        "min": latencies[0],
+        "max": latencies[-1],
+        "mean": sum(latencies) / len(latencies),
+        "p50": median,
+        "p90": percentile(latencies, 0.9),
+        "p99": percentile(latencies, 0.99),
+        "throughput_mb_s": size / median / 1e6 if median else 0.0,
+        "items_per_s": items / median if median else 0.0,
+        "peak_memory_bytes": peak,
+    }
+
+def run(args: argparse.Namespace) -> int:
+    params = dict(PROFILES[args.profile])
+    for name in ("size", "depth", "list_length", "custom_density"):
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+    params["seed"] = args.seed
+    params["encrypt_bytes"] = args.encrypt_bytes
+
+    selected = [name for name in CASES if not args.cases or any(part in name for part in args.cases.split(','))]
+    formatter = make_formatter()
+    results: Dict[str, Any] = {}
+    print(f"{'case':>22} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'MB/s':>8} {'peak KB':>10}")
+    for name in selected:
+        function, size, items = CASES[name](formatter, params)
+        result = measure(function, size, items, args.repeat, args.warmup)
+        results[name] = result
+        print(f"{name:>22} {result['p50'] * 1000:10.2f} {result['p90'] * 1000:10.2f} "
+              f"{result['p99'] * 1000:10.2f} {result['throughput_mb_s']:8.2f} "
+              f"{result['peak_memory_bytes'] / 1024:10.1f}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "profile": args.profile,
+            "params": params,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            return compare_reports(json.load(file), report, args.threshold, args.memory_threshold)
+    return 0
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+                    memory_threshold: float) -> int:
+    if baseline["meta"].get("params") != current["meta"].get("params"):
+        print("warning: baseline was recorded with different parameters")
+    regressions = 0
+    print(f"{'case':>22} {'base p50':>10} {'p50':>10} {'change':>8} {'memory':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:>22} {'-':>10} {result['p50'] * 1000:10.2f} {'new':>8}")
+            continue
+        change = result["p50"] / base["p50"] - 1 if base["p50"] else 0.0
+        memory = (result["peak_memory_bytes"] / base["peak_memory_bytes"] - 1
+                  if base["peak_memory_bytes"] else 0.0)
+        flags = []
+        if change > threshold:
+            flags.append("SLOWER")
+        if memory > memory_threshold:
+            flags.append("MEMORY")
+        regressions += bool(flags)
+        print(f"{name:>22} {base['p50'] * 1000:10.2f} {result['p50'] * 1000:10.2f} {change:+8.1%} "
+              f"{memory:+8.1%} {' '.join(flags)}")
+    print(f"{regressions} regression(s) over {threshold:.0%} time / {memory_threshold:.0%} memory")
+    return 1 if regressions else 0
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, "r", encoding="utf-8") as file:
+        current = json.load(file)
+    return compare_reports(baseline, current, args.threshold, args.memory_threshold)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite for the Bellande hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite")
+    run_parser.add_argument("--profile", choices=sorted(PROFILES), default="medium")
+    run_parser.add_argument("--size", type=int, help="top-level sections")
+    run_parser.add_argument("--depth", type=int)
+    run_parser.add_argument("--list-length", dest="list_length", type=int)
+    run_parser.add_argument("--custom-density", dest="custom_density", type=float)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--encrypt-bytes", type=int, default=64 * 1024)
+    run_parser.add_argument("--cases", help="comma separated substrings of case names")
+    run_parser.add_argument("--repeat", type=int, default=7)
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--output", help="write JSON results here")
+    run_parser.add_argument("--baseline", help="compare against a stored JSON result")
+
+    compare_parser = commands.add_parser("compare", help="compare two stored JSON results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--threshold", type=float, default=0.10, help="allowed p50 slowdown")
+        sub.add_argument("--memory-threshold", type=float, default=0.25, help="allowed peak memory growth")
+
+    args = parser.parse_args()
+    return run(args) if args.command == "run" else compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
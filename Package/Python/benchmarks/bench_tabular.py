@@ -0,0 +1,54 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.bellande_parser import Bellande_Format
+from generators import best_of, generate_rows, traced_memory
+
+def main():
+    parser = argparse.ArgumentParser(description="Row vs columnar encoding of a list of records")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = {"users": generate_rows(args.rows)}
+    rows_text = Bellande_Format(backend="lexer").to_bellande_string(data)
+    columnar_writer = Bellande_Format(backend="lexer", columnar=True)
+    columnar_text = columnar_writer.to_bellande_string(data)
+    for label, text in (("rows", rows_text), ("columnar", columnar_text)):
+        print(f"{label:>9}: {len(text) / 1024 / 1024:.2f} MB, {text.count(chr(10)) + 1} lines")
+    write_seconds = best_of(lambda: columnar_writer.to_bellande_string(data), args.repeat)
+    print(f"columnar write: {write_seconds * 1000:.1f} ms")
+
+    print(f"{'input':>9} {'tables':>7} {'numeric':>8} {'parse (ms)':>11} {'result (MB)':>12}")
+    cases = [("rows", rows_text, "dicts", "list"), ("columnar", columnar_text, "dicts", "list"),
+             ("columnar", columnar_text, "table", "list"), ("columnar", columnar_text, "table", "array")]
+    for label, text, tables, numeric_lists in cases:
+        formatter = Bellande_Format(backend="lexer", tables=tables, numeric_lists=numeric_lists)
+        seconds = best_of(lambda: formatter.parse_content(text), args.repeat)
+        lines = text.split("\n")
+        retained = traced_memory(lambda: formatter.parse_lines(lines))[0]
+        print(f"{label:>9} {tables:>7} {numeric_lists:>8} {seconds * 1000:11.1f} {retained / 1024 / 1024:12.1f}")
+
+if __name__ == "__main__":
+    main()
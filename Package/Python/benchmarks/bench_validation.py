@@ -0,0 +1,63 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bellande_parser.core.types import SchemaDefinition
+from bellande_parser.core.validation import Validator
+from generators import generate_records
+
+USER_SCHEMA = SchemaDefinition(
+    type="object",
+    properties={
+        "name": SchemaDefinition(type="string", pattern=r"^[a-zA-Z\s]+$"),
+        "age": SchemaDefinition(type="integer", minimum=0, maximum=150),
+        "email": SchemaDefinition(type="string", pattern=r"^[\w\.-]+@[\w\.-]+\.\w+$"),
+        "role": SchemaDefinition(type="string", enum=["admin", "user", "guest"]),
+        "tags": SchemaDefinition(type="array", properties={"items": SchemaDefinition(type="string")}),
+    },
+    required=["name", "email"]
+)
+
+def measure(label: str, function, records):
+    start = time.perf_counter()
+    for record in records:
+        function(record)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22}: {len(records) / elapsed:12,.0f} records/sec")
+
+def main():
+    parser = argparse.ArgumentParser(description="Interpreted vs compiled schema validation")
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    validator = Validator()
+    compiled = validator.compile(USER_SCHEMA)
+    records = generate_records(args.records)
+
+    measure("Validator.validate", lambda record: validator.validate(record, USER_SCHEMA), records)
+    measure("CompiledSchema.validate", compiled.validate, records)
+    measure("CompiledSchema.is_valid", compiled.is_valid, records)
+
+if __name__ == "__main__":
+    main()
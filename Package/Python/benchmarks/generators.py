@@ -0,0 +1,186 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, List, Tuple
+from datetime import datetime, timedelta
+import random
+import time
+import tracemalloc
+
+# Deterministic synthetic documents, the same seed always gives the same tree
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "small": {"size": 50, "depth": 2, "list_length": 5, "custom_density": 0.0},
+    "medium": {"size": 500, "depth": 3, "list_length": 20, "custom_density": 0.05},
+    "large": {"size": 4000, "depth": 3, "list_length": 50, "custom_density": 0.05},
+    "deep": {"size": 200, "depth": 8, "list_length": 5, "custom_density": 0.0},
+    "custom": {"size": 500, "depth": 2, "list_length": 10, "custom_density": 0.5},
+}
+
+EPOCH = datetime(2024, 1, 1)
+
+def scalar(rng: random.Random, custom_density: float) -> Any:
+    if custom_density and rng.random() < custom_density:
+        return EPOCH + timedelta(seconds=rng.randrange(10 ** 8))
+    choice = rng.randrange(5)
+    if choice == 0:
+        return rng.randrange(-10 ** 6, 10 ** 6)
+    if choice == 1:
+        return round(rng.uniform(-1000, 1000), 4)
+    if choice == 2:
+        return rng.random() < 0.5
+    if choice == 3:
+        return f"value_{rng.randrange(10 ** 6)}"
+    return f"text with spaces {rng.randrange(1000)}"
+
+def generate_section(rng: random.Random, depth: int, list_length: int, custom_density: float) -> Dict[str, Any]:
+    section: Dict[str, Any] = {}
+    for index in range(4):
+        section[f"field_{index}"] = scalar(rng, custom_density)
+    section["items"] = [scalar(rng, custom_density) for _ in range(list_length)]
+    if depth > 1:
+        section["child"] = generate_section(rng, depth - 1, list_length, custom_density)
+    return section
+
+def generate_document(size: int, depth: int, list_length: int, custom_density: float,
+                      seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    return {f"section_{index}": generate_section(rng, depth, list_length, custom_density)
+            for index in range(size)}
+
+def generate_records(count: int, custom_density: float = 0.0, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    roles = ("admin", "user", "guest")
+    return [{"name": f"User {rng.choice('ABCDEFGH')}", "age": rng.randrange(0, 120),
+             "email": f"user{index}@example.com", "role": rng.choice(roles),
+             "tags": [f"tag{rng.randrange(10)}" for _ in range(3)],
+             "created": scalar(rng, custom_density)}
+            for index in range(count)]
+
+def generate_rows(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # Flat records of scalars only, the shape columnar tables are written for
+    rng = random.Random(seed)
+    roles = ("admin", "user", "guest")
+    return [{"id": index, "name": f"user_{index}", "role": rng.choice(roles),
+             "score": round(rng.uniform(0, 100), 2), "active": rng.random() < 0.5}
+            for index in range(count)]
+
+def generate_services(count: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    return {f"service_{index}": {"name": f"service_{index}", "port": rng.randint(1024, 65535),
+                                 "hosts": [f"10.0.{index % 256}.{host}" for host in range(4)],
+                                 "limits": {"cpu": round(rng.random(), 4), "memory": rng.randint(1, 64)}}
+            for index in range(count)}
+
+def generate_inventory(services: int, users: int, seed: int = 0) -> Dict[str, Any]:
+    return {"services": generate_services(services, seed), "users": generate_rows(users, seed)}
+
+def generate_flat_document(size: int) -> Dict[str, str]:
+    # String values only, about size bytes once written
+    document: Dict[str, str] = {}
+    count = 0
+    while count < size:
+        key = f"record_{len(document)}"
+        document[key] = f"value-{len(document)}-" + "x" * 40
+        count += len(key) + len(document[key]) + 3
+    return document
+
+def generate_typed_document(count: int) -> Dict[str, Any]:
+    # Flat so the classic parser, which calls _process_value, can read it back
+    document: Dict[str, Any] = {}
+    for index in range(count):
+        document[f"at_{index}"] = EPOCH + timedelta(seconds=index)
+        document[f"took_{index}"] = timedelta(milliseconds=index)
+        document[f"signal_{index}"] = complex(index, -index)
+        document[f"blob_{index}"] = bytes([index % 256]) * 4
+        document[f"label_{index}"] = f"r{index}"
+    return document
+
+def generate_section_lines(sections: int, values: int = 10) -> List[str]:
+    lines = []
+    for index in range(sections):
+        lines.append(f"section_{index}:")
+        lines.append(f"  id: {index}")
+        lines.append(f"  label: \"section {index}\"")
+        lines.append("  values:")
+        lines.extend(f"    - {value * 0.5}" for value in range(values))
+    return lines
+
+def generate_mixed_lines(count: int) -> List[str]:
+    # Scalars of every kind, then one long list of numbers and strings
+    lines = []
+    for index in range(count // 2):
+        lines.append(f"key_{index % 500}_{index}: {index}")
+        lines.append(f"flag_{index}: {'true' if index % 2 else 'null'}")
+    lines.append("values:")
+    lines.extend(f"  - {index * 0.5}" for index in range(count // 2))
+    lines.extend(f"  - \"item {index}\"" for index in range(count // 2))
+    return lines
+
+def generate_sensor_dump(count: int, channels: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    per_channel = count // channels
+    for channel in range(channels):
+        lines.append(f"channel_{channel}_counts:")
+        lines.extend(f"  - {rng.randint(-50000, 50000)}" for _ in range(per_channel // 2))
+        lines.append(f"channel_{channel}_readings:")
+        lines.extend(f"  - {rng.uniform(-100, 100):.4f}" for _ in range(per_channel // 2))
+    return "\n".join(lines)
+
+def generate_shared(subtree_keys: int, users: int, inline: bool) -> str:
+    # A profile block used by every service, written out each time or referenced
+    block = [f"    setting_{index}: value_{index}" for index in range(subtree_keys)]
+    lines = ["profiles:", "  standard:"] + block + ["services:"]
+    for service in range(users):
+        lines.append(f"  service_{service}:")
+        lines.append(f"    name: service_{service}")
+        if inline:
+            lines.append("    profile:")
+            lines.extend("  " + line for line in block)
+        else:
+            lines.append("    profile: ref:profiles.standard")
+    return "\n".join(lines)
+
+def generate_bytes(size: int) -> bytes:
+    block = "".join(f"record_{index}:\n  name: \"user {index}\"\n  score: {index * 0.25}\n  active: true\n"
+                    for index in range(2000)).encode()
+    return (block * (size // len(block) + 1))[:size]
+
+def timed(function: Callable, *args) -> Tuple[Any, float]:
+    # (result, seconds) of a single call
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def best_of(function: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def traced_memory(function: Callable[[], Any]) -> Tuple[int, int]:
+    # (bytes still held by the result, peak bytes during the call)
+    tracemalloc.start()
+    try:
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        return current, peak
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,30 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+import sys
+from .core.server import forward
+
+def main() -> int:
+    # Forwarding to a running server needs none of the parser modules, they load only to run in process
+    exit_code = forward(sys.argv[1:], sys.stdout, sys.stderr)
+    if exit_code is not None:
+        return exit_code
+    from .bellande_parser import main as run_main
+    return run_main()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Dict, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+import asyncio
+import os
+from .bellande_parser import Bellande_Format
+
+DEFAULT_MAX_CONCURRENCY = 64
+
+# Parses below this size run on the loop, an executor hop costs more than the parse
+DEFAULT_INLINE_THRESHOLD = 16 * 1024
+
+BUILTIN_BACKENDS = ("classic", "lexer")
+
+_process_formatters: Dict[Tuple, Bellande_Format] = {}
+
+def _formatter_options(formatter: Bellande_Format) -> Tuple:
+    # Constructor arguments of the formatter, a process pool worker builds an equivalent one from them
+    if (formatter.type_registry.types or formatter.references or
+            set(formatter.parser_backends) != set(BUILTIN_BACKENDS)):
+        raise ValueError("Custom types, references and backends registered on the formatter "
+                         "cannot be sent to a process pool, use a thread pool")
+    return (formatter.backend, formatter.numeric_lists, formatter.tables, formatter.columnar,
+            formatter.table_min_rows, formatter.resolver.file_references)
+
+def _call_in_process(options: Tuple, method: str, args: Tuple) -> Any:
+    # Process pools get plain data, each worker keeps its own formatter per set of options
+    formatter = _process_formatters.get(options)
+    if formatter is None:
+        backend, numeric_lists, tables, columnar, table_min_rows, file_references = options
+        formatter = _process_formatters[options] = Bellande_Format(
+            backend=backend, numeric_lists=numeric_lists, tables=tables, columnar=columnar,
+            table_min_rows=table_min_rows, file_references=file_references)
+    return getattr(formatter, method)(*args)
+
+def _read_text(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+def _write_text(file_path: str, content: str):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+class AsyncBellandeFormat:
+    def __init__(self, formatter: Optional[Bellande_Format] = None, executor: Optional[Executor] = None,
+                 io_executor: Optional[Executor] = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 inline_threshold: int = DEFAULT_INLINE_THRESHOLD):
+        self.formatter = formatter or Bellande_Format()
+        # None uses the loop's default thread pool. A process pool gets the formatter's options,
+        # custom types, references and backends registered on it are refused
+        self.executor = executor
+        self.io_executor = io_executor
+        self.max_concurrency = max_concurrency
+        self.inline_threshold = inline_threshold
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def parse_bellande(self, file_path: str) -> Any:
+        async with self.semaphore:
+            content = await self._io(_read_text, file_path)
+            base_dir = os.path.dirname(os.path.abspath(file_path))
+            if len(content) < self.inline_threshold:
+                return self.formatter.parse_content(content, base_dir)
+            return await self._offload("parse_content", content, base_dir)
+
+    async def parse_content(self, content: str) -> Any:
+        async with self.semaphore:
+            if len(content) < self.inline_threshold:
+                return self.formatter.parse_content(content)
+            return await self._offload("parse_content", content)
+
+    async def write_bellande(self, data: Any, file_path: str):
+        async with self.semaphore:
+            content = await self._offload("to_bellande_string", data)
+            await self._io(_write_text, file_path, content)
+
+    async def encrypt(self, data: Any, key: bytes, mode: str = "cbc", workers: Optional[int] = None) -> bytes:
+        async with self.semaphore:
+            return await self._offload("encrypt", data, key, mode, workers)
+
+    async def decrypt(self, encrypted_data: bytes, key: bytes, mode: str = "cbc",
+                      workers: Optional[int] = None) -> Any:
+        async with self.semaphore:
+            return await self._offload("decrypt", encrypted_data, key, mode, workers)
+
+    async def compress(self, data: Any, codec: str = "huffman", level: Optional[int] = None,
+                       block_size: Optional[int] = None, workers: Optional[int] = None) -> bytes:
+        async with self.semaphore:
+            return await self._offload("compress", data, codec, level, block_size, workers)
+
+    async def decompress(self, compressed_data: bytes, workers: Optional[int] = None) -> Any:
+        async with self.semaphore:
+            return await self._offload("decompress", compressed_data, workers)
+
+    async def _offload(self, method: str, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if isinstance(self.executor, ProcessPoolExecutor):
+            return await loop.run_in_executor(self.executor, _call_in_process,
+                                              _formatter_options(self.formatter), method, args)
+        return await loop.run_in_executor(self.executor, partial(getattr(self.formatter, method), *args))
+
+    async def _io(self, function: Any, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, partial(function, *args))
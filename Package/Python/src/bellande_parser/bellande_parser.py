@@ -15,48 +15,337 @@
 
 #!/usr/bin/env python3
 
-from typing import Dict, List, Any, Union
-from .core.types import ValidationResult, SchemaDefinition
-from .core.encryption import Encryption
-from .core.compression import Compression
+from typing import Dict, List, Any, Union, Iterator, Iterable, Callable, Optional, Tuple, TextIO, Deque
+from collections import deque
+from .core.types import ValidationResult, ValidationStats, CacheStats, SchemaDefinition, MergeConflict
 from .core.custom_types import CustomTypeRegistry
-from .core.validation import Validator
-import re
+from .core.lexer import Lexer, NUMBER_STARTS, parse_number
+from .core.emitter import Emitter
+from .core.streaming import StreamingParser, StreamEvent, build_tree, iter_lines, tree_events, DEFAULT_CHUNK_SIZE
+from .core.lazy import LazyBellandeDocument
+from .core.incremental import IncrementalDocument
+from .core.binary import BinaryEncoder, BinaryDecoder
+from .core.metrics import MetricsSink, MetricsCallback, ParseProbe, to_prometheus
+from .core.cache import ParseCache, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_BYTES
+from .core.numeric import check_mode, convert_lists, decode_numbers, is_number_start, list_kind, to_typed
+from .core.references import ReferenceResolver
+from .core.query import compile_query
+from .core.diff import Patch, apply_patch, decode_patch, diff, encode_patch, format_path, merge
+from .core.server import forward, serve_main
+from .core.tabular import DEFAULT_MIN_ROWS, build_table, check_tables_mode, table_rows
 import json
+import os
+import sys
+import time
 
 class Bellande_Format:
-    def __init__(self):
-        self.encryption = Encryption()
-        self.compression = Compression()
+    def __init__(self, backend: str = "classic", numeric_lists: str = "list", tables: str = "dicts",
+                 columnar: bool = False, table_min_rows: int = DEFAULT_MIN_ROWS, file_references: bool = False):
+        # "array" and "numpy" return homogeneous int/float lists as array.array or NumPy arrays
+        check_mode(numeric_lists)
+        check_tables_mode(tables)
+        self.numeric_lists = numeric_lists
+        # Table blocks parse to lists of dicts, or to Table objects with "table"
+        self.tables = tables
+        # With columnar, lists of at least table_min_rows dicts with the same keys are written as tables
+        self.columnar = columnar
+        self.table_min_rows = table_min_rows
+        # Encryption, compression and validation are imported and built on first use
+        self._encryption = None
+        self._compression = None
+        self._validator = None
         self.type_registry = CustomTypeRegistry()
-        self.validator = Validator()
         self.references: Dict[str, Any] = {}
         self.schemas: Dict[str, SchemaDefinition] = {}
+        self.compiled_schemas: Dict[str, 'CompiledSchema'] = {}
+        self.lexer = Lexer(self.type_registry, self.references)
+        # ref: values that are not registered references point into the document, or with
+        # file_references into another file under the document's directory
+        self.resolver = ReferenceResolver(self.references, self._load_unresolved, file_references)
+        self.binary_encoder = BinaryEncoder(self.type_registry)
+        self.binary_decoder = BinaryDecoder(self.type_registry)
+        self.backend = backend
+        self.parser_backends: Dict[str, Callable[[Iterable[str]], Any]] = {
+            "classic": self._parse_lines_classic,
+            "lexer": self._parse_lines_lexer,
+        }
+        self.backends_generation = 0
+        self.cache: Optional[ParseCache] = None
+        self.metrics: Optional[MetricsSink] = None
+
+    @property
+    def encryption(self) -> 'Encryption':
+        if self._encryption is None:
+            from .core.encryption import Encryption
+            self._encryption = Encryption()
+        return self._encryption
+
+    @property
+    def compression(self) -> 'Compression':
+        if self._compression is None:
+            from .core.compression import Compression
+            self._compression = Compression()
+        return self._compression
+
+    @property
+    def validator(self) -> 'Validator':
+        if self._validator is None:
+            from .core.validation import Validator
+            self._validator = Validator()
+        return self._validator
+
+    def register_backend(self, name: str, parser: Callable[[Iterable[str]], Any]):
+        self.parser_backends[name] = parser
+        self.backends_generation += 1
+
+    def enable_cache(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                     hash_content: bool = False) -> ParseCache:
+        # Cached results are shared, so they are returned as immutable FrozenDict/FrozenList trees
+        self.cache = ParseCache(max_entries, max_bytes, hash_content)
+        return self.cache
+
+    def disable_cache(self):
+        self.cache = None
+
+    def cache_stats(self) -> Optional[CacheStats]:
+        return None if self.cache is None else self.cache.stats
+
+    def enable_metrics(self, sink: Optional[MetricsSink] = None,
+                       callback: Optional[MetricsCallback] = None) -> MetricsSink:
+        # Parses and validations only take the instrumented path while a sink is set
+        self.metrics = sink or MetricsSink(callback)
+        return self.metrics
+
+    def disable_metrics(self):
+        self.metrics = None
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        snapshot = self.metrics.as_dict() if self.metrics is not None else {}
+        if self.cache is not None:
+            stats = self.cache.stats
+            snapshot["cache"] = {"hits": stats.hits, "misses": stats.misses, "evictions": stats.evictions,
+                                 "entries": stats.entries, "bytes": stats.bytes}
+        return snapshot
+
+    def metrics_prometheus(self, prefix: str = "bellande") -> str:
+        return to_prometheus(self.metrics_snapshot(), prefix)
 
     def register_schema(self, name: str, schema: SchemaDefinition):
         self.schemas[name] = schema
+        self.compiled_schemas[name] = self.validator.compile(schema)
 
     def validate(self, data: Any, schema_name: str) -> ValidationResult:
-        if schema_name not in self.schemas:
+        if schema_name not in self.compiled_schemas:
             raise ValueError(f"Schema {schema_name} not found")
-        return self.validator.validate(data, self.schemas[schema_name])
+        if self.metrics is not None:
+            return self._validate_instrumented(data, schema_name)
+        return self.compiled_schemas[schema_name].validate(data)
+
+    def _validate_instrumented(self, data: Any, schema_name: str) -> ValidationResult:
+        start = time.perf_counter()
+        result = self.compiled_schemas[schema_name].validate(data)
+        elapsed = time.perf_counter() - start
+        self.metrics.record({"operation": "validate", "schema": schema_name, "seconds": elapsed,
+                             "stages": {"validate": elapsed}, "validation_errors": len(result.errors)})
+        return result
+
+    def is_valid(self, data: Any, schema_name: str) -> bool:
+        if schema_name not in self.compiled_schemas:
+            raise ValueError(f"Schema {schema_name} not found")
+        return self.compiled_schemas[schema_name].is_valid(data)
+
+    def validate_many(self, records: Iterable[Any], schema_name: str, workers: Optional[int] = None,
+                      chunk_size: int = 1000, ordered: bool = True, fail_fast: bool = False,
+                      max_errors: Optional[int] = None,
+                      stats: Optional[ValidationStats] = None) -> Iterator[Tuple[int, ValidationResult]]:
+        if schema_name not in self.compiled_schemas:
+            raise ValueError(f"Schema {schema_name} not found")
+        from .core.validation import validate_records
+        return validate_records(records, self.schemas[schema_name], workers, chunk_size, ordered,
+                                fail_fast, max_errors, stats, self.compiled_schemas[schema_name])
+
+    def parse_bellande(self, file_path: str, streaming: bool = False) -> Any:
+        # Cross-file references are relative to the directory of the file
+        base_dir = os.path.dirname(os.path.abspath(file_path))
+        if streaming:
+            # Built from the iter_bellande events, which follow the backend, so the result is the same
+            # as without streaming
+            deferred = self.lexer.deferred_references
+            result = build_tree(self.iter_bellande(file_path))
+            if result.__class__ is list and self.numeric_lists != "list":
+                # A top-level list arrives item by item, only nested lists are typed by the events
+                kind = list_kind(result)
+                if kind is not None:
+                    result = to_typed(result, kind, self.numeric_lists)
+            if self.lexer.deferred_references != deferred:
+                result = self.resolver.resolve(result, base_dir)
+            return result
+        if self.cache is not None:
+            return self.cache.get(file_path, self._cache_variant(),
+                                  lambda content: self.parse_content(content, base_dir))
 
-    def parse_bellande(self, file_path: str) -> Any:
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
-        return self.parse_content(content)
+        return self.parse_content(content, base_dir)
+
+    def parse_nested(self, file_path: str) -> Any:
+        # Always lexer semantics whatever the backend, so lists of keyed items stay nested where
+        # the classic backend flattens them
+        base_dir = os.path.dirname(os.path.abspath(file_path))
+        deferred = self.lexer.deferred_references
+        result = self._parse_lines_lexer(iter_lines(file_path))
+        if self.lexer.deferred_references != deferred:
+            result = self.resolver.resolve(result, base_dir)
+        return result
 
-    def parse_content(self, content: str) -> Any:
+    def _cache_variant(self) -> Tuple:
+        # Everything besides the file that changes what a parse returns
+        return (self.backend, self.numeric_lists, self.tables, self.resolver.file_references,
+                self.type_registry.generation, self.backends_generation)
+
+    def clear_documents(self):
+        # Drops the documents loaded for cross-file references
+        self.resolver.clear()
+
+    def iter_bellande(self, source: Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[StreamEvent]:
+        # Accepts a path, a text/binary file object or an iterable of chunks. Entries are emitted
+        # before the rest of the document is read, so their references stay Reference placeholders.
+        # Events follow the backend, registered backends parse the whole document first
+        if self.backend == "lexer":
+            parser = StreamingParser(self.lexer, numeric_lists=self.numeric_lists, tables=self.tables)
+            return parser.iter_events(source, chunk_size)
+        if self.backend == "classic":
+            return self._run_classic(iter_lines(source, chunk_size), None, True)
+        if self.backend not in self.parser_backends:
+            raise ValueError(f"Parser backend {self.backend} not found")
+        return tree_events(self.parser_backends[self.backend], iter_lines(source, chunk_size))
+
+    def select(self, data: Any, expression: str) -> List[Any]:
+        # Works on parsed trees and lazy documents, each expression is compiled once
+        return compile_query(expression).run(data)
+
+    def iter_select(self, source: Any, expression: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+        # Streams like iter_bellande, keys off the expression's leading key path are skipped unparsed
+        query = compile_query(expression)
+        parser = StreamingParser(self.lexer, numeric_lists=self.numeric_lists, tables=self.tables)
+        return query.run_events(parser.parse_lines(query.prune(iter_lines(source, chunk_size), self.lexer.scan)))
+
+    def diff(self, old: Any, new: Any, list_keys: Union[str, List[str], None] = None,
+             include_old: bool = False) -> Patch:
+        # Lists of dicts carrying one of list_keys (e.g. "id") are matched by it, other lists by LCS
+        return diff(old, new, list_keys, include_old)
+
+    def apply_patch(self, data: Any, patch: Patch, in_place: bool = False) -> Any:
+        return apply_patch(data, patch, in_place)
+
+    def merge(self, base: Any, ours: Any, theirs: Any, list_keys: Union[str, List[str], None] = None,
+              prefer: str = "ours") -> Tuple[Any, List[MergeConflict]]:
+        return merge(base, ours, theirs, list_keys, prefer)
+
+    def patch_to_bellande(self, patch: Patch) -> str:
+        return self.to_bellande_string(encode_patch(patch))
+
+    def parse_patch(self, content: str) -> Patch:
+        # The classic backend cannot read lists of keyed items, patches always go through the lexer
+        return decode_patch(StreamingParser(self.lexer).parse_tree(content.split('\n')))
+
+    def open_lazy(self, file_path: str, sidecar: bool = True,
+                  index_path: Optional[str] = None) -> LazyBellandeDocument:
+        # Only the key index is built up front, subtrees are parsed on access
+        return LazyBellandeDocument(file_path, self.lexer, sidecar, index_path, self.resolver)
+
+    def parse_incremental(self, content: str) -> IncrementalDocument:
+        # Keeps the lines and block layout so later edits only re-parse the touched blocks. Only the lexer
+        # backend parses blocks independently, the classic one flattens nested keys onto the root, so other
+        # backends (and top-level lists when numeric lists are typed) re-parse the whole document
+        if self.backend not in self.parser_backends:
+            raise ValueError(f"Parser backend {self.backend} not found")
+        return IncrementalDocument(self.lexer, content.split('\n'), self.resolver,
+                                   self.parser_backends[self.backend], self.backend == "lexer",
+                                   self.numeric_lists == "list")
+
+    def parse_content(self, content: str, base_dir: Optional[str] = None) -> Any:
         lines = content.split('\n')
-        return self.parse_lines(lines)
+        return self.parse_lines(lines, base_dir)
+
+    def parse_lines(self, lines: Iterable[str], base_dir: Optional[str] = None) -> Union[Dict, List]:
+        if self.backend not in self.parser_backends:
+            raise ValueError(f"Parser backend {self.backend} not found")
+        if self.metrics is not None:
+            return self._parse_lines_instrumented(lines, base_dir)
+        deferred = self.lexer.deferred_references
+        result = self.parser_backends[self.backend](lines)
+        # A concurrent parse can move the counter too, that only costs a walk that finds nothing
+        if self.lexer.deferred_references != deferred:
+            result = self.resolver.resolve(result, base_dir)
+        return result
 
-    def parse_lines(self, lines: List[str]) -> Union[Dict, List]:
+    def _parse_lines_instrumented(self, lines: Iterable[str],
+                                  base_dir: Optional[str] = None) -> Union[Dict, List]:
+        # Works on private copies, so concurrent parses never see wrapped functions
+        probe = ParseProbe(self.type_registry.deserializer_for)
+        counted = probe.count_lines(lines)
+        deferred = self.lexer.deferred_references
+        start = time.perf_counter()
+        if self.backend == "classic":
+            result = self._parse_lines_classic(counted, probe.wrap_value(self._process_value))
+        elif self.backend == "lexer":
+            parser = StreamingParser(self.lexer, numeric_lists=self.numeric_lists, bulk_numbers=False,
+                                     tables=self.tables)
+            parser.scalar = probe.wrap_value(parser.scalar)
+            result = parser.parse_tree(counted)
+        else:
+            result = self.parser_backends[self.backend](counted)
+        if self.lexer.deferred_references != deferred:
+            resolve_start = time.perf_counter()
+            result = self.resolver.resolve(result, base_dir)
+            probe.seconds["reference"] += time.perf_counter() - resolve_start
+        self.metrics.record(probe.report("parse", self.backend, time.perf_counter() - start))
+        return result
+
+    def _load_unresolved(self, file_path: str) -> Any:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        return self.parser_backends[self.backend](content.split('\n'))
+
+    def _parse_lines_lexer(self, lines: Iterable[str]) -> Union[Dict, List]:
+        return StreamingParser(self.lexer, numeric_lists=self.numeric_lists, tables=self.tables).parse_tree(lines)
+
+    def _parse_lines_classic(self, lines: Iterable[str],
+                             process_value: Optional[Callable[[str], Any]] = None) -> Union[Dict, List]:
+        # Without emit the generator yields nothing and returns the tree
+        try:
+            next(self._run_classic(lines, process_value, False))
+        except StopIteration as done:
+            return done.value
+
+    def _run_classic(self, lines: Iterable[str], process_value: Optional[Callable[[str], Any]],
+                     emit: bool) -> Iterator[StreamEvent]:
+        # Numeric list items are buffered and decoded per run, unless every value has to be seen
+        bulk = process_value is None
+        process_value = process_value or self._process_value
         result = {}
         current_key = None
         current_list = None
         indent_stack = [(-1, result)]
+        numbers: List[str] = []
+        numbers_list = None
+        # [key, indent, rows, lines, line number] of a table block being collected
+        table = None
+        # With emit, (key, line number) of top-level keys not emitted yet, in document order.
+        # A key is emitted once no later line can change its value
+        waiting: Deque[Tuple[str, int]] = deque()
+        index = 0
 
         for line_num, line in enumerate(lines, 1):
+            if table is not None:
+                text = line.lstrip()
+                if not text or text[0] == '#' or len(line) - len(text) > table[1]:
+                    table[3].append(line)
+                    continue
+                self._finish_table(result, table)
+                table = None
+
             try:
                 stripped = line.strip()
                 if not stripped or stripped.startswith('#'):
@@ -64,6 +353,16 @@ class Bellande_Format:
 
                 indent = len(line) - len(line.lstrip())
 
+                if numbers:
+                    if (current_list is numbers_list and indent > indent_stack[-1][0] and
+                            stripped[0] == '-' and ':' not in stripped):
+                        value = stripped[1:].strip()
+                        if is_number_start(value):
+                            numbers.append(value)
+                            continue
+                    numbers_list.extend(decode_numbers(numbers, process_value)[0])
+                    numbers = []
+
                 while indent_stack and indent <= indent_stack[-1][0]:
                     popped = indent_stack.pop()
                     if isinstance(popped[1], list):
@@ -72,15 +371,33 @@ class Bellande_Format:
                 if ':' in stripped:
                     key, value = map(str.strip, stripped.split(':', 1))
                     current_key = key
+                    if emit and key not in result:
+                        waiting.append((key, line_num))
                     if value:
-                        result[key] = self._process_value(value)
+                        result[key] = process_value(value)
+                        if table_rows(value) is not None:
+                            table = [key, indent, table_rows(value), [], line_num]
                     else:
                         result[key] = []
                         current_list = result[key]
                         indent_stack.append((indent, current_list))
+                    if emit:
+                        while waiting:
+                            done, start = waiting[0]
+                            entry = result[done]
+                            if (done == current_key or entry is current_list or
+                                    (numbers and entry is numbers_list)):
+                                break
+                            waiting.popleft()
+                            del result[done]
+                            yield StreamEvent("key", done, convert_lists(entry, self.numeric_lists), start)
                 elif stripped.startswith('-'):
                     value = stripped[1:].strip()
-                    parsed_value = self._process_value(value)
+                    if bulk and current_list is not None and is_number_start(value):
+                        numbers_list = current_list
+                        numbers.append(value)
+                        continue
+                    parsed_value = process_value(value)
                     if current_list is not None:
                         current_list.append(parsed_value)
                     else:
@@ -92,17 +409,54 @@ class Bellande_Format:
                             result[current_key] = [parsed_value]
                             current_list = result[current_key]
                             indent_stack.append((indent, current_list))
+                    if emit and current_list is result:
+                        # Top-level items are scalars, complete as soon as they are read
+                        for item in result:
+                            yield StreamEvent("item", index, item, line_num)
+                            index += 1
+                        result.clear()
 
             except Exception as e:
                 raise ValueError(f"Error parsing line {line_num}: {str(e)}")
 
-        return result
+        if numbers:
+            numbers_list.extend(decode_numbers(numbers, process_value)[0])
+        if table is not None:
+            self._finish_table(result, table)
+        if not emit:
+            return convert_lists(result, self.numeric_lists)
+        if result.__class__ is list:
+            for item in result:
+                yield StreamEvent("item", index, item, line_num)
+                index += 1
+        for key, start in waiting:
+            yield StreamEvent("key", key, convert_lists(result[key], self.numeric_lists), start)
+
+    def _finish_table(self, result: Dict, table: list):
+        key, _, rows, lines, line_num = table
+        if not any(line.strip() and not line.lstrip().startswith('#') for line in lines):
+            # No column block, the marker stays a plain string
+            return
+        parser = StreamingParser(self.lexer, numeric_lists=self.numeric_lists, tables=self.tables)
+        # Errors report lines of the whole document
+        parser.line_num = line_num
+        columns = parser.parse_tree(lines)
+        try:
+            result[key] = build_table(columns, rows, self.tables, self.numeric_lists)
+        except ValueError as e:
+            raise ValueError(f"Error parsing line {line_num}: {str(e)}")
 
     def _process_value(self, value: str) -> Any:
+        # Numbers first, none of the prefixes below can start with a digit, '-' or '.'
+        first = value[:1]
+        if first in NUMBER_STARTS or first.isdecimal():
+            return parse_number(value)
+
         # Process custom types
-        for type_name, deserializer in self.type_registry.deserializers.items():
-            if value.startswith(f"type:{type_name}:"):
-                type_value = value[len(f"type:{type_name}:"):]
+        if value.startswith("type:"):
+            type_name, sep, type_value = value[5:].partition(':')
+            deserializer = self.type_registry.deserializer_for(type_name) if sep else None
+            if deserializer is not None:
                 return deserializer(type_value)
 
         # Process standard types
@@ -115,53 +469,42 @@ class Bellande_Format:
         elif value.startswith('"') and value.endswith('"'):
             return value[1:-1]
         elif value.startswith('ref:'):
-            ref_key = value[4:].strip()
-            if ref_key not in self.references:
-                raise ValueError(f"Reference not found: {ref_key}")
-            return self.references[ref_key]
-        elif re.match(r'^-?\d+$', value):
-            return int(value)
-        elif re.match(r'^-?\d*\.\d+$', value):
-            return float(value)
-        
+            return self.lexer.reference(value[4:].strip())
+
         return value
 
     def write_bellande(self, data: Any, file_path: str):
-        content = self.to_bellande_string(data)
         with open(file_path, 'w', encoding='utf-8') as file:
-            file.write(content)
+            self.dump_bellande(data, file)
+
+    def dump_bellande(self, data: Any, file: TextIO):
+        self._emitter().dump(data, file)
+
+    def iter_bellande_lines(self, data: Any, indent: int = 0) -> Iterator[str]:
+        return self._emitter().iter_lines(data, indent)
+
+    def _emitter(self) -> Emitter:
+        return Emitter(self._format_value, columnar=self.columnar, min_rows=self.table_min_rows)
 
     def to_bellande_string(self, data: Any, indent: int = 0) -> str:
-        if isinstance(data, dict):
-            lines = []
-            for key, value in data.items():
-                if isinstance(value, (dict, list)):
-                    lines.append(f"{' ' * indent}{key}:")
-                    lines.append(self.to_bellande_string(value, indent + 2))
-                else:
-                    lines.append(f"{' ' * indent}{key}: {self._format_value(value)}")
-            return '\n'.join(lines)
-        elif isinstance(data, list):
-            lines = []
-            for item in data:
-                if isinstance(item, dict):
-                    dict_lines = self.to_bellande_string(item, indent + 2).split('\n')
-                    lines.append(f"{' ' * indent}- {dict_lines[0]}")
-                    lines.extend(dict_lines[1:])
-                else:
-                    lines.append(f"{' ' * indent}- {self._format_value(item)}")
-            return '\n'.join(lines)
-        else:
-            return f"{' ' * indent}{self._format_value(data)}"
+        return '\n'.join(self.iter_bellande_lines(data, indent))
+
+    def dumps_binary(self, data: Any) -> bytes:
+        return self.binary_encoder.dumps(data)
+
+    def loads_binary(self, data: Union[bytes, bytearray, memoryview], zero_copy: bool = False) -> Any:
+        # With zero_copy, bytes payloads are returned as memoryview slices of data
+        return self.binary_decoder.loads(data, zero_copy)
 
     def _format_value(self, value: Any) -> str:
         # Format custom types
-        for type_name, serializer in self.type_registry.serializers.items():
+        found = self.type_registry.serializer_for(value)
+        if found is not None:
+            type_name, serializer = found
             try:
-                if isinstance(value, self.type_registry.types[type_name]):
-                    return f"type:{type_name}:{serializer(value)}"
-            except:
-                continue
+                return f"type:{type_name}:{serializer(value)}"
+            except Exception:
+                pass
 
         # Format standard types
         if isinstance(value, str):
@@ -175,57 +518,173 @@ class Bellande_Format:
         
         return str(value)
 
-    def encrypt(self, data: Any, key: bytes) -> bytes:
+    def encrypt(self, data: Any, key: bytes, mode: str = "cbc", workers: Optional[int] = None) -> bytes:
         content = self.to_bellande_string(data)
-        return self.encryption.encrypt(content.encode(), key)
+        return self.encryption.encrypt(content.encode(), key, mode, workers)
 
-    def decrypt(self, encrypted_data: bytes, key: bytes) -> Any:
-        decrypted = self.encryption.decrypt(encrypted_data, key)
+    def decrypt(self, encrypted_data: bytes, key: bytes, mode: str = "cbc", workers: Optional[int] = None) -> Any:
+        decrypted = self.encryption.decrypt(encrypted_data, key, mode, workers)
         return self.parse_content(decrypted.decode())
 
-    def compress(self, data: Any) -> bytes:
-        content = self.to_bellande_string(data)
-        return self.compression.encode_data(content.encode())[0]
-
-    def decompress(self, compressed_data: bytes) -> Any:
-        decompressed = self.compression.decode_data(compressed_data, {})
+    def compress(self, data: Any, codec: str = "huffman", level: Optional[int] = None,
+                 block_size: Optional[int] = None, workers: Optional[int] = None) -> bytes:
+        content = self.to_bellande_string(data).encode()
+        if block_size or workers:
+            from .core.compression import DEFAULT_BLOCK_SIZE
+            return self.compression.compress_blocks(content, codec, level,
+                                                    block_size or DEFAULT_BLOCK_SIZE, workers)
+        return self.compression.compress(content, codec, level)
+
+    def decompress(self, compressed_data: bytes, workers: Optional[int] = None) -> Any:
+        decompressed = self.compression.decompress(compressed_data, workers)
         return self.parse_content(decompressed.decode())
 
-def main():
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Usage: bellande_format <command> [<file_path>] [<input_data>]")
-        return 1
-
-    formatter = Bellande_Format()
-    command = sys.argv[1]
+# Schema files the validate command keeps compiled, least recently used go first
+MAX_FILE_SCHEMAS = 32
+
+def file_schema(formatter: Bellande_Format, schema_path: str) -> str:
+    # Compiled once per schema file version, a server reuses them across requests
+    stat = os.stat(schema_path)
+    schema_name = f"file:{os.path.abspath(schema_path)}:{stat.st_mtime_ns}"
+    if schema_name in formatter.compiled_schemas:
+        # Reinserted, dicts keep insertion order and the oldest entry is the least recently used
+        formatter.schemas[schema_name] = formatter.schemas.pop(schema_name)
+        formatter.compiled_schemas[schema_name] = formatter.compiled_schemas.pop(schema_name)
+        return schema_name
+    from .core.batch import load_schema
+    formatter.register_schema(schema_name, load_schema(Bellande_Format, schema_path))
+    loaded = [name for name in formatter.compiled_schemas if name.startswith("file:")]
+    for name in loaded[:-MAX_FILE_SCHEMAS]:
+        del formatter.schemas[name]
+        del formatter.compiled_schemas[name]
+    return schema_name
+
+def run_command(formatter: Bellande_Format, argv: List[str], stdout: TextIO, stderr: TextIO) -> int:
+    # argv without the program name, shared by the CLI and the parse server
+    command = argv[0]
 
     try:
         if command == 'parse':
-            if len(sys.argv) < 3:
-                print("Error: Please provide a file path to parse.")
+            if len(argv) < 2:
+                print("Error: Please provide a file path to parse.", file=stdout)
                 return 1
-            result = formatter.parse_bellande(sys.argv[2])
-            print(json.dumps(result, default=str))
+            result = formatter.parse_bellande(argv[1])
+            print(json.dumps(result, default=str), file=stdout)
             return 0
 
         elif command == 'write':
-            if len(sys.argv) < 4:
-                print("Error: Please provide a file path and input data.")
+            if len(argv) < 3:
+                print("Error: Please provide a file path and input data.", file=stdout)
+                return 1
+            data = json.loads(argv[2])
+            formatter.write_bellande(data, argv[1])
+            print(f"Data written to {argv[1]}", file=stdout)
+            return 0
+
+        elif command == 'validate':
+            if len(argv) < 3:
+                print("Error: Please provide a file path and a schema file.", file=stdout)
+                return 1
+            schema_name = file_schema(formatter, argv[2])
+            result = formatter.validate(formatter.parse_bellande(argv[1]), schema_name)
+            print(json.dumps({"valid": result.is_valid, "errors": result.errors, "warnings": result.warnings}),
+                  file=stdout)
+            return 0 if result.is_valid else 1
+
+        elif command == 'query':
+            if len(argv) < 3:
+                print("Error: Please provide a file path and a query expression.", file=stdout)
+                return 1
+            for value in formatter.iter_select(argv[1], argv[2]):
+                print(json.dumps(value, default=str), file=stdout)
+            return 0
+
+        elif command == 'diff':
+            if len(argv) < 3:
+                print("Error: Please provide an old and a new file path.", file=stdout)
+                return 1
+            # Diff, patch and merge read through the lexer, the classic backend flattens lists of keyed items
+            old = formatter.parse_nested(argv[1])
+            new = formatter.parse_nested(argv[2])
+            patch = formatter.diff(old, new, argv[3] if len(argv) > 3 else None)
+            print(formatter.patch_to_bellande(patch), file=stdout)
+            return 0
+
+        elif command == 'patch':
+            if len(argv) < 3:
+                print("Error: Please provide a file path and a patch file.", file=stdout)
+                return 1
+            with open(argv[2], 'r', encoding='utf-8') as file:
+                patch = formatter.parse_patch(file.read())
+            output = argv[3] if len(argv) > 3 else argv[1]
+            data = formatter.parse_nested(argv[1])
+            formatter.write_bellande(formatter.apply_patch(data, patch), output)
+            print(f"Data written to {output}", file=stdout)
+            return 0
+
+        elif command == 'merge':
+            if len(argv) < 5:
+                print("Error: Please provide base, ours, theirs and output file paths.", file=stdout)
+                return 1
+            documents = [formatter.parse_nested(path) for path in argv[1:4]]
+            merged, conflicts = formatter.merge(*documents, argv[5] if len(argv) > 5 else None)
+            formatter.write_bellande(merged, argv[4])
+            for conflict in conflicts:
+                print(f"Conflict at {format_path(conflict.path)}, kept ours", file=stderr)
+            print(f"Data written to {argv[4]}", file=stdout)
+            return 1 if conflicts else 0
+
+        elif command == 'batch':
+            from .core.batch import batch_main
+            return batch_main(argv[1:], Bellande_Format, stdout, stderr)
+
+        elif command == 'to-binary':
+            if len(argv) < 3:
+                print("Error: Please provide an input and an output file path.", file=stdout)
+                return 1
+            data = formatter.parse_bellande(argv[1])
+            with open(argv[2], 'wb') as file:
+                file.write(formatter.dumps_binary(data))
+            print(f"Data written to {argv[2]}", file=stdout)
+            return 0
+
+        elif command == 'from-binary':
+            if len(argv) < 3:
+                print("Error: Please provide an input and an output file path.", file=stdout)
                 return 1
-            data = json.loads(sys.argv[3])
-            formatter.write_bellande(data, sys.argv[2])
-            print(f"Data written to {sys.argv[2]}")
+            with open(argv[1], 'rb') as file:
+                data = formatter.loads_binary(file.read())
+            formatter.write_bellande(data, argv[2])
+            print(f"Data written to {argv[2]}", file=stdout)
             return 0
 
         else:
-            print(f"Unknown command: {command}")
+            print(f"Unknown command: {command}", file=stdout)
             return 1
 
     except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
+        print(f"Error: {e}", file=stderr)
         return 1
 
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: bellande_format <command> [<file_path>] [<input_data>]")
+        print("Commands: parse, write, validate <file_path> <schema>, query <file_path> <expression>,")
+        print("          to-binary <input> <output>, from-binary <input> <output>,")
+        print("          diff <old> <new> [key], patch <file> <patch> [output],")
+        print("          merge <base> <ours> <theirs> <output> [key],")
+        print("          batch parse|write|validate|compress <glob-or-dir> [options],")
+        print("          serve [--socket PATH] [--backend NAME] [--file-references]")
+        return 1
+
+    argv = sys.argv[1:]
+    if argv[0] == 'serve':
+        return serve_main(argv[1:], Bellande_Format, run_command)
+    # Served commands (parse, write, query, diff, ...) go to a running server, in process when there is none
+    exit_code = forward(argv, sys.stdout, sys.stderr)
+    if exit_code is not None:
+        return exit_code
+    return run_command(Bellande_Format(), argv, sys.stdout, sys.stderr)
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,198 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from .validation import schema_from_dict
+
+BATCH_OPERATIONS = ("parse", "write", "validate", "compress")
+
+# Files picked up when the target is a directory
+DEFAULT_PATTERNS = {"parse": "*.bellande", "write": "*.json", "validate": "*.bellande", "compress": "*.bellande"}
+
+BATCH_SCHEMA = "batch"
+
+def collect_files(target: str, operation: str) -> List[str]:
+    if os.path.isdir(target):
+        pattern = os.path.join(target, '**', DEFAULT_PATTERNS[operation])
+    else:
+        pattern = target
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+def output_path(path: str, suffix: str, options: Dict[str, Any]) -> str:
+    # Outputs keep their layout below the input root, next to the input without an output dir
+    stem = os.path.splitext(path)[0] if suffix != ".blfc" else path
+    if not options.get("output_dir"):
+        return stem + suffix
+    relative = os.path.relpath(stem, options["root"])
+    destination = os.path.join(options["output_dir"], relative + suffix)
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    return destination
+
+def _batch_parse(formatter: Any, path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    return {"data": formatter.parse_bellande(path)}
+
+def _batch_write(formatter: Any, path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    destination = output_path(path, ".bellande", options)
+    formatter.write_bellande(data, destination)
+    return {"output": destination}
+
+def _batch_validate(formatter: Any, path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    result = formatter.validate(formatter.parse_bellande(path), BATCH_SCHEMA)
+    return {"valid": result.is_valid, "errors": result.errors}
+
+def _batch_compress(formatter: Any, path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    with open(path, 'rb') as file:
+        raw = file.read()
+    # The file text goes into the container as is, Bellande_Format.decompress parses it back
+    blob = formatter.compression.compress(raw, options["codec"], options.get("level"))
+    destination = output_path(path, ".blfc", options)
+    with open(destination, 'wb') as file:
+        file.write(blob)
+    return {"output": destination, "size": len(raw), "compressed_size": len(blob)}
+
+BATCH_HANDLERS: Dict[str, Callable[[Any, str, Dict[str, Any]], Dict[str, Any]]] = {
+    "parse": _batch_parse,
+    "write": _batch_write,
+    "validate": _batch_validate,
+    "compress": _batch_compress,
+}
+
+_worker_formatter = None
+_worker_options: Dict[str, Any] = {}
+
+def _init_batch_worker(factory: Callable[..., Any], options: Dict[str, Any]):
+    global _worker_formatter, _worker_options
+    _worker_formatter = factory(backend=options["backend"])
+    if options.get("schema") is not None:
+        _worker_formatter.register_schema(BATCH_SCHEMA, options["schema"])
+    _worker_options = options
+
+def _run_batch_file(path: str) -> Dict[str, Any]:
+    options = _worker_options
+    record: Dict[str, Any] = {"file": path, "operation": options["operation"], "ok": True}
+    start = time.perf_counter()
+    try:
+        record.update(BATCH_HANDLERS[options["operation"]](_worker_formatter, path, options))
+    except Exception as e:
+        record["ok"] = False
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed"] = round(time.perf_counter() - start, 6)
+    return record
+
+def run_batch(files: List[str], options: Dict[str, Any], factory: Callable[..., Any],
+              workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    # Yields one record per file in completion order, the formatter is built once per worker
+    if not workers or workers <= 1 or len(files) <= 1:
+        _init_batch_worker(factory, options)
+        for path in files:
+            yield _run_batch_file(path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(factory, options)) as executor:
+        futures = [executor.submit(_run_batch_file, path) for path in files]
+        for future in as_completed(futures):
+            yield future.result()
+
+def load_schema(factory: Callable[..., Any], path: str) -> Any:
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as file:
+            definition = json.load(file)
+    else:
+        definition = factory(backend="lexer").parse_bellande(path)
+    return schema_from_dict(definition)
+
+def batch_main(argv: List[str], factory: Callable[..., Any], stdout: Optional[TextIO] = None,
+               stderr: Optional[TextIO] = None) -> int:
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    parser = argparse.ArgumentParser(prog="bellande_format batch",
+                                     description="Run an operation over many files, one NDJSON record per file")
+    parser.add_argument("operation", choices=BATCH_OPERATIONS)
+    parser.add_argument("targets", nargs="+", help="directories, files or glob patterns (use ** for recursion)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output-dir", help="write outputs here instead of next to the inputs")
+    parser.add_argument("--schema", help="schema file (.json or .bellande) for validate")
+    parser.add_argument("--codec", default="huffman", help="codec or preset for compress")
+    parser.add_argument("--level", type=int)
+    parser.add_argument("--backend", default="classic")
+    parser.add_argument("--no-data", action="store_true", help="omit parsed data from parse records")
+    progress = parser.add_mutually_exclusive_group()
+    progress.add_argument("--progress", dest="progress", action="store_true", default=None)
+    progress.add_argument("--no-progress", dest="progress", action="store_false")
+    args = parser.parse_args(argv)
+
+    if args.operation == "validate" and not args.schema:
+        print("Error: validate needs --schema", file=stderr)
+        return 1
+
+    files = sorted({path for target in args.targets for path in collect_files(target, args.operation)})
+    if not files:
+        print(f"Error: no files match {' '.join(args.targets)}", file=stderr)
+        return 1
+
+    options = {
+        "operation": args.operation,
+        "backend": args.backend,
+        "codec": args.codec,
+        "level": args.level,
+        "output_dir": args.output_dir,
+        "root": os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files]),
+        "schema": load_schema(factory, args.schema) if args.schema else None,
+    }
+    show_progress = stderr.isatty() if args.progress is None else args.progress
+
+    started = time.perf_counter()
+    failures: List[Dict[str, Any]] = []
+    invalid = 0
+    timings: List[tuple] = []
+    for done, record in enumerate(run_batch(files, options, factory, args.workers), 1):
+        if args.no_data:
+            record.pop("data", None)
+        stdout.write(json.dumps(record, default=str) + "\n")
+        stdout.flush()
+        timings.append((record["elapsed"], record["file"]))
+        if not record["ok"]:
+            failures.append(record)
+        elif record.get("valid") is False:
+            invalid += 1
+        if show_progress:
+            stderr.write(f"\r{done}/{len(files)} files, {len(failures)} failed")
+            stderr.flush()
+    elapsed = time.perf_counter() - started
+
+    if show_progress:
+        stderr.write("\n")
+    summary = (f"batch {args.operation}: {len(files)} files, {len(files) - len(failures)} ok, "
+               f"{len(failures)} failed")
+    if args.operation == "validate":
+        summary += f", {invalid} invalid"
+    print(f"{summary} in {elapsed:.2f}s ({len(files) / elapsed:.1f} files/s)", file=stderr)
+    slowest = sorted(timings, reverse=True)[:5]
+    print("slowest: " + ", ".join(f"{path} {seconds:.3f}s" for seconds, path in slowest), file=stderr)
+    for record in failures:
+        print(f"failed: {record['file']}: {record['error']}", file=stderr)
+    return 1 if failures or invalid else 0
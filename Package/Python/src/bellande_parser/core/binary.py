@@ -0,0 +1,297 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import struct
+from .custom_types import CustomTypeRegistry
+from .numeric import ARRAY_TYPES
+from .tabular import Table
+
+# Sequences written as lists through their tolist()
+LIST_LIKE = ARRAY_TYPES + (Table,)
+
+BINARY_MAGIC = b"BLFB"
+BINARY_VERSION = 1
+
+NULL = 0
+FALSE = 1
+TRUE = 2
+INT = 3
+FLOAT = 4
+STRING = 5
+BYTES = 6
+LIST = 7
+DICT = 8
+CUSTOM = 9
+
+DOUBLE = struct.Struct('<d')
+
+# One sample per native class, used to find classes the type registry overrides
+NATIVE_SAMPLES = ("", 0, 0.0, False, None, {}, [], b"")
+
+def write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(buffer: memoryview, position: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+class BinaryEncoder:
+    def __init__(self, type_registry: CustomTypeRegistry):
+        self.type_registry = type_registry
+
+    def dumps(self, data: Any) -> bytes:
+        out = bytearray(BINARY_MAGIC)
+        out.append(BINARY_VERSION)
+        registry = self.type_registry
+        native = {sample.__class__ for sample in NATIVE_SAMPLES if registry.serializer_for(sample) is None}
+        # Keys and custom type names are written once, later uses refer to their table index
+        table: Dict[str, int] = {}
+        pack_double = DOUBLE.pack
+        append = out.append
+        extend = out.extend
+
+        def write_name(name: str):
+            index = table.get(name)
+            if index is not None:
+                write_varint(out, index << 1)
+                return
+            table[name] = len(table)
+            encoded = name.encode('utf-8')
+            write_varint(out, (len(encoded) << 1) | 1)
+            extend(encoded)
+
+        def write(value: Any) -> Optional[Tuple[Iterator[Any], bool]]:
+            # Writes a value or a container header, a container's children and whether they are
+            # (key, value) pairs are returned to the caller
+            cls = value.__class__
+            if cls not in native:
+                found = registry.serializer_for(value)
+                if found is not None:
+                    type_name, serializer = found
+                    try:
+                        payload = serializer(value).encode('utf-8')
+                    except Exception:
+                        payload = None
+                    if payload is not None:
+                        append(CUSTOM)
+                        write_name(type_name)
+                        write_varint(out, len(payload))
+                        extend(payload)
+                        return None
+                cls = self._native_class(value)
+                if cls is list and isinstance(value, LIST_LIKE):
+                    value = value.tolist()
+
+            if cls is str:
+                encoded = value.encode('utf-8')
+                length = len(encoded)
+                if length < 0x80:
+                    append(STRING)
+                    append(length)
+                else:
+                    append(STRING)
+                    write_varint(out, length)
+                extend(encoded)
+            elif cls is dict:
+                append(DICT)
+                write_varint(out, len(value))
+                return iter(value.items()), True
+            elif cls is list:
+                append(LIST)
+                write_varint(out, len(value))
+                return iter(value), False
+            elif cls is int:
+                append(INT)
+                write_varint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+            elif cls is float:
+                append(FLOAT)
+                extend(pack_double(value))
+            elif cls is bool:
+                append(TRUE if value else FALSE)
+            elif value is None:
+                append(NULL)
+            elif cls is bytes:
+                append(BYTES)
+                write_varint(out, len(value))
+                extend(value)
+            else:
+                raise ValueError(f"Cannot encode {type(value).__name__} in binary format")
+            return None
+
+        # Children of the open containers, an explicit stack so nesting depth is not bound by recursion
+        stack = [(iter((data,)), False)]
+        while stack:
+            children, keyed = stack[-1]
+            for value in children:
+                if keyed:
+                    key, value = value
+                    if key.__class__ is not str and not isinstance(key, str):
+                        raise ValueError(f"Binary keys must be strings, got {type(key).__name__}")
+                    write_name(key)
+                nested = write(value)
+                if nested is not None:
+                    stack.append(nested)
+                    break
+            else:
+                stack.pop()
+        return bytes(out)
+
+    def _native_class(self, value: Any) -> type:
+        # Subclasses and look-alikes (tuples, bytearrays, frozen views) map onto the native classes
+        if isinstance(value, bool):
+            return bool
+        for cls in (str, int, float, dict, list):
+            if isinstance(value, cls):
+                return cls
+        if isinstance(value, (tuple,) + LIST_LIKE):
+            return list
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes
+        return value.__class__
+
+class BinaryDecoder:
+    def __init__(self, type_registry: CustomTypeRegistry):
+        self.type_registry = type_registry
+
+    def loads(self, data: Union[bytes, bytearray, memoryview], zero_copy: bool = False) -> Any:
+        buffer = memoryview(data).cast('B') if isinstance(data, memoryview) else memoryview(data)
+        if bytes(buffer[:4]) != BINARY_MAGIC:
+            raise ValueError("Invalid binary data: bad magic")
+        if len(buffer) < 6:
+            raise ValueError("Invalid binary data: truncated or corrupt")
+        if buffer[4] != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary version {buffer[4]}")
+
+        table: List[str] = []
+        deserializer_for = self.type_registry.deserializer_for
+        unpack_double = DOUBLE.unpack_from
+
+        def read_name(position: int) -> Tuple[str, int]:
+            value, position = read_varint(buffer, position)
+            if not value & 1:
+                return table[value >> 1], position
+            end = position + (value >> 1)
+            name = str(buffer[position:end], 'utf-8')
+            table.append(name)
+            return name, end
+
+        def read(position: int) -> Tuple[Any, int]:
+            # The open container is kept in locals, its parents on an explicit stack so nesting depth
+            # is not bound by recursion. key is the slot of the next value in a mapping
+            stack: List[tuple] = []
+            container: Any = None
+            remaining = 0
+            key = None
+            keyed = False
+            while True:
+                if keyed:
+                    reference = buffer[position]
+                    if reference < 0x80 and not reference & 1:
+                        key = table[reference >> 1]
+                        position += 1
+                    else:
+                        key, position = read_name(position)
+                tag = buffer[position]
+                position += 1
+                # Single byte lengths, counts and key references are decoded inline
+                if tag == STRING:
+                    length = buffer[position]
+                    if length < 0x80:
+                        position += 1
+                    else:
+                        length, position = read_varint(buffer, position)
+                    end = position + length
+                    value = str(buffer[position:end], 'utf-8')
+                    position = end
+                elif tag == DICT or tag == LIST:
+                    count = buffer[position]
+                    if count < 0x80:
+                        position += 1
+                    else:
+                        count, position = read_varint(buffer, position)
+                    value = {} if tag == DICT else []
+                    if count:
+                        stack.append((container, remaining, key, keyed))
+                        container = value
+                        remaining = count
+                        keyed = tag == DICT
+                        continue
+                elif tag == INT:
+                    value, position = read_varint(buffer, position)
+                    value = -(value >> 1) - 1 if value & 1 else value >> 1
+                elif tag == FLOAT:
+                    value = unpack_double(buffer, position)[0]
+                    position += 8
+                elif tag == NULL:
+                    value = None
+                elif tag == TRUE:
+                    value = True
+                elif tag == FALSE:
+                    value = False
+                elif tag == BYTES:
+                    length, position = read_varint(buffer, position)
+                    end = position + length
+                    payload = buffer[position:end]
+                    value = payload if zero_copy else payload.tobytes()
+                    position = end
+                elif tag == CUSTOM:
+                    type_name, position = read_name(position)
+                    length, position = read_varint(buffer, position)
+                    end = position + length
+                    payload = str(buffer[position:end], 'utf-8')
+                    deserializer = deserializer_for(type_name)
+                    # Unknown types stay strings, the same as the text parser
+                    value = f"type:{type_name}:{payload}" if deserializer is None else deserializer(payload)
+                    position = end
+                else:
+                    raise ValueError(f"Invalid binary data: unknown tag {tag} at offset {position - 1}")
+
+                # Completed values close every container they fill up
+                while container is not None:
+                    if keyed:
+                        container[key] = value
+                    else:
+                        container.append(value)
+                    remaining -= 1
+                    if remaining:
+                        break
+                    value = container
+                    container, remaining, key, keyed = stack.pop()
+                else:
+                    return value, position
+
+        try:
+            value, position = read(5)
+        except (IndexError, struct.error):
+            # struct.error from a float cut short
+            raise ValueError("Invalid binary data: truncated or corrupt")
+        if position > len(buffer):
+            raise ValueError("Invalid binary data: truncated or corrupt")
+        if position < len(buffer):
+            raise ValueError("Invalid binary data: trailing bytes")
+        return value
@@ -0,0 +1,197 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+from array import array
+import hashlib
+import os
+import sys
+import threading
+from .types import CacheStats
+from .numeric import NumpyArray
+from .tabular import Table
+
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError(f"{self.__class__.__name__} is immutable, use thaw() for a mutable copy")
+
+# Subclasses keep cached results usable anywhere a dict or list is expected (json, emitter, validation)
+class FrozenDict(dict):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+class FrozenList(list):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+class FrozenArray(array):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = reverse = byteswap = _immutable
+    frombytes = fromfile = fromlist = fromunicode = _immutable
+
+    def __reduce__(self):
+        return (FrozenArray, (self.typecode, self.tobytes()))
+
+def freeze(value: Any, memo: Optional[Dict[int, Any]] = None) -> Tuple[Any, int]:
+    # Returns the frozen tree and an estimate of its size in bytes, shared subtrees stay shared
+    if isinstance(value, (dict, list)):
+        if memo is None:
+            memo = {}
+        elif id(value) in memo:
+            return memo[id(value)], 0
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        items = {}
+        for key, item in value.items():
+            items[key], item_size = freeze(item, memo)
+            size += item_size + sys.getsizeof(key)
+        memo[id(value)] = frozen = FrozenDict(items)
+        return frozen, size
+    if isinstance(value, list):
+        items = []
+        for item in value:
+            frozen, item_size = freeze(item, memo)
+            items.append(frozen)
+            size += item_size
+        memo[id(value)] = frozen = FrozenList(items)
+        return frozen, size
+    if isinstance(value, array):
+        return FrozenArray(value.typecode, value), size
+    if isinstance(value, Table):
+        columns, columns_size = freeze(value.columns, memo)
+        return Table(columns, value.length), size + columns_size
+    if isinstance(value, NumpyArray):
+        value.flags.writeable = False
+    return value, size
+
+def thaw(value: Any, memo: Optional[Dict[int, Any]] = None) -> Any:
+    if isinstance(value, (dict, list)):
+        if memo is None:
+            memo = {}
+        elif id(value) in memo:
+            return memo[id(value)]
+    if isinstance(value, dict):
+        memo[id(value)] = thawed = {}
+        for key, item in value.items():
+            thawed[key] = thaw(item, memo)
+        return thawed
+    if isinstance(value, list):
+        memo[id(value)] = thawed = []
+        for item in value:
+            thawed.append(thaw(item, memo))
+        return thawed
+    if isinstance(value, array):
+        return array(value.typecode, value)
+    if isinstance(value, NumpyArray):
+        return value.copy()
+    if isinstance(value, Table):
+        return Table(thaw(value.columns, memo), value.length)
+    return value
+
+def content_hash(content: bytes) -> bytes:
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+class CacheEntry:
+    __slots__ = ("signature", "digest", "value", "size")
+
+    def __init__(self, signature: Tuple, digest: Optional[bytes], value: Any, size: int):
+        self.signature = signature
+        self.digest = digest
+        self.value = value
+        self.size = size
+
+class ParseCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 hash_content: bool = False):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self.entries: 'OrderedDict[Hashable, CacheEntry]' = OrderedDict()
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+
+    def get(self, file_path: str, variant: Hashable, loader: Callable[[str], Any]) -> Any:
+        key = (os.path.abspath(file_path), variant)
+        stat = os.stat(file_path)
+        signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.signature == signature:
+                return self._hit(key, entry)
+
+        with open(file_path, 'rb') as file:
+            raw = file.read()
+        digest = content_hash(raw) if self.hash_content else None
+
+        if digest is not None:
+            # Touched or rewritten with the same bytes, the parsed tree is still valid
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and entry.digest == digest:
+                    entry.signature = signature
+                    return self._hit(key, entry)
+
+        value, size = freeze(loader(raw.decode('utf-8')))
+        with self.lock:
+            self.stats.misses += 1
+            self._discard(key)
+            if size <= self.max_bytes:
+                self.entries[key] = CacheEntry(signature, digest, value, size)
+                self.stats.bytes += size
+                self._evict()
+            self.stats.entries = len(self.entries)
+        return value
+
+    def invalidate(self, file_path: Optional[str] = None):
+        with self.lock:
+            if file_path is None:
+                self.entries.clear()
+                self.stats.bytes = 0
+            else:
+                path = os.path.abspath(file_path)
+                for key in [key for key in self.entries if key[0] == path]:
+                    self._discard(key)
+            self.stats.entries = len(self.entries)
+
+    def _hit(self, key: Hashable, entry: CacheEntry) -> Any:
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry.value
+
+    def _discard(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.stats.bytes -= entry.size
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.stats.bytes > self.max_bytes):
+            _, entry = self.entries.popitem(last=False)
+            self.stats.bytes -= entry.size
+            self.stats.evictions += 1
@@ -15,10 +15,51 @@
 
 #!/usr/bin/env python3
 
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import heapq
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from collections import Counter
+import importlib.util
+from .numeric import load_numpy
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+
+MAX_CODE_LENGTH = 15
+TABLE_BITS = 12
+ENCODE_BLOCK = 64 * 1024
+NUMPY_BLOCK = 1024 * 1024
+
+# magic, version, codec id, flags, original length, crc32, parameter length
+CONTAINER_MAGIC = b"BLFC"
+CONTAINER_VERSION = 1
+CONTAINER_HEADER = struct.Struct('>4sBBHQII')
+
+# Block mode: the parameters hold the block size and count followed by one
+# (payload offset, container size) entry per block, each block is itself a
+# complete single-block container with its own code table and checksum
+FLAG_BLOCKS = 0x0001
+DEFAULT_BLOCK_SIZE = 256 * 1024
+BLOCK_INDEX_HEADER = struct.Struct('>II')
+BLOCK_INDEX_ENTRY = struct.Struct('>QI')
+
+# Named speed/ratio trade-offs, resolved to a codec and level
+CODEC_PRESETS = {
+    "fast": ("zlib", 1),
+    "balanced": ("zlib", 6),
+    "best": ("lzma", 9),
+}
 
 @dataclass
 class HuffmanNode:
@@ -30,25 +71,204 @@ class HuffmanNode:
     def __lt__(self, other):
         return self.freq < other.freq
 
+class Codec:
+    codec_id = 0
+    name = "store"
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> Tuple[bytes, bytes]:
+        return bytes(data), b""
+
+    def decompress(self, payload: bytes, params: bytes, original_length: int) -> bytes:
+        return bytes(payload)
+
+class HuffmanCodec(Codec):
+    codec_id = 1
+    name = "huffman"
+
+    def __init__(self, compression: 'Compression'):
+        self.compression = compression
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> Tuple[bytes, bytes]:
+        encoded, metadata = self.compression.encode_data(data)
+        # Padding byte followed by the 256 canonical lengths packed two per byte
+        lengths = metadata["lengths"]
+        packed = bytes((lengths[i] << 4) | lengths[i + 1] for i in range(0, 256, 2))
+        return encoded, bytes([metadata["padding"]]) + packed
+
+    def decompress(self, payload: bytes, params: bytes, original_length: int) -> bytes:
+        if len(params) != 129:
+            raise ValueError("Invalid Huffman parameters")
+        lengths = bytearray(256)
+        for i, byte in enumerate(params[1:]):
+            lengths[2 * i] = byte >> 4
+            lengths[2 * i + 1] = byte & 0x0F
+        metadata = {"padding": params[0], "lengths": bytes(lengths), "length": original_length}
+        return self.compression.decode_data(payload, metadata)
+
+class ZlibCodec(Codec):
+    codec_id = 2
+    name = "zlib"
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> Tuple[bytes, bytes]:
+        return zlib.compress(data, 6 if level is None else level), b""
+
+    def decompress(self, payload: bytes, params: bytes, original_length: int) -> bytes:
+        return zlib.decompress(payload)
+
+class LzmaCodec(Codec):
+    codec_id = 3
+    name = "lzma"
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> Tuple[bytes, bytes]:
+        return lzma.compress(data, preset=6 if level is None else level), b""
+
+    def decompress(self, payload: bytes, params: bytes, original_length: int) -> bytes:
+        return lzma.decompress(payload)
+
+class Bz2Codec(Codec):
+    codec_id = 4
+    name = "bz2"
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> Tuple[bytes, bytes]:
+        return bz2.compress(data, 9 if level is None else level), b""
+
+    def decompress(self, payload: bytes, params: bytes, original_length: int) -> bytes:
+        return bz2.decompress(payload)
+
 class Compression:
     def __init__(self):
-        self.huffman_codes: Dict[str, str] = {}
+        self.huffman_codes: Dict[int, str] = {}
+        # numpy itself is imported by the first block large enough to use it
+        self.use_numpy = importlib.util.find_spec("numpy") is not None
+        self.codecs: Dict[str, Codec] = {}
+        self.codec_ids: Dict[int, Codec] = {}
+        self.register_codec(Codec())
+        self.register_codec(HuffmanCodec(self))
+        self.register_codec(ZlibCodec())
+        if lzma is not None:
+            self.register_codec(LzmaCodec())
+        if bz2 is not None:
+            self.register_codec(Bz2Codec())
+
+    def register_codec(self, codec: Codec):
+        self.codecs[codec.name] = codec
+        self.codec_ids[codec.codec_id] = codec
+
+    def resolve_codec(self, codec: str, level: Optional[int] = None) -> Tuple[Codec, Optional[int]]:
+        if codec in CODEC_PRESETS:
+            codec, preset_level = CODEC_PRESETS[codec]
+            level = preset_level if level is None else level
+        if codec not in self.codecs:
+            raise ValueError(f"Codec {codec} not found")
+        return self.codecs[codec], level
+
+    def compress(self, data: bytes, codec: str = "huffman", level: Optional[int] = None) -> bytes:
+        selected, level = self.resolve_codec(codec, level)
+        payload, params = selected.compress(data, level)
+        header = CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, selected.codec_id, 0,
+                                       len(data), zlib.crc32(data), len(params))
+        return header + params + payload
+
+    def read_header(self, blob: bytes) -> Dict:
+        if len(blob) < CONTAINER_HEADER.size:
+            raise ValueError("Truncated compressed container")
+        magic, version, codec_id, flags, length, checksum, params_length = CONTAINER_HEADER.unpack_from(blob)
+        if magic != CONTAINER_MAGIC:
+            raise ValueError("Not a Bellande compressed container")
+        if version > CONTAINER_VERSION:
+            raise ValueError(f"Unsupported container version: {version}")
+        if codec_id not in self.codec_ids:
+            raise ValueError(f"Codec {codec_id} not found")
+        return {"version": version, "codec": self.codec_ids[codec_id].name, "codec_id": codec_id,
+                "flags": flags, "length": length, "checksum": checksum,
+                "params_offset": CONTAINER_HEADER.size, "params_length": params_length}
+
+    def decompress(self, blob: bytes, workers: Optional[int] = None) -> bytes:
+        header = self.read_header(blob)
+        view = memoryview(blob)
+        start = header["params_offset"]
+        params = bytes(view[start:start + header["params_length"]])
+        payload = view[start + header["params_length"]:]
+
+        if header["flags"] & FLAG_BLOCKS:
+            index = self.read_block_index(blob)
+            blocks = [bytes(payload[offset:offset + size]) for offset, size in index["blocks"]]
+            data = b"".join(self._map_blocks(_decompress_block, blocks, workers))
+        else:
+            data = self.codec_ids[header["codec_id"]].decompress(payload, params, header["length"])
+
+        if len(data) != header["length"] or zlib.crc32(data) != header["checksum"]:
+            raise ValueError("Checksum mismatch in compressed container")
+        return data
+
+    def compress_blocks(self, data: bytes, codec: str = "huffman", level: Optional[int] = None,
+                        block_size: int = DEFAULT_BLOCK_SIZE, workers: Optional[int] = None) -> bytes:
+        selected, level = self.resolve_codec(codec, level)
+        view = memoryview(data)
+        jobs = [(selected.name, level, bytes(view[i:i + block_size]))
+                for i in range(0, len(data), block_size)]
+        blocks = self._map_blocks(_compress_block, jobs, workers)
+
+        index = bytearray(BLOCK_INDEX_HEADER.pack(block_size, len(blocks)))
+        offset = 0
+        for block in blocks:
+            index += BLOCK_INDEX_ENTRY.pack(offset, len(block))
+            offset += len(block)
+
+        header = CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, selected.codec_id, FLAG_BLOCKS,
+                                       len(data), zlib.crc32(data), len(index))
+        return b"".join([header, bytes(index)] + blocks)
+
+    def read_block_index(self, blob: bytes) -> Dict:
+        header = self.read_header(blob)
+        if not header["flags"] & FLAG_BLOCKS:
+            raise ValueError("Container is not block compressed")
+        start = header["params_offset"]
+        block_size, count = BLOCK_INDEX_HEADER.unpack_from(blob, start)
+        blocks = [BLOCK_INDEX_ENTRY.unpack_from(blob, start + BLOCK_INDEX_HEADER.size + i * BLOCK_INDEX_ENTRY.size)
+                  for i in range(count)]
+        return {"block_size": block_size, "blocks": blocks,
+                "payload_offset": start + header["params_length"], "length": header["length"]}
+
+    def decompress_range(self, blob: bytes, start: int, end: Optional[int] = None) -> bytes:
+        # Only the blocks overlapping [start, end) are decoded
+        index = self.read_block_index(blob)
+        block_size = index["block_size"]
+        end = index["length"] if end is None else min(end, index["length"])
+        if start >= end:
+            return b""
+
+        view = memoryview(blob)
+        base = index["payload_offset"]
+        first, last = start // block_size, (end - 1) // block_size
+        parts = []
+        for offset, size in index["blocks"][first:last + 1]:
+            parts.append(self.decompress(view[base + offset:base + offset + size]))
+        data = b"".join(parts)
+        return data[start - first * block_size:end - first * block_size]
+
+    def _map_blocks(self, function, jobs: List, workers: Optional[int]) -> List[bytes]:
+        if not workers or workers <= 1 or len(jobs) <= 1:
+            return [function(job, self) for job in jobs]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(function, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
 
     def build_huffman_tree(self, data: bytes) -> HuffmanNode:
-        # Count frequency of each byte
-        freq = Counter(data)
-        
-        # Create heap of HuffmanNodes
+        return self._build_tree(Counter(data))
+
+    def _build_tree(self, freq: Dict[int, int]) -> HuffmanNode:
+        # Create heap of HuffmanNodes, in symbol order so ties resolve the same
+        # way whichever counter produced the frequencies
         heap: List[HuffmanNode] = []
-        for char, frequency in freq.items():
+        for char, frequency in sorted(freq.items()):
             node = HuffmanNode(char=char, freq=frequency)
             heapq.heappush(heap, node)
-        
+
         # Build the tree
         while len(heap) > 1:
             left = heapq.heappop(heap)
             right = heapq.heappop(heap)
-            
+
             internal = HuffmanNode(
                 char=None,
                 freq=left.freq + right.freq,
@@ -56,57 +276,226 @@ class Compression:
                 right=right
             )
             heapq.heappush(heap, internal)
-            
+
         return heap[0]
 
     def generate_codes(self, node: HuffmanNode, code: str = ""):
         if node is None:
             return
-            
+
         if node.char is not None:
             self.huffman_codes[node.char] = code
             return
-            
+
         self.generate_codes(node.left, code + "0")
         self.generate_codes(node.right, code + "1")
 
+    def frequencies(self, data: bytes) -> Dict[int, int]:
+        if self.use_numpy and len(data) >= ENCODE_BLOCK:
+            np = load_numpy()
+            counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+            return {char: int(count) for char, count in enumerate(counts) if count}
+        return Counter(data)
+
+    def code_lengths(self, data: bytes) -> List[int]:
+        lengths = [0] * 256
+        freq = self.frequencies(data)
+        if not freq:
+            return lengths
+        if len(freq) == 1:
+            lengths[next(iter(freq))] = 1
+            return lengths
+
+        while True:
+            stack = [(self._build_tree(freq), 0)]
+            while stack:
+                node, depth = stack.pop()
+                if node.char is not None:
+                    lengths[node.char] = depth
+                else:
+                    stack.append((node.left, depth + 1))
+                    stack.append((node.right, depth + 1))
+            if max(lengths) <= MAX_CODE_LENGTH:
+                return lengths
+            # Flatten the distribution until the tree fits the decode table
+            freq = {char: (count + 1) // 2 for char, count in freq.items()}
+
+    def canonical_codes(self, lengths: List[int]) -> List[int]:
+        codes = [0] * 256
+        code = 0
+        previous = 0
+        for length, char in sorted((length, char) for char, length in enumerate(lengths) if length):
+            code <<= length - previous
+            codes[char] = code
+            code += 1
+            previous = length
+        return codes
+
     def encode_data(self, data: bytes) -> Tuple[bytes, Dict]:
-        # Build Huffman tree and generate codes
-        root = self.build_huffman_tree(data)
-        self.huffman_codes.clear()
-        self.generate_codes(root)
-        
-        # Encode the data
-        encoded = "".join(self.huffman_codes[char] for char in data)
-        
-        # Convert binary string to bytes
-        padding = 8 - (len(encoded) % 8)
-        encoded += "0" * padding
-        
+        lengths = self.code_lengths(data)
+        codes = self.canonical_codes(lengths)
+        self.huffman_codes = {char: format(codes[char], f'0{length}b')
+                              for char, length in enumerate(lengths) if length}
+
+        if self.use_numpy and len(data) >= ENCODE_BLOCK:
+            result, total_bits = self._encode_numpy(data, codes, lengths)
+        else:
+            result, total_bits = self._encode_python(data)
+
+        padding = -total_bits % 8
+        return bytes(result), {"codes": self.huffman_codes, "lengths": bytes(lengths),
+                               "padding": padding, "length": len(data)}
+
+    def _encode_python(self, data: bytes) -> Tuple[bytearray, int]:
+        # Each block is expanded by a C-level join and folded into an integer
+        # bit buffer with a single int() call, whole bytes are flushed per block
+        patterns = [self.huffman_codes.get(char, "") for char in range(256)]
+        lookup = patterns.__getitem__
         result = bytearray()
-        for i in range(0, len(encoded), 8):
-            result.append(int(encoded[i:i+8], 2))
-            
-        return bytes(result), {"codes": self.huffman_codes, "padding": padding}
+        buffer = 0
+        buffered = 0
+        total_bits = 0
+
+        view = memoryview(data)
+        for start in range(0, len(data), ENCODE_BLOCK):
+            bits = "".join(map(lookup, view[start:start + ENCODE_BLOCK]))
+            total_bits += len(bits)
+            buffer = (buffer << len(bits)) | int(bits, 2)
+            buffered += len(bits)
+            whole = buffered >> 3 << 3
+            result += (buffer >> (buffered - whole)).to_bytes(whole >> 3, 'big')
+            buffered -= whole
+            buffer &= (1 << buffered) - 1
+
+        if buffered:
+            result.append((buffer << (8 - buffered)) & 0xFF)
+        return result, total_bits
+
+    def _encode_numpy(self, data: bytes, codes: List[int], lengths: List[int]) -> Tuple[bytearray, int]:
+        # Codes are left-aligned in 16 bits, unpacked into a bit matrix and the
+        # columns past each code length are masked out before packing
+        np = load_numpy()
+        aligned = np.array([code << (16 - length) if length else 0
+                            for code, length in zip(codes, lengths)], dtype='>u2')
+        length_table = np.array(lengths, dtype=np.uint8)
+        columns = np.arange(16, dtype=np.uint8)
+        symbols = np.frombuffer(data, dtype=np.uint8)
+        result = bytearray()
+        carry = np.zeros(0, dtype=np.uint8)
+        total_bits = 0
+
+        for start in range(0, len(symbols), NUMPY_BLOCK):
+            block = symbols[start:start + NUMPY_BLOCK]
+            matrix = np.unpackbits(aligned[block].view(np.uint8)).reshape(-1, 16)
+            bits = matrix[columns < length_table[block][:, None]]
+            total_bits += len(bits)
+
+            bits = np.concatenate((carry, bits))
+            whole = len(bits) >> 3 << 3
+            result += np.packbits(bits[:whole]).tobytes()
+            carry = bits[whole:]
+
+        if len(carry):
+            result += np.packbits(carry).tobytes()
+        return result, total_bits
+
+    def decode_table(self, lengths: bytes) -> Tuple[List[bytes], List[int], List[int], List[int]]:
+        # Every TABLE_BITS-bit window maps to all whole symbols it contains plus
+        # the first symbol alone, for the tail where the window passes the end
+        codes = self.canonical_codes(list(lengths))
+        size = 1 << MAX_CODE_LENGTH
+        first_symbol = [0] * size
+        first_length = [0] * size
+        for char, length in enumerate(lengths):
+            if length:
+                base = codes[char] << (MAX_CODE_LENGTH - length)
+                span = 1 << (MAX_CODE_LENGTH - length)
+                first_symbol[base:base + span] = [char] * span
+                first_length[base:base + span] = [length] * span
+
+        shift = MAX_CODE_LENGTH - TABLE_BITS
+        multi_symbols: List[bytes] = []
+        multi_lengths: List[int] = []
+        for window in range(1 << TABLE_BITS):
+            decoded = bytearray()
+            used = 0
+            while True:
+                index = ((window << used) & ((1 << TABLE_BITS) - 1)) << shift
+                length = first_length[index]
+                if not length or used + length > TABLE_BITS:
+                    break
+                decoded.append(first_symbol[index])
+                used += length
+            multi_symbols.append(bytes(decoded))
+            multi_lengths.append(used)
+        return multi_symbols, multi_lengths, first_symbol, first_length
 
     def decode_data(self, data: bytes, metadata: Dict) -> bytes:
-        # Convert bytes to binary string
-        binary = "".join(format(byte, '08b') for byte in data)
-        
-        # Remove padding
-        binary = binary[:-metadata["padding"]]
-        
-        # Create reverse lookup table
-        reverse_codes = {code: char for char, code in metadata["codes"].items()}
-        
-        # Decode the data
+        total_bits = len(data) * 8 - metadata["padding"]
+        if total_bits <= 0:
+            return b""
+        multi_symbols, multi_lengths, first_symbol, first_length = self.decode_table(metadata["lengths"])
+
+        words = list(struct.unpack(f'>{(len(data) + 3) // 4}I', bytes(data) + b'\0' * (-len(data) % 4)))
+        words.append(0)
         decoded = bytearray()
-        current_code = ""
-        
-        for bit in binary:
-            current_code += bit
-            if current_code in reverse_codes:
-                decoded.append(reverse_codes[current_code])
-                current_code = ""
-                
+        buffer = 0
+        buffered = 0
+        word = 0
+        consumed = 0
+        table_mask = (1 << TABLE_BITS) - 1
+
+        # Whole windows inside the payload
+        while consumed + TABLE_BITS <= total_bits:
+            if buffered < MAX_CODE_LENGTH:
+                buffer = ((buffer & ((1 << buffered) - 1)) << 32) | words[word]
+                word += 1
+                buffered += 32
+            index = (buffer >> (buffered - TABLE_BITS)) & table_mask
+            used = multi_lengths[index]
+            if used:
+                decoded += multi_symbols[index]
+            else:
+                # Code longer than the multi-symbol window
+                index = (buffer >> (buffered - MAX_CODE_LENGTH)) & ((1 << MAX_CODE_LENGTH) - 1)
+                used = first_length[index]
+                decoded.append(first_symbol[index])
+            buffered -= used
+            consumed += used
+
+        # Tail, one symbol at a time
+        while consumed < total_bits:
+            if buffered < MAX_CODE_LENGTH:
+                buffer = ((buffer & ((1 << buffered) - 1)) << 32) | words[word]
+                word += 1
+                buffered += 32
+            index = (buffer >> (buffered - MAX_CODE_LENGTH)) & ((1 << MAX_CODE_LENGTH) - 1)
+            used = first_length[index]
+            if not used or consumed + used > total_bits:
+                raise ValueError("Corrupt Huffman stream")
+            decoded.append(first_symbol[index])
+            buffered -= used
+            consumed += used
+
+        if "length" in metadata and len(decoded) != metadata["length"]:
+            raise ValueError("Decoded length does not match original length")
         return bytes(decoded)
+
+# Process pool workers build their own Compression, so only codecs registered
+# by default are available to them
+_worker_compression: Optional[Compression] = None
+
+def _local_compression(compression: Optional[Compression]) -> Compression:
+    global _worker_compression
+    if compression is not None:
+        return compression
+    if _worker_compression is None:
+        _worker_compression = Compression()
+    return _worker_compression
+
+def _compress_block(job: Tuple[str, Optional[int], bytes], compression: Optional[Compression] = None) -> bytes:
+    codec, level, block = job
+    return _local_compression(compression).compress(block, codec, level)
+
+def _decompress_block(block: bytes, compression: Optional[Compression] = None) -> bytes:
+    return _local_compression(compression).decompress(block)
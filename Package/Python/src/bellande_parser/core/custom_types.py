@@ -15,7 +15,7 @@
 
 #!/usr/bin/env python3
 
-from typing import Dict, Callable, Type
+from typing import Dict, Callable, Type, Optional, Tuple
 import re
 from datetime import datetime, timedelta
 import base64
@@ -25,12 +25,50 @@ class CustomTypeRegistry:
         self.types: Dict[str, Type] = {}
         self.serializers: Dict[str, Callable] = {}
         self.deserializers: Dict[str, Callable] = {}
+        # Exact value type -> (type name, serializer), None caches a miss
+        self.serializer_cache: Dict[Type, Optional[Tuple[str, Callable]]] = {}
+        # Bumped by every registration, parses cached under an older generation are stale
+        self.generation = 0
 
     def register(self, type_name: str, type_class: Type, 
                 serializer: Callable, deserializer: Callable):
         self.types[type_name] = type_class
         self.serializers[type_name] = serializer
         self.deserializers[type_name] = deserializer
+        self.serializer_cache.clear()
+        self.generation += 1
+
+    def serializer_for(self, value: object) -> Optional[Tuple[str, Callable]]:
+        value_type = type(value)
+        try:
+            return self.serializer_cache[value_type]
+        except KeyError:
+            pass
+        found = self._resolve_serializer(value_type)
+        self.serializer_cache[value_type] = found
+        return found
+
+    def _resolve_serializer(self, value_type: Type) -> Optional[Tuple[str, Callable]]:
+        names: Dict[Type, str] = {}
+        for type_name, type_class in self.types.items():
+            names.setdefault(type_class, type_name)
+
+        # Most specific registered class along the MRO wins
+        for base in value_type.__mro__:
+            if base in names:
+                return names[base], self.serializers[names[base]]
+
+        # Virtual subclasses (ABC registration) are not in the MRO
+        for type_name, type_class in self.types.items():
+            try:
+                if issubclass(value_type, type_class):
+                    return type_name, self.serializers[type_name]
+            except TypeError:
+                continue
+        return None
+
+    def deserializer_for(self, type_name: str) -> Optional[Callable]:
+        return self.deserializers.get(type_name)
 
 class Complex:
     def __init__(self):
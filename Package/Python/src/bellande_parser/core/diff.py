@@ -0,0 +1,549 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from bisect import bisect_left
+import copy
+import json
+from .history import MISSING, Path, same_value
+from .lexer import parse_number
+from .numeric import ARRAY_TYPES
+from .tabular import Table
+from .types import MergeConflict
+
+# A patch is a list of operations applied in order:
+#   {"op": "set", "path": (...), "value": v}     replaces a dict key, a list item or the root (path ())
+#   {"op": "insert", "path": (..., i), "value": v} inserts a list item before index i
+#   {"op": "remove", "path": (...)}               removes a dict key or list item
+# With include_old, set and remove also carry "old" and apply_patch checks it first
+Patch = List[Dict[str, Any]]
+
+PATCH_OPS = ("set", "insert", "remove")
+
+MERGE_PREFER = ("ours", "theirs")
+
+# Beyond this many edits a list is aligned by position instead of by LCS
+MAX_EDIT_DISTANCE = 2048
+
+# Written form of a path, "$" is the root and every segment is "/<segment>"
+ROOT = "$"
+
+# Values the Bellande text form cannot carry are written as "json:<json>"
+JSON_PREFIX = "json:"
+
+UNSAFE_STARTS = ('"', "'", '-', '#', JSON_PREFIX, "ref:", "type:", "table:")
+
+# Common list ends are compared this many items at a time
+SCAN_CHUNK = 256
+
+def same(old: Any, new: Any) -> bool:
+    # Cached parses hold FrozenDict/FrozenList, subclasses compare like the containers they extend
+    if old is new:
+        return True
+    if (isinstance(old, dict) and isinstance(new, dict)) or (isinstance(old, list) and isinstance(new, list)):
+        return old == new
+    return same_value(old, new)
+
+def _same_run(old: Sequence, new: Sequence) -> bool:
+    # One C level comparison for a run of items, with the same class check as same_value at the top
+    try:
+        return old == new and list(map(type, old)) == list(map(type, new))
+    except (ValueError, TypeError):
+        # Elementwise comparing items (NumPy arrays) have no truth value
+        return False
+
+def common_ends(old: Sequence, new: Sequence) -> Tuple[int, int]:
+    # Lengths of the equal prefix and suffix, the suffix never overlaps the prefix
+    n, m = len(old), len(new)
+    limit = min(n, m)
+    start = 0
+    while start + SCAN_CHUNK <= limit and _same_run(old[start:start + SCAN_CHUNK], new[start:start + SCAN_CHUNK]):
+        start += SCAN_CHUNK
+    while start < limit and same(old[start], new[start]):
+        start += 1
+    end = 0
+    while end + SCAN_CHUNK <= limit - start and _same_run(old[n - end - SCAN_CHUNK:n - end],
+                                                           new[m - end - SCAN_CHUNK:m - end]):
+        end += SCAN_CHUNK
+    while end < limit - start and same(old[n - 1 - end], new[m - 1 - end]):
+        end += 1
+    return start, end
+
+def key_field(list_keys: Sequence[str], *sides: Sequence) -> Optional[str]:
+    # First field every item of every side has, with a hashable value unique within its side
+    for name in list_keys:
+        if all(_unique_field(items, name) for items in sides):
+            return name
+    return None
+
+def _unique_field(items: Sequence, name: str) -> bool:
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            return False
+        value = item.get(name, MISSING)
+        if value is MISSING or isinstance(value, (dict, list)) or value in seen:
+            return False
+        seen.add(value)
+    return True
+
+def lcs_pairs(old: Sequence, new: Sequence, limit: int = MAX_EDIT_DISTANCE) -> Optional[List[Tuple[int, int]]]:
+    # Myers O((n + m) * d) shortest edit script, None once more than limit edits are needed
+    n, m = len(old), len(new)
+    frontier = {1: 0}
+    trace = []
+    for distance in range(min(n + m, limit) + 1):
+        trace.append(frontier.copy())
+        for diagonal in range(-distance, distance + 1, 2):
+            if diagonal == -distance or (diagonal != distance and frontier[diagonal - 1] < frontier[diagonal + 1]):
+                x = frontier[diagonal + 1]
+            else:
+                x = frontier[diagonal - 1] + 1
+            y = x - diagonal
+            while x < n and y < m and same(old[x], new[y]):
+                x += 1
+                y += 1
+            frontier[diagonal] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+def _backtrack(trace: List[Dict[int, int]], x: int, y: int) -> List[Tuple[int, int]]:
+    pairs = []
+    for distance in range(len(trace) - 1, -1, -1):
+        frontier = trace[distance]
+        diagonal = x - y
+        if diagonal == -distance or (diagonal != distance and frontier[diagonal - 1] < frontier[diagonal + 1]):
+            previous = diagonal + 1
+        else:
+            previous = diagonal - 1
+        previous_x = frontier[previous]
+        previous_y = previous_x - previous
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            pairs.append((x, y))
+        if distance:
+            x, y = previous_x, previous_y
+    pairs.reverse()
+    return pairs
+
+def increasing_pairs(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # Longest run of pairs (ordered by new index) whose old indices also increase, O(n log n)
+    tails: List[int] = []
+    tail_at: List[int] = []
+    previous = [-1] * len(pairs)
+    for position, (old_index, _) in enumerate(pairs):
+        slot = bisect_left(tails, old_index)
+        if slot == len(tails):
+            tails.append(old_index)
+            tail_at.append(position)
+        else:
+            tails[slot] = old_index
+            tail_at[slot] = position
+        previous[position] = tail_at[slot - 1] if slot else -1
+    result = []
+    position = tail_at[-1] if tail_at else -1
+    while position >= 0:
+        result.append(pairs[position])
+        position = previous[position]
+    result.reverse()
+    return result
+
+def align(old: Sequence, new: Sequence, list_keys: Sequence[str] = ()) -> Tuple[int, int, List[Tuple[int, int]]]:
+    # Equal prefix and suffix lengths, and monotonic (old, new) pairs of the items kept in between,
+    # relative to the start of the middle. A mostly unchanged list costs one scan of its ends
+    n, m = len(old), len(new)
+    start, end = common_ends(old, new)
+    middle_old = old[start:n - end]
+    middle_new = new[start:m - end]
+
+    name = key_field(list_keys, middle_old, middle_new) if list_keys else None
+    if name is not None:
+        positions = {item[name]: index for index, item in enumerate(middle_old)}
+        matched = [(positions[item[name]], index) for index, item in enumerate(middle_new) if item[name] in positions]
+        return start, end, increasing_pairs(matched)
+    middle = lcs_pairs(middle_old, middle_new)
+    return start, end, pair_gaps(middle or [], len(middle_old), len(middle_new))
+
+def pair_gaps(pairs: List[Tuple[int, int]], n: int, m: int) -> List[Tuple[int, int]]:
+    # Removed and inserted runs between two matches are paired by position and diffed as changes
+    result = []
+    old_index = new_index = 0
+    for next_old, next_new in pairs + [(n, m)]:
+        result.extend(zip(range(old_index, next_old), range(new_index, next_new)))
+        if next_old < n:
+            result.append((next_old, next_new))
+        old_index, new_index = next_old + 1, next_new + 1
+    return result
+
+def diff(old: Any, new: Any, list_keys: Union[str, Sequence[str], None] = None,
+         include_old: bool = False) -> Patch:
+    # Lists of dicts that all carry one of list_keys are matched by that field, others by LCS
+    if isinstance(list_keys, str):
+        list_keys = (list_keys,)
+    patch: Patch = []
+    _diff(old, new, (), patch, tuple(list_keys or ()), include_old)
+    return patch
+
+def _diff(old: Any, new: Any, path: Path, patch: Patch, list_keys: Tuple[str, ...], include_old: bool):
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        # Equal subtrees are skipped by one C level comparison, work follows the changed keys only
+        for key, value in old.items():
+            new_value = new.get(key, MISSING)
+            if new_value is MISSING:
+                _append(patch, "remove", path + (key,), MISSING, value, include_old)
+            elif not same(value, new_value):
+                _diff(value, new_value, path + (key,), patch, list_keys, include_old)
+        for key, value in new.items():
+            if key not in old:
+                _append(patch, "set", path + (key,), value, MISSING, include_old)
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(old, new, path, patch, list_keys, include_old)
+    elif not same(old, new):
+        _append(patch, "set", path, new, old, include_old)
+
+def _diff_list(old: List, new: List, path: Path, patch: Patch, list_keys: Tuple[str, ...], include_old: bool):
+    start, end, pairs = align(old, new, list_keys)
+    kept_old = {old_index for old_index, _ in pairs}
+    kept_new = {new_index for _, new_index in pairs}
+    # Removals from the back keep the indices of earlier ones valid, inserts then land in order
+    for index in range(len(old) - end - start - 1, -1, -1):
+        if index not in kept_old:
+            _append(patch, "remove", path + (start + index,), MISSING, old[start + index], include_old)
+    for index in range(len(new) - end - start):
+        if index not in kept_new:
+            _append(patch, "insert", path + (start + index,), new[start + index], MISSING, False)
+    for old_index, new_index in pairs:
+        old_item = old[start + old_index]
+        new_item = new[start + new_index]
+        if not same(old_item, new_item):
+            _diff(old_item, new_item, path + (start + new_index,), patch, list_keys, include_old)
+
+def _append(patch: Patch, op: str, path: Path, value: Any, old: Any, include_old: bool):
+    operation: Dict[str, Any] = {"op": op, "path": path}
+    if value is not MISSING:
+        operation["value"] = value
+    if include_old and old is not MISSING:
+        operation["old"] = old
+    patch.append(operation)
+
+def apply_patch(data: Any, patch: Iterable[Dict[str, Any]], in_place: bool = False) -> Any:
+    # Without in_place only the containers on changed paths are copied, the rest is shared with data
+    copied = set()
+    if not in_place and isinstance(data, (dict, list)):
+        data = data.copy()
+        copied.add(id(data))
+    for operation in patch:
+        op = operation.get("op")
+        if op not in PATCH_OPS:
+            raise ValueError(f"Unknown patch operation: {op}")
+        path = tuple(operation["path"])
+        if not path:
+            if op != "set":
+                raise ValueError(f"Patch operation {op} needs a path")
+            _check_old(operation, data, path)
+            data = copy.deepcopy(operation["value"])
+            continue
+
+        container = data
+        for depth, segment in enumerate(path[:-1]):
+            child = _get(container, segment, path)
+            if not in_place and id(child) not in copied:
+                if not isinstance(child, (dict, list)):
+                    raise ValueError(f"Patch path not found: {format_path(path[:depth + 2])}")
+                child = child.copy()
+                copied.add(id(child))
+                container[segment] = child
+            container = child
+
+        slot = path[-1]
+        if op == "insert":
+            if not isinstance(container, list) or slot.__class__ is not int or not 0 <= slot <= len(container):
+                raise ValueError(f"Patch path not found: {format_path(path)}")
+            container.insert(slot, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _check_old(operation, _get(container, slot, path), path)
+            del container[slot]
+        elif isinstance(container, dict):
+            _check_old(operation, container.get(slot, MISSING), path)
+            container[slot] = copy.deepcopy(operation["value"])
+        else:
+            _check_old(operation, _get(container, slot, path), path)
+            container[slot] = copy.deepcopy(operation["value"])
+    return data
+
+def _get(container: Any, segment: Any, path: Path) -> Any:
+    if isinstance(container, dict):
+        if segment in container:
+            return container[segment]
+    elif isinstance(container, list) and segment.__class__ is int and 0 <= segment < len(container):
+        return container[segment]
+    raise ValueError(f"Patch path not found: {format_path(path)}")
+
+def _check_old(operation: Dict[str, Any], current: Any, path: Path):
+    if "old" in operation and not same(operation["old"], current):
+        raise ValueError(f"Patch does not apply at {format_path(path)}")
+
+def merge(base: Any, ours: Any, theirs: Any, list_keys: Union[str, Sequence[str], None] = None,
+          prefer: str = "ours") -> Tuple[Any, List[MergeConflict]]:
+    # Changes made on one side are taken, changes made differently on both sides become conflicts
+    # resolved to the prefer side. Missing keys in a conflict are MISSING
+    if prefer not in MERGE_PREFER:
+        raise ValueError(f"Unknown prefer {prefer}, expected one of {', '.join(MERGE_PREFER)}")
+    if isinstance(list_keys, str):
+        list_keys = (list_keys,)
+    conflicts: List[MergeConflict] = []
+    merged = _merge(base, ours, theirs, (), tuple(list_keys or ()), prefer, conflicts)
+    return merged, conflicts
+
+def _merge(base: Any, ours: Any, theirs: Any, path: Path, list_keys: Tuple[str, ...], prefer: str,
+           conflicts: List[MergeConflict]) -> Any:
+    if same(ours, theirs) or same(base, theirs):
+        return ours
+    if same(base, ours):
+        return theirs
+    if isinstance(ours, dict) and isinstance(theirs, dict) and (base is MISSING or isinstance(base, dict)):
+        base = {} if base is MISSING else base
+        merged = {}
+        for key in list(ours) + [key for key in theirs if key not in ours]:
+            base_value = base.get(key, MISSING)
+            our_value = ours.get(key, MISSING)
+            their_value = theirs.get(key, MISSING)
+            # Subtrees shared with base on one side are decided without a call
+            if our_value is their_value or base_value is their_value:
+                value = our_value
+            elif base_value is our_value:
+                value = their_value
+            else:
+                value = _merge(base_value, our_value, their_value, path + (key,), list_keys, prefer, conflicts)
+            if value is not MISSING:
+                merged[key] = value
+        return merged
+    if isinstance(ours, list) and isinstance(theirs, list) and (base is MISSING or isinstance(base, list)):
+        base = [] if base is MISSING else base
+        name = key_field(list_keys, base, ours, theirs) if list_keys else None
+        if name is not None:
+            return _merge_keyed(base, ours, theirs, name, path, list_keys, prefer, conflicts)
+        merged = _merge_list(base, ours, theirs, path, list_keys, prefer, conflicts)
+        if merged is not None:
+            return merged
+    conflicts.append(MergeConflict(path, base, ours, theirs))
+    return ours if prefer == "ours" else theirs
+
+def _merge_keyed(base: List, ours: List, theirs: List, name: str, path: Path, list_keys: Tuple[str, ...],
+                 prefer: str, conflicts: List[MergeConflict]) -> List:
+    # Items are merged like dict entries by their key field. The order is ours unless only theirs
+    # moved items, the other side's additions go after the item they follow there
+    base_items = {item[name]: item for item in base}
+    our_items = {item[name]: item for item in ours}
+    their_items = {item[name]: item for item in theirs}
+    primary, secondary = our_items, their_items
+    if _moved(base_items, their_items):
+        if not _moved(base_items, our_items):
+            primary, secondary = their_items, our_items
+        elif [key for key in our_items if key in their_items] != [key for key in their_items if key in our_items]:
+            # Both reordered differently, items still merge one by one in the prefer side's order
+            conflicts.append(MergeConflict(path, base, ours, theirs))
+            if prefer == "theirs":
+                primary, secondary = their_items, our_items
+    order = list(primary)
+    positions = {key: index for index, key in enumerate(order)}
+    previous = None
+    for key in secondary:
+        if key not in positions:
+            index = positions[previous] + 1 if previous in positions else 0
+            order.insert(index, key)
+            positions = {item: position for position, item in enumerate(order)}
+        previous = key
+    merged = []
+    for key in order:
+        value = _merge(base_items.get(key, MISSING), our_items.get(key, MISSING), their_items.get(key, MISSING),
+                       path + (key,), list_keys, prefer, conflicts)
+        if value is not MISSING:
+            merged.append(value)
+    return merged
+
+def _moved(base_items: Dict[Any, Any], items: Dict[Any, Any]) -> bool:
+    return [key for key in items if key in base_items] != [key for key in base_items if key in items]
+
+def _merge_list(base: List, ours: List, theirs: List, path: Path, list_keys: Tuple[str, ...], prefer: str,
+                conflicts: List[MergeConflict]) -> Optional[List]:
+    # diff3: items both sides kept from base are anchors, the runs between them merge as chunks.
+    # Ends all three lists share are copied as they are
+    our_start, our_end = common_ends(base, ours)
+    their_start, their_end = common_ends(base, theirs)
+    start = min(our_start, their_start)
+    end = min(our_end, their_end)
+    middle_base = base[start:len(base) - end]
+    middle_ours = ours[start:len(ours) - end]
+    middle_theirs = theirs[start:len(theirs) - end]
+    our_pairs = _exact_pairs(middle_base, middle_ours)
+    their_pairs = _exact_pairs(middle_base, middle_theirs)
+    if our_pairs is None or their_pairs is None:
+        return None
+    to_ours = dict(our_pairs)
+    to_theirs = dict(their_pairs)
+    anchors = [index for index, _ in our_pairs if index in to_theirs]
+    merged = ours[:start]
+    base_at = ours_at = theirs_at = 0
+    for anchor in anchors + [None]:
+        if anchor is None:
+            base_end, ours_end, theirs_end = len(middle_base), len(middle_ours), len(middle_theirs)
+        else:
+            base_end, ours_end, theirs_end = anchor, to_ours[anchor], to_theirs[anchor]
+        chunk_base = middle_base[base_at:base_end]
+        chunk_ours = middle_ours[ours_at:ours_end]
+        chunk_theirs = middle_theirs[theirs_at:theirs_end]
+        if chunk_base or chunk_ours or chunk_theirs:
+            merged.extend(_merge_chunk(chunk_base, chunk_ours, chunk_theirs, path, len(merged), list_keys,
+                                       prefer, conflicts))
+        if anchor is not None:
+            merged.append(middle_ours[ours_end])
+            base_at, ours_at, theirs_at = base_end + 1, ours_end + 1, theirs_end + 1
+    merged.extend(ours[len(ours) - end:])
+    return merged
+
+def _exact_pairs(old: List, new: List) -> Optional[List[Tuple[int, int]]]:
+    # Equal items only, changed items are not anchors
+    n, m = len(old), len(new)
+    start, end = common_ends(old, new)
+    middle = lcs_pairs(old[start:n - end], new[start:m - end])
+    if middle is None:
+        return None
+    return ([(index, index) for index in range(start)]
+            + [(old_index + start, new_index + start) for old_index, new_index in middle]
+            + [(n - end + index, m - end + index) for index in range(end)])
+
+def _merge_chunk(base: List, ours: List, theirs: List, path: Path, offset: int, list_keys: Tuple[str, ...],
+                 prefer: str, conflicts: List[MergeConflict]) -> List:
+    if same(ours, base) or same(ours, theirs):
+        return theirs
+    if same(theirs, base):
+        return ours
+    if len(base) == len(ours) == len(theirs):
+        return [_merge(base[index], ours[index], theirs[index], path + (offset + index,), list_keys, prefer,
+                       conflicts) for index in range(len(base))]
+    conflicts.append(MergeConflict(path + (offset,), base, ours, theirs))
+    return ours if prefer == "ours" else theirs
+
+def format_path(path: Path) -> str:
+    # Integers are list indices, string segments that would read as one get a "~2" prefix
+    parts = [ROOT]
+    for segment in path:
+        if segment.__class__ is int:
+            parts.append(f"/{segment}")
+        else:
+            text = str(segment).replace("~", "~0").replace("/", "~1")
+            if _is_index(text):
+                text = "~2" + text
+            parts.append("/" + text)
+    return "".join(parts)
+
+def parse_path(text: str) -> Path:
+    if text[:1] != ROOT:
+        raise ValueError(f"Invalid patch path: {text}")
+    path: List[Union[str, int]] = []
+    for part in text[2:].split("/") if len(text) > 1 else ():
+        if _is_index(part):
+            path.append(int(part))
+        else:
+            if part[:2] == "~2":
+                part = part[2:]
+            path.append(part.replace("~1", "/").replace("~0", "~"))
+    return tuple(path)
+
+def _is_index(text: str) -> bool:
+    body = text[1:] if text[:1] == "-" else text
+    return body.isdecimal() and body.isascii()
+
+def encode_patch(patch: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Bellande-safe form of a patch: paths as strings, values that would not read back as written
+    # (empty containers, numeric looking strings, ...) as json: strings
+    encoded = []
+    for operation in patch:
+        item = {"op": operation["op"], "path": format_path(tuple(operation["path"]))}
+        for name in ("value", "old"):
+            if name in operation:
+                item[name] = encode_value(operation[name])
+        encoded.append(item)
+    return encoded
+
+def decode_patch(encoded: Any) -> Patch:
+    # An empty patch is written as an empty document, which reads back as {}
+    if encoded == [] or encoded == {} or encoded == "":
+        return []
+    if encoded.__class__ is not list:
+        raise ValueError("A patch must be a list of operations")
+    patch = []
+    for item in encoded:
+        if item.__class__ is not dict or item.get("op") not in PATCH_OPS or "path" not in item:
+            raise ValueError(f"Invalid patch operation: {item}")
+        operation = {"op": item["op"], "path": parse_path(str(item["path"]))}
+        for name in ("value", "old"):
+            if name in item:
+                operation[name] = decode_value(item[name])
+        patch.append(operation)
+    return patch
+
+def encode_value(value: Any) -> Any:
+    cls = value.__class__
+    if isinstance(value, dict):
+        if value and all(_safe_key(key) for key in value):
+            return {key: encode_value(item) for key, item in value.items()}
+        return JSON_PREFIX + _to_json(value)
+    if isinstance(value, (list, tuple, Table)) or isinstance(value, ARRAY_TYPES):
+        items = value.tolist() if hasattr(value, "tolist") else list(value)
+        if items:
+            return [encode_value(item) for item in items]
+        return JSON_PREFIX + "[]"
+    if cls is str:
+        return value if _safe_string(value) else JSON_PREFIX + _to_json(value)
+    if cls is float:
+        return value if parse_number(str(value)) == value else JSON_PREFIX + _to_json(value)
+    # Other types are written as they are, registered custom types read back through the registry
+    return value
+
+def decode_value(value: Any) -> Any:
+    cls = value.__class__
+    if cls is str:
+        return json.loads(value[len(JSON_PREFIX):]) if value.startswith(JSON_PREFIX) else value
+    if cls is dict:
+        return {key: decode_value(item) for key, item in value.items()}
+    if cls is list:
+        return [decode_value(item) for item in value]
+    return value
+
+def _to_json(value: Any) -> str:
+    try:
+        return json.dumps(value)
+    except TypeError as e:
+        raise ValueError(f"Cannot write patch value: {e}")
+
+def _safe_key(key: Any) -> bool:
+    return (key.__class__ is str and key != "" and key == key.strip() and ':' not in key and '\n' not in key
+            and key[0] not in '-#"')
+
+def _safe_string(value: str) -> bool:
+    if not value or value != value.strip() or '\n' in value or value.startswith(UNSAFE_STARTS):
+        return False
+    if value.lower() in ("true", "false", "null") or parse_number(value) is not value:
+        return False
+    # Quoted on output, the quotes would be ambiguous with a quote of the value's own
+    return not ((' ' in value or ':' in value) and '"' in value)
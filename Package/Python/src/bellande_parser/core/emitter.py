@@ -0,0 +1,116 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, Iterator, Optional, TextIO
+from collections.abc import Iterator as IteratorType
+from .numeric import ARRAY_TYPES
+from .tabular import DEFAULT_MIN_ROWS, Table, table_columns
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+_END = object()
+
+SCALAR_CLASSES = frozenset((str, int, float, bool, type(None)))
+
+def is_container(value: Any) -> bool:
+    # Generators and other iterators are emitted as lists without being materialized
+    if value.__class__ in SCALAR_CLASSES:
+        return False
+    return (isinstance(value, (dict, list, Table)) or isinstance(value, ARRAY_TYPES) or
+            isinstance(value, IteratorType))
+
+def entries(value: Any) -> Iterator[Any]:
+    # Tables outside a key have no table form and are written as their rows
+    return iter(value.tolist()) if isinstance(value, Table) else iter(value)
+
+class Emitter:
+    def __init__(self, format_value: Callable[[Any], str], buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 columnar: bool = False, min_rows: int = DEFAULT_MIN_ROWS):
+        self.format_value = format_value
+        self.buffer_size = buffer_size
+        self.columnar = columnar
+        self.min_rows = min_rows
+
+    def iter_lines(self, data: Any, indent: int = 0) -> Iterator[str]:
+        format_value = self.format_value
+        if not is_container(data):
+            yield f"{' ' * indent}{format_value(data)}"
+            return
+
+        # Frames are [indent, entries, lead, is_dict], lead replaces the
+        # indentation of the first line so a mapping can start on its "- " line
+        stack = [[indent, iter(data.items()) if isinstance(data, dict) else entries(data), None,
+                  isinstance(data, dict)]]
+        while stack:
+            frame = stack[-1]
+            entry = next(frame[1], _END)
+            if entry is _END:
+                stack.pop()
+                continue
+
+            level = frame[0]
+            pad = ' ' * level if frame[2] is None else frame[2]
+            frame[2] = None
+
+            if frame[3]:
+                key, value = entry
+                if isinstance(value, dict):
+                    yield f"{pad}{key}:"
+                    stack.append([level + 2, iter(value.items()), None, True])
+                elif is_container(value):
+                    columns = self._columns(value)
+                    if columns is not None:
+                        yield f"{pad}{key}: table:{len(value)}"
+                        stack.append([level + 2, iter(columns.items()), None, True])
+                    else:
+                        yield f"{pad}{key}:"
+                        stack.append([level + 2, entries(value), None, False])
+                else:
+                    yield f"{pad}{key}: {format_value(value)}"
+            elif isinstance(entry, dict) and entry:
+                stack.append([level + 2, iter(entry.items()), f"{pad}- ", True])
+            elif is_container(entry):
+                yield f"{pad}-"
+                if not isinstance(entry, dict):
+                    stack.append([level + 2, entries(entry), None, False])
+            else:
+                yield f"{pad}- {format_value(entry)}"
+
+    def _columns(self, value: Any) -> Optional[Dict[str, Any]]:
+        if isinstance(value, Table):
+            return value.columns
+        if not self.columnar:
+            return None
+        names = table_columns(value, self.min_rows)
+        if names is None:
+            return None
+        return {name: [row[name] for row in value] for name in names}
+
+    def dump(self, data: Any, file: TextIO):
+        parts = []
+        size = 0
+        separator = ""
+        for line in self.iter_lines(data):
+            parts.append(line)
+            size += len(line) + 1
+            if size >= self.buffer_size:
+                file.write(separator + '\n'.join(parts))
+                separator = '\n'
+                parts = []
+                size = 0
+        if parts:
+            file.write(separator + '\n'.join(parts))
@@ -15,9 +15,151 @@
 
 #!/usr/bin/env python3
 
-from typing import List
+from typing import List, Tuple, Optional, BinaryIO
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import struct
 import os
 
+BLOCK = struct.Struct('>4I')
+ROUNDS = {16: 10, 24: 12, 32: 14}
+DEFAULT_CHUNK_SIZE = 64 * 1024
+CTR_SEGMENT_SIZE = 256 * 1024
+
+def _xtime(a: int) -> int:
+    return ((a << 1) ^ (0x1B if a & 0x80 else 0)) & 0xFF
+
+def _multiply(a: int, b: int) -> int:
+    result = 0
+    while b:
+        if b & 1:
+            result ^= a
+        a = _xtime(a)
+        b >>= 1
+    return result
+
+def _build_tables():
+    # S-box from the multiplicative inverse in GF(2^8) and the affine transform
+    sbox = [0] * 256
+    p = q = 1
+    while True:
+        p = p ^ _xtime(p)
+        q ^= q << 1
+        q ^= q << 2
+        q ^= q << 4
+        q &= 0xFF
+        if q & 0x80:
+            q ^= 0x09
+        x = q
+        for shift in range(1, 5):
+            x ^= ((q << shift) | (q >> (8 - shift))) & 0xFF
+        sbox[p] = x ^ 0x63
+        if p == 1:
+            break
+    sbox[0] = 0x63
+
+    inverse = [0] * 256
+    for i, s in enumerate(sbox):
+        inverse[s] = i
+
+    def rotations(column: List[int]) -> List[List[int]]:
+        return [[((w >> (8 * r)) | (w << (32 - 8 * r))) & 0xFFFFFFFF for w in column] for r in range(4)]
+
+    te = rotations([(_multiply(s, 2) << 24) | (s << 16) | (s << 8) | _multiply(s, 3) for s in sbox])
+    td = rotations([(_multiply(s, 14) << 24) | (_multiply(s, 9) << 16) | (_multiply(s, 13) << 8) |
+                    _multiply(s, 11) for s in inverse])
+    return sbox, inverse, te, td
+
+SBOX, INV_SBOX, TE, TD = _build_tables()
+TE0, TE1, TE2, TE3 = TE
+TD0, TD1, TD2, TD3 = TD
+S24 = [s << 24 for s in SBOX]
+S16 = [s << 16 for s in SBOX]
+S8 = [s << 8 for s in SBOX]
+SI24 = [s << 24 for s in INV_SBOX]
+SI16 = [s << 16 for s in INV_SBOX]
+SI8 = [s << 8 for s in INV_SBOX]
+
+@lru_cache(maxsize=64)
+def key_schedule(key: bytes) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    if len(key) not in ROUNDS:
+        raise ValueError("AES key must be 16, 24 or 32 bytes")
+    nk = len(key) // 4
+    rounds = ROUNDS[len(key)]
+    words = list(struct.unpack(f'>{nk}I', key))
+    rcon = 1
+    for i in range(nk, 4 * (rounds + 1)):
+        t = words[i - 1]
+        if i % nk == 0:
+            t = ((t << 8) | (t >> 24)) & 0xFFFFFFFF
+            t = (S24[t >> 24] | S16[(t >> 16) & 255] | S8[(t >> 8) & 255] | SBOX[t & 255]) ^ (rcon << 24)
+            rcon = _xtime(rcon)
+        elif nk > 6 and i % nk == 4:
+            t = S24[t >> 24] | S16[(t >> 16) & 255] | S8[(t >> 8) & 255] | SBOX[t & 255]
+        words.append(words[i - nk] ^ t)
+
+    # Equivalent inverse cipher: reversed rounds with InvMixColumns on the inner keys
+    decrypt_words = []
+    for r in range(rounds, -1, -1):
+        for w in words[4 * r:4 * r + 4]:
+            if 0 < r < rounds:
+                w = (TD0[SBOX[w >> 24]] ^ TD1[SBOX[(w >> 16) & 255]] ^
+                     TD2[SBOX[(w >> 8) & 255]] ^ TD3[SBOX[w & 255]])
+            decrypt_words.append(w)
+    return tuple(words), tuple(decrypt_words)
+
+def _encrypt_words(s0: int, s1: int, s2: int, s3: int, rk: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    s0 ^= rk[0]
+    s1 ^= rk[1]
+    s2 ^= rk[2]
+    s3 ^= rk[3]
+    for i in range(4, len(rk) - 4, 4):
+        t0 = TE0[s0 >> 24] ^ TE1[(s1 >> 16) & 255] ^ TE2[(s2 >> 8) & 255] ^ TE3[s3 & 255] ^ rk[i]
+        t1 = TE0[s1 >> 24] ^ TE1[(s2 >> 16) & 255] ^ TE2[(s3 >> 8) & 255] ^ TE3[s0 & 255] ^ rk[i + 1]
+        t2 = TE0[s2 >> 24] ^ TE1[(s3 >> 16) & 255] ^ TE2[(s0 >> 8) & 255] ^ TE3[s1 & 255] ^ rk[i + 2]
+        s3 = TE0[s3 >> 24] ^ TE1[(s0 >> 16) & 255] ^ TE2[(s1 >> 8) & 255] ^ TE3[s2 & 255] ^ rk[i + 3]
+        s0, s1, s2 = t0, t1, t2
+    i = len(rk) - 4
+    return (S24[s0 >> 24] ^ S16[(s1 >> 16) & 255] ^ S8[(s2 >> 8) & 255] ^ SBOX[s3 & 255] ^ rk[i],
+            S24[s1 >> 24] ^ S16[(s2 >> 16) & 255] ^ S8[(s3 >> 8) & 255] ^ SBOX[s0 & 255] ^ rk[i + 1],
+            S24[s2 >> 24] ^ S16[(s3 >> 16) & 255] ^ S8[(s0 >> 8) & 255] ^ SBOX[s1 & 255] ^ rk[i + 2],
+            S24[s3 >> 24] ^ S16[(s0 >> 16) & 255] ^ S8[(s1 >> 8) & 255] ^ SBOX[s2 & 255] ^ rk[i + 3])
+
+def _decrypt_words(s0: int, s1: int, s2: int, s3: int, dk: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    s0 ^= dk[0]
+    s1 ^= dk[1]
+    s2 ^= dk[2]
+    s3 ^= dk[3]
+    for i in range(4, len(dk) - 4, 4):
+        t0 = TD0[s0 >> 24] ^ TD1[(s3 >> 16) & 255] ^ TD2[(s2 >> 8) & 255] ^ TD3[s1 & 255] ^ dk[i]
+        t1 = TD0[s1 >> 24] ^ TD1[(s0 >> 16) & 255] ^ TD2[(s3 >> 8) & 255] ^ TD3[s2 & 255] ^ dk[i + 1]
+        t2 = TD0[s2 >> 24] ^ TD1[(s1 >> 16) & 255] ^ TD2[(s0 >> 8) & 255] ^ TD3[s3 & 255] ^ dk[i + 2]
+        s3 = TD0[s3 >> 24] ^ TD1[(s2 >> 16) & 255] ^ TD2[(s1 >> 8) & 255] ^ TD3[s0 & 255] ^ dk[i + 3]
+        s0, s1, s2 = t0, t1, t2
+    i = len(dk) - 4
+    return (SI24[s0 >> 24] ^ SI16[(s3 >> 16) & 255] ^ SI8[(s2 >> 8) & 255] ^ INV_SBOX[s1 & 255] ^ dk[i],
+            SI24[s1 >> 24] ^ SI16[(s0 >> 16) & 255] ^ SI8[(s3 >> 8) & 255] ^ INV_SBOX[s2 & 255] ^ dk[i + 1],
+            SI24[s2 >> 24] ^ SI16[(s1 >> 16) & 255] ^ SI8[(s0 >> 8) & 255] ^ INV_SBOX[s3 & 255] ^ dk[i + 2],
+            SI24[s3 >> 24] ^ SI16[(s2 >> 16) & 255] ^ SI8[(s1 >> 8) & 255] ^ INV_SBOX[s0 & 255] ^ dk[i + 3])
+
+def ctr_transform(key: bytes, counter: int, data: bytes) -> bytes:
+    # Keystream for len(data) bytes starting at the given 128-bit counter,
+    # XORed in one big-integer operation
+    rk = key_schedule(key)[0]
+    blocks = (len(data) + 15) // 16
+    stream = bytearray(blocks * 16)
+    pack_into = BLOCK.pack_into
+    mask = (1 << 128) - 1
+    for i in range(blocks):
+        c = (counter + i) & mask
+        pack_into(stream, i * 16, *_encrypt_words(c >> 96, (c >> 64) & 0xFFFFFFFF,
+                                                  (c >> 32) & 0xFFFFFFFF, c & 0xFFFFFFFF, rk))
+    size = len(data)
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(stream[:size], 'big')).to_bytes(size, 'big')
+
+def _ctr_segment(job: Tuple[bytes, int, bytes]) -> bytes:
+    return ctr_transform(*job)
+
 class AES:
     def __init__(self):
         self.block_size = 16
@@ -28,29 +170,29 @@ class AES:
         return text + padding
 
     def unpad(self, text: bytes) -> bytes:
+        if not text or len(text) % self.block_size:
+            raise ValueError("Invalid padded data length")
         padding_size = text[-1]
+        if not 0 < padding_size <= self.block_size or text[-padding_size:] != bytes([padding_size]) * padding_size:
+            raise ValueError("Invalid padding")
         return text[:-padding_size]
 
-    def expand_key(self, key: bytes, rounds: int) -> List[bytes]:
-        expanded: List[bytes] = []
-        # Key expansion logic here
-        return expanded
+    def expand_key(self, key: bytes, rounds: Optional[int] = None) -> List[bytes]:
+        if rounds is not None and ROUNDS.get(len(key)) != rounds:
+            raise ValueError(f"A {len(key)} byte key does not use {rounds} rounds")
+        words = key_schedule(bytes(key))[0]
+        return [BLOCK.pack(*words[i:i + 4]) for i in range(0, len(words), 4)]
+
+    def _schedules(self, round_keys: List[bytes]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        # The original key is the first Nk words of the schedule
+        key = b"".join(round_keys)[:{11: 16, 13: 24, 15: 32}[len(round_keys)]]
+        return key_schedule(key)
 
     def encrypt_block(self, block: bytes, round_keys: List[bytes]) -> bytes:
-        # AES block encryption implementation
-        state = list(block)
-        # Add round key
-        # SubBytes
-        # ShiftRows
-        # MixColumns
-        # Final round
-        return bytes(state)
+        return BLOCK.pack(*_encrypt_words(*BLOCK.unpack(block), self._schedules(round_keys)[0]))
 
     def decrypt_block(self, block: bytes, round_keys: List[bytes]) -> bytes:
-        # AES block decryption implementation
-        state = list(block)
-        # Inverse operations
-        return bytes(state)
+        return BLOCK.pack(*_decrypt_words(*BLOCK.unpack(block), self._schedules(round_keys)[1]))
 
 class Encryption:
     def __init__(self):
@@ -59,36 +201,126 @@ class Encryption:
     def generate_key(self) -> bytes:
         return os.urandom(32)
 
-    def encrypt(self, data: bytes, key: bytes) -> bytes:
+    def encrypt(self, data: bytes, key: bytes, mode: str = "cbc", workers: Optional[int] = None) -> bytes:
         iv = os.urandom(16)  # Initialization vector
+        if mode == "ctr":
+            return iv + self._ctr(data, key, iv, workers)
+        if mode != "cbc":
+            raise ValueError(f"Unknown cipher mode: {mode}")
+
         padded_data = self.aes.pad(data)
-        round_keys = self.aes.expand_key(key, 10)
-        
-        cipher = iv
-        previous = iv
-        
-        for i in range(0, len(padded_data), 16):
-            block = padded_data[i:i+16]
-            block = bytes(a ^ b for a, b in zip(block, previous))
-            encrypted_block = self.aes.encrypt_block(block, round_keys)
-            cipher += encrypted_block
-            previous = encrypted_block
-            
-        return cipher
-
-    def decrypt(self, cipher: bytes, key: bytes) -> bytes:
-        iv = cipher[:16]
-        cipher = cipher[16:]
-        round_keys = self.aes.expand_key(key, 10)
-        
-        plain = b""
-        previous = iv
-        
-        for i in range(0, len(cipher), 16):
-            block = cipher[i:i+16]
-            decrypted_block = self.aes.decrypt_block(block, round_keys)
-            plain_block = bytes(a ^ b for a, b in zip(decrypted_block, previous))
-            plain += plain_block
-            previous = block
-            
-        return self.aes.unpad(plain)
+        output = bytearray(16 + len(padded_data))
+        output[:16] = iv
+        self._cbc_encrypt(padded_data, key, iv, output, 16)
+        return bytes(output)
+
+    def decrypt(self, cipher: bytes, key: bytes, mode: str = "cbc", workers: Optional[int] = None) -> bytes:
+        if len(cipher) < 16:
+            raise ValueError("Ciphertext is missing its IV")
+        iv = bytes(cipher[:16])
+        body = memoryview(cipher)[16:]
+        if mode == "ctr":
+            return self._ctr(body, key, iv, workers)
+        if mode != "cbc":
+            raise ValueError(f"Unknown cipher mode: {mode}")
+
+        plain = bytearray(len(body))
+        self._cbc_decrypt(body, key, iv, plain)
+        return self.aes.unpad(bytes(plain))
+
+    def _cbc_encrypt(self, data: bytes, key: bytes, iv: bytes, output: bytearray, offset: int) -> bytes:
+        rk = key_schedule(bytes(key))[0]
+        unpack_from = BLOCK.unpack_from
+        pack_into = BLOCK.pack_into
+        p0, p1, p2, p3 = BLOCK.unpack(iv)
+        for i in range(0, len(data), 16):
+            b0, b1, b2, b3 = unpack_from(data, i)
+            p0, p1, p2, p3 = _encrypt_words(b0 ^ p0, b1 ^ p1, b2 ^ p2, b3 ^ p3, rk)
+            pack_into(output, offset + i, p0, p1, p2, p3)
+        return BLOCK.pack(p0, p1, p2, p3)
+
+    def _cbc_decrypt(self, data: bytes, key: bytes, iv: bytes, output: bytearray) -> bytes:
+        if len(data) % 16:
+            raise ValueError("Ciphertext length is not a multiple of the block size")
+        dk = key_schedule(bytes(key))[1]
+        unpack_from = BLOCK.unpack_from
+        pack_into = BLOCK.pack_into
+        p0, p1, p2, p3 = BLOCK.unpack(iv)
+        for i in range(0, len(data), 16):
+            c0, c1, c2, c3 = unpack_from(data, i)
+            d0, d1, d2, d3 = _decrypt_words(c0, c1, c2, c3, dk)
+            pack_into(output, i, d0 ^ p0, d1 ^ p1, d2 ^ p2, d3 ^ p3)
+            p0, p1, p2, p3 = c0, c1, c2, c3
+        return BLOCK.pack(p0, p1, p2, p3)
+
+    def _ctr(self, data: bytes, key: bytes, iv: bytes, workers: Optional[int]) -> bytes:
+        key = bytes(key)
+        key_schedule(key)
+        counter = int.from_bytes(iv, 'big')
+        if not workers or workers <= 1 or len(data) <= CTR_SEGMENT_SIZE:
+            return ctr_transform(key, counter, bytes(data))
+
+        # Segments are independent, each starts at its own counter value
+        jobs = [(key, counter + start // 16, bytes(data[start:start + CTR_SEGMENT_SIZE]))
+                for start in range(0, len(data), CTR_SEGMENT_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return b"".join(executor.map(_ctr_segment, jobs))
+
+    def encrypt_stream(self, source: BinaryIO, destination: BinaryIO, key: bytes,
+                       mode: str = "cbc", chunk_size: int = DEFAULT_CHUNK_SIZE):
+        iv = os.urandom(16)
+        destination.write(iv)
+        self._stream(source, destination, key, iv, mode, chunk_size, encrypt=True)
+
+    def decrypt_stream(self, source: BinaryIO, destination: BinaryIO, key: bytes,
+                       mode: str = "cbc", chunk_size: int = DEFAULT_CHUNK_SIZE):
+        iv = source.read(16)
+        if len(iv) != 16:
+            raise ValueError("Ciphertext is missing its IV")
+        self._stream(source, destination, key, iv, mode, chunk_size, encrypt=False)
+
+    def _stream(self, source: BinaryIO, destination: BinaryIO, key: bytes, iv: bytes,
+                mode: str, chunk_size: int, encrypt: bool):
+        if mode not in ("cbc", "ctr"):
+            raise ValueError(f"Unknown cipher mode: {mode}")
+        chunk_size = max(16, chunk_size - chunk_size % 16)
+        counter = int.from_bytes(iv, 'big')
+        pending = b""
+
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            data = pending + chunk
+            if mode == "ctr":
+                usable = len(data) - len(data) % 16
+                destination.write(ctr_transform(bytes(key), counter, data[:usable]))
+                counter += usable // 16
+                pending = data[usable:]
+                continue
+
+            # Decryption holds back the final block so its padding can be removed
+            usable = len(data) - len(data) % 16
+            if not encrypt and usable == len(data):
+                usable -= 16
+            block, pending = data[:usable], data[usable:]
+            if block:
+                output = bytearray(len(block))
+                if encrypt:
+                    iv = self._cbc_encrypt(block, key, iv, output, 0)
+                else:
+                    iv = self._cbc_decrypt(block, key, iv, output)
+                destination.write(output)
+
+        if mode == "ctr":
+            destination.write(ctr_transform(bytes(key), counter, pending))
+            return
+        output = bytearray(16)
+        if encrypt:
+            self._cbc_encrypt(self.aes.pad(pending), key, iv, output, 0)
+            destination.write(output)
+        else:
+            if len(pending) != 16:
+                raise ValueError("Ciphertext length is not a multiple of the block size")
+            self._cbc_decrypt(pending, key, iv, output)
+            destination.write(self.aes.unpad(bytes(output)))
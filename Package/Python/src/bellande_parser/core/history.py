@@ -0,0 +1,267 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from bisect import bisect_left, bisect_right, insort
+import copy
+import hashlib
+import marshal
+from .numeric import NumpyArray
+
+Path = Tuple[Union[str, int], ...]
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __reduce__(self) -> str:
+        return "MISSING"
+
+    def __deepcopy__(self, memo: Dict) -> '_Missing':
+        return self
+
+# Marks a key or list item that does not exist on one side of a change
+MISSING = _Missing()
+
+# (path, old, new), applied in order to go forward and in reverse with old to go back
+Change = Tuple[Path, Any, Any]
+
+DEFAULT_SNAPSHOT_INTERVAL = 32
+
+def same_value(old: Any, new: Any) -> bool:
+    if old.__class__ is not new.__class__:
+        return False
+    if isinstance(old, NumpyArray):
+        return old.dtype == new.dtype and old.shape == new.shape and bool((old == new).all())
+    if hasattr(old, "typecode") and old.typecode != new.typecode:
+        return False
+    return old == new
+
+def same_tree(old: Any, new: Any) -> bool:
+    # Strict subtree equality in C, == alone takes 1, 1.0 and True for the same value, marshal does not.
+    # Subtrees marshal cannot write (arrays, custom types) or with keys in another order compare unequal
+    # here and are diffed item by item
+    if old is new:
+        return True
+    if old.__class__ is dict or old.__class__ is list:
+        if old.__class__ is not new.__class__:
+            return False
+        try:
+            return marshal.dumps(old) == marshal.dumps(new)
+        except ValueError:
+            return False
+    return same_value(old, new)
+
+def diff_values(old: Any, new: Any, path: Path = ()) -> List[Change]:
+    if old is new:
+        return []
+    if old.__class__ is dict and new.__class__ is dict:
+        changes = []
+        removed = 0
+        for key, value in old.items():
+            new_value = new.get(key, MISSING)
+            if new_value is MISSING:
+                changes.append((path + (key,), value, MISSING))
+                removed += 1
+            elif not same_tree(value, new_value):
+                # Equal subtrees are skipped by one C level comparison
+                changes.extend(diff_values(value, new_value, path + (key,)))
+        if len(new) != len(old) - removed:
+            changes.extend((path + (key,), MISSING, value) for key, value in new.items() if key not in old)
+        return changes
+    if old.__class__ is list and new.__class__ is list:
+        common = min(len(old), len(new))
+        changes = []
+        for index in range(common):
+            if not same_tree(old[index], new[index]):
+                changes.extend(diff_values(old[index], new[index], path + (index,)))
+        changes.extend((path + (index,), MISSING, new[index]) for index in range(common, len(new)))
+        # Removed items last to first, every removal takes the current last item
+        changes.extend((path + (index,), old[index], MISSING) for index in range(len(old) - 1, common - 1, -1))
+        return changes
+    if not same_value(old, new):
+        return [(path, old, new)]
+    return []
+
+def apply_changes(value: Any, changes: Sequence[Change], reverse: bool = False) -> Any:
+    # Edits value in place (a root change replaces it), targets are copied so the changes stay untouched
+    for path, old, new in (reversed(changes) if reverse else changes):
+        target = old if reverse else new
+        if not path:
+            value = copy.deepcopy(target)
+            continue
+        container = value
+        for segment in path[:-1]:
+            container = container[segment]
+        slot = path[-1]
+        if target is MISSING:
+            if container.__class__ is dict:
+                del container[slot]
+            else:
+                container.pop(slot)
+        elif container.__class__ is list and slot == len(container):
+            container.append(copy.deepcopy(target))
+        else:
+            container[slot] = copy.deepcopy(target)
+    return value
+
+def leaf_digest(value: Any) -> bytes:
+    if hasattr(value, "tolist"):
+        # Typed arrays and tables, their repr does not always show every value
+        element = getattr(value, "typecode", getattr(value, "dtype", ""))
+        text = f"{value.__class__.__name__}:{element}:{value.tolist()!r}"
+    else:
+        text = f"{value.__class__.__name__}:{value!r}"
+    return hashlib.sha256(b'V' + text.encode('utf-8', 'surrogatepass')).digest()
+
+def key_bytes(key: Union[str, int]) -> bytes:
+    return repr(key).encode('utf-8', 'surrogatepass')
+
+class MerkleNode:
+    # Containers hash their children's digests in order, dicts by sorted key so equal dicts hash the
+    # same whatever their key order. A changed child only rehashes the containers on its path
+    __slots__ = ("digest", "children", "order", "kind")
+
+    def __init__(self, value: Any):
+        if value.__class__ is dict:
+            self.kind = b'D'
+            self.children = {key: MerkleNode(child) for key, child in value.items()}
+            # (encoded key, key) sorted, kept in order as keys come and go
+            self.order = sorted((key_bytes(key), key) for key in self.children)
+            self.rehash()
+        elif value.__class__ is list:
+            self.kind = b'L'
+            self.children = [MerkleNode(child) for child in value]
+            self.order = None
+            self.rehash()
+        else:
+            self.kind = None
+            self.children = None
+            self.order = None
+            self.digest = leaf_digest(value)
+
+    def rehash(self):
+        header = self.kind + len(self.children).to_bytes(8, 'big')
+        if self.kind == b'D':
+            children = self.children
+            body = b''.join(len(encoded).to_bytes(4, 'big') + encoded + children[key].digest
+                            for encoded, key in self.order)
+        else:
+            body = b''.join(node.digest for node in self.children)
+        self.digest = hashlib.sha256(header + body).digest()
+
+    def set_child(self, key: Union[str, int], node: 'MerkleNode'):
+        if self.kind == b'D':
+            if key not in self.children:
+                insort(self.order, (key_bytes(key), key))
+            self.children[key] = node
+        elif key == len(self.children):
+            self.children.append(node)
+        else:
+            self.children[key] = node
+
+    def remove_child(self, key: Union[str, int]):
+        if self.kind == b'D':
+            del self.children[key]
+            del self.order[bisect_left(self.order, (key_bytes(key),))]
+        else:
+            self.children.pop(key)
+
+class MerkleTree:
+    def __init__(self, value: Any):
+        self.root = MerkleNode(value)
+
+    def hexdigest(self) -> str:
+        return self.root.digest.hex()
+
+    def apply(self, changes: Sequence[Change]):
+        # Only the nodes along each changed path are rehashed
+        for path, _, new in changes:
+            if not path:
+                self.root = MerkleNode(new)
+                continue
+            nodes = [self.root]
+            for segment in path[:-1]:
+                nodes.append(nodes[-1].children[segment])
+            if new is MISSING:
+                nodes[-1].remove_child(path[-1])
+            else:
+                nodes[-1].set_child(path[-1], MerkleNode(new))
+            for node in reversed(nodes):
+                node.rehash()
+
+class VersionHistory:
+    # Version entries hold deltas, every snapshot_interval-th version also keeps a full copy.
+    # A version is rebuilt from the nearest snapshot forward or from the current value backward
+    def __init__(self, value: Any, version: int, snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+                 max_versions: Optional[int] = None):
+        if snapshot_interval < 1:
+            raise ValueError("snapshot_interval must be at least 1")
+        self.snapshot_interval = snapshot_interval
+        self.max_versions = max_versions
+        self.entries: List[Any] = []
+        self.snapshots: Dict[int, Any] = {version: copy.deepcopy(value)}
+        self.first_version = version
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.entries)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        return self.entries[index]
+
+    def record(self, entry: Any, value: Any):
+        # entry.changes["delta"] leads from entry.version - 1 to entry.version
+        self.entries.append(entry)
+        if entry.version % self.snapshot_interval == 0:
+            self.snapshots[entry.version] = copy.deepcopy(value)
+        self._compact(entry.version)
+
+    def _compact(self, current: int):
+        # Keeps at least max_versions, older versions go once a snapshot can start the history
+        if self.max_versions is None or current - self.first_version <= self.max_versions + self.snapshot_interval:
+            return
+        start = max((version for version in self.snapshots if current - version >= self.max_versions),
+                    default=self.first_version)
+        if start == self.first_version:
+            return
+        del self.entries[:start - self.first_version]
+        for version in [version for version in self.snapshots if version < start]:
+            del self.snapshots[version]
+        self.first_version = start
+
+    def value_at(self, version: int, current_value: Any, current: int) -> Any:
+        if version == current:
+            return copy.deepcopy(current_value)
+        if not self.first_version <= version < current:
+            raise ValueError(f"Version {version} is not retained")
+        versions = sorted(self.snapshots)
+        base = versions[bisect_right(versions, version) - 1]
+        offset = self.first_version + 1
+        if version - base <= current - version:
+            value = copy.deepcopy(self.snapshots[base])
+            for entry in self.entries[base + 1 - offset:version + 1 - offset]:
+                value = apply_changes(value, entry.changes["delta"])
+        else:
+            value = copy.deepcopy(current_value)
+            for entry in reversed(self.entries[version + 1 - offset:current + 1 - offset]):
+                value = apply_changes(value, entry.changes["delta"], reverse=True)
+        return value
@@ -0,0 +1,197 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from bisect import bisect_right
+from .lexer import Lexer
+from .streaming import StreamingParser
+from .references import ReferenceResolver
+
+Path = Tuple[Union[str, int], ...]
+
+# (first line, end line, replacement lines), end is exclusive and refers to the previous text
+Edit = Tuple[int, int, Sequence[str]]
+
+def changed_paths(old: Any, new: Any, path: Path = ()) -> List[Path]:
+    if old.__class__ is dict and new.__class__ is dict:
+        changes = []
+        for key, value in old.items():
+            if key not in new:
+                changes.append(path + (key,))
+            elif value != new[key]:
+                changes.extend(changed_paths(value, new[key], path + (key,)))
+        changes.extend(path + (key,) for key in new if key not in old)
+        return changes
+    if old != new or old.__class__ is not new.__class__:
+        return [path]
+    return []
+
+class IncrementalDocument:
+    def __init__(self, lexer: Lexer, lines: Iterable[str], resolver: Optional[ReferenceResolver] = None,
+                 parse: Optional[Callable[[List[str]], Any]] = None, splice: bool = True,
+                 splice_lists: bool = True):
+        self.lexer = lexer
+        self.resolver = resolver
+        # The formatter's backend, the lexer with default options when none is given
+        self.parse = parse or (lambda lines: StreamingParser(lexer).parse_tree(lines))
+        # Without splice every edit re-parses the whole document, for backends whose top-level blocks
+        # do not parse independently. Without splice_lists the same holds for a top-level list,
+        # e.g. when numeric lists are typed and the root's type depends on every item
+        self.splice = splice
+        self.splice_lists = splice_lists
+        self.lines: List[str] = list(lines)
+        # Shared reference targets would go stale under a block splice, such documents always re-parse
+        self.has_references = False
+        self.data: Union[Dict, List] = {}
+        # Line numbers where a top-level entry starts, each block runs to the next start
+        self.starts: List[int] = []
+        self.root: Optional[Tuple[int, int]] = None
+        self._full_parse(self.lines)
+
+    def update(self, content: Union[str, Sequence[str]]) -> List[Path]:
+        # Diffs against the previous text by common prefix and suffix
+        lines = content.split('\n') if isinstance(content, str) else list(content)
+        old = self.lines
+        limit = min(len(old), len(lines))
+        prefix = 0
+        while prefix < limit and old[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == lines[-1 - suffix]:
+            suffix += 1
+        if prefix == len(old) == len(lines):
+            return []
+        return self.apply_edits([(prefix, len(old) - suffix, lines[prefix:len(lines) - suffix])])
+
+    def apply_edits(self, edits: Iterable[Edit]) -> List[Path]:
+        changes: List[Path] = []
+        # Applied bottom-up so line numbers of the remaining edits stay valid
+        for start, end, replacement in sorted(edits, key=lambda edit: edit[0], reverse=True):
+            if not 0 <= start <= end <= len(self.lines):
+                raise ValueError(f"Invalid edit range {start}-{end}")
+            changes.extend(self._apply(start, end, list(replacement)))
+        return changes
+
+    def _apply(self, start: int, end: int, replacement: List[str]) -> List[Path]:
+        lines = self.lines[:start] + replacement + self.lines[end:]
+        starts = self.starts
+        if not starts or self.root is None or self.has_references or not self.splice:
+            return self._full_parse(lines)
+
+        # Expand the edit to whole top-level blocks, including the block just above an insertion
+        first = max(bisect_right(starts, max(start - 1, 0)) - 1, 0)
+        last = max(bisect_right(starts, max(end - 1, 0)) - 1, first)
+        region_start = 0 if first == 0 else starts[first]
+        old_end = starts[last + 1] if last + 1 < len(starts) else len(self.lines)
+        delta = len(replacement) - (end - start)
+        region_lines = lines[region_start:old_end + delta]
+
+        region_starts = self._scan(region_lines, region_start)
+        if region_starts is None or (not region_starts and first == 0 and last == len(starts) - 1):
+            return self._full_parse(lines)
+        data = self.data
+        deferred = self.lexer.deferred_references
+        try:
+            region = self.parse(region_lines) if region_starts else data.__class__()
+        except ValueError:
+            return self._full_parse(lines)
+        if (region.__class__ is not data.__class__ or len(region) != len(region_starts) or
+                self.lexer.deferred_references != deferred):
+            return self._full_parse(lines)
+
+        if data.__class__ is dict:
+            old_keys = [self._block_key(index) for index in range(first, last + 1)]
+            old_region = {key: data[key] for key in old_keys if key in data}
+            if len(old_region) != len(old_keys) or any(key in data and key not in old_region for key in region):
+                # Duplicate keys across blocks, splicing could drop a value
+                return self._full_parse(lines)
+            changes = changed_paths(old_region, region)
+            if list(region) == old_keys:
+                data.update(region)
+            else:
+                items = list(data.items())
+                before = items[:first]
+                after = items[last + 1:]
+                data.clear()
+                data.update(before)
+                data.update(region)
+                data.update(after)
+        else:
+            old_region = data[first:last + 1]
+            old_length = len(data)
+            data[first:last + 1] = region
+            if len(region) == len(old_region):
+                changes = [(first + index,) for index, (old, new) in enumerate(zip(old_region, region))
+                           if old != new or old.__class__ is not new.__class__]
+            else:
+                # Every item after the edit moved
+                changes = [(index,) for index in range(first, max(old_length, len(data)))]
+
+        self.lines = lines
+        self.starts = starts[:first] + region_starts + [line + delta for line in starts[last + 1:]]
+        return changes
+
+    def _block_key(self, index: int) -> str:
+        token = self.lexer.scan(self.lines[self.starts[index]])
+        return token[2]
+
+    def _scan(self, lines: List[str], offset: int) -> Optional[List[int]]:
+        # Block starts of a region, None when the region does not fit the document root
+        root_indent, root_kind = self.root
+        starts = []
+        scan = self.lexer.scan
+        for number, line in enumerate(lines):
+            token = scan(line)
+            if token is None:
+                continue
+            if token[0] < root_indent or (not starts and (token[0] != root_indent or token[1] != root_kind)):
+                return None
+            if token[0] == root_indent and token[1] == root_kind:
+                starts.append(offset + number)
+        return starts
+
+    def _full_parse(self, lines: List[str]) -> List[Path]:
+        deferred = self.lexer.deferred_references
+        data = self.parse(lines)
+        self.has_references = self.lexer.deferred_references != deferred
+        if self.has_references and self.resolver is not None:
+            data = self.resolver.resolve(data)
+        root = None
+        for line in lines:
+            token = self.lexer.scan(line)
+            if token is not None:
+                root = (token[0], token[1])
+                break
+
+        starts = []
+        if root is not None:
+            for number, line in enumerate(lines):
+                token = self.lexer.scan(line)
+                if token is not None and (token[0], token[1]) == root:
+                    starts.append(number)
+            if len(starts) != len(data):
+                # Repeated keys, blocks no longer map one to one onto entries
+                root = None
+            elif data.__class__ is not dict and (data.__class__ is not list or not self.splice_lists):
+                root = None
+
+        changes = changed_paths(self.data, data) if self.lines is not lines else []
+        self.lines = lines
+        self.data = data
+        self.root = root
+        self.starts = starts
+        return changes
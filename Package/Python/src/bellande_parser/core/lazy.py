@@ -0,0 +1,283 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from collections.abc import Mapping
+from array import array
+import mmap
+import os
+import re
+import struct
+from .lexer import Lexer
+from .streaming import StreamingParser
+from .references import ReferenceResolver
+from .tabular import TABLE_PREFIX
+
+INDEX_VERSION = 2
+
+# magic, version, file size, file mtime_ns, entry count
+INDEX_HEADER = struct.Struct('<4sIQqQ')
+INDEX_MAGIC = b"BLFI"
+ROOT_KEY = -1
+ROOT_ITEM = -2
+TABLE_MARKER = TABLE_PREFIX.encode('ascii')
+
+# Start of the next line indented at most N columns, used to skip list bodies
+OUTDENT_PATTERNS: Dict[int, Any] = {}
+
+def outdent_pattern(indent: int):
+    pattern = OUTDENT_PATTERNS.get(indent)
+    if pattern is None:
+        pattern = OUTDENT_PATTERNS[indent] = re.compile(rb'\n[ \t]{0,%d}[^ \t\r\n#]' % indent)
+    return pattern
+
+Path = Tuple[Union[str, int], ...]
+
+class LazyMapping(Mapping):
+    def __init__(self, document: 'LazyBellandeDocument', path: Path):
+        self.document = document
+        self.path = path
+
+    def __getitem__(self, key: Union[str, int]) -> Any:
+        return self.document.lookup(self.path + (key,))
+
+    def __iter__(self) -> Iterator[Union[str, int]]:
+        return iter(self.document.children.get(self.path, ()))
+
+    def __len__(self) -> int:
+        return len(self.document.children.get(self.path, ()))
+
+    def __contains__(self, key: object) -> bool:
+        return self.path + (key,) in self.document.index
+
+    def materialize(self) -> Any:
+        return self.document.load(self.path)
+
+    def __repr__(self) -> str:
+        return f"LazyMapping({'.'.join(map(str, self.path)) or '<root>'})"
+
+class LazyBellandeDocument(LazyMapping):
+    def __init__(self, file_path: str, lexer: Lexer, sidecar: bool = True, index_path: Optional[str] = None,
+                 resolver: Optional[ReferenceResolver] = None):
+        self.file_path = file_path
+        self.lexer = lexer
+        self.resolver = resolver
+        self.index_path = index_path or f"{file_path}.idx"
+        # path -> (start offset, end offset, indent); a block with children is a mapping
+        self.index: Dict[Path, Tuple[int, int, int]] = {}
+        self.children: Dict[Path, List[Union[str, int]]] = {(): []}
+        self.cache: Dict[Path, Any] = {}
+
+        self.file = open(file_path, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+
+        if not (sidecar and self._load_index()):
+            self._build_index()
+            if sidecar:
+                self.save_index()
+        super().__init__(self, ())
+
+    def __enter__(self) -> 'LazyBellandeDocument':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def lookup(self, path: Path) -> Any:
+        path = tuple(path)
+        if path in self.cache:
+            return self.cache[path]
+        if path not in self.index:
+            raise KeyError('.'.join(map(str, path)))
+        value = LazyMapping(self, path) if self.children.get(path) else self.load(path)
+        self.cache[path] = value
+        return value
+
+    def load(self, path: Path) -> Any:
+        # Parses only the byte range of this block
+        path = tuple(path)
+        deferred = self.lexer.deferred_references
+        if not path:
+            tree = StreamingParser(self.lexer).parse_tree(self._lines(0, len(self.data)))
+        else:
+            start, end, _ = self.index[path]
+            tree = StreamingParser(self.lexer).parse_tree(self._lines(start, end))
+        if self.resolver is not None and self.lexer.deferred_references != deferred:
+            tree = self._resolve(path, tree)
+        if not path:
+            return tree
+        if isinstance(tree, list):
+            return tree[0]
+        return next(iter(tree.values()))
+
+    def _resolve(self, path: Path, tree: Any) -> Any:
+        base_dir = os.path.dirname(os.path.abspath(self.file_path))
+        if not path:
+            return self.resolver.resolve(tree, base_dir)
+        # Targets are looked up through the index, so only the blocks they live in get parsed.
+        # The block is visible while it resolves, references into itself find it there
+        self.cache[path] = tree[0] if isinstance(tree, list) else next(iter(tree.values()))
+        try:
+            return self.resolver.resolve(tree, base_dir, self)
+        except Exception:
+            del self.cache[path]
+            raise
+
+    def _lines(self, start: int, end: int) -> List[str]:
+        return bytes(self.data[start:end]).decode('utf-8').split('\n')
+
+    def _build_index(self):
+        data = self.data
+        size = len(data)
+        # Open blocks as [indent, path, start, opaque], opaque once a list item appears
+        stack: List[list] = []
+        root_items = 0
+        position = 0
+
+        while position < size:
+            newline = data.find(b'\n', position)
+            line_end = size if newline == -1 else newline
+            next_line = line_end + 1
+            line = data[position:line_end]
+            text = line.lstrip()
+            if not text.strip() or text[:1] == b'#':
+                position = next_line
+                continue
+            indent = len(line) - len(text)
+            is_item = text[:1] == b'-' and (len(text.rstrip()) == 1 or text[1:2].isspace() or b':' not in text)
+
+            # An item at a key's indent is a compact list of that key, but closes a sibling item
+            while stack and (stack[-1][0] > indent or (stack[-1][0] == indent and
+                                                       (not is_item or stack[-1][1][-1].__class__ is int))):
+                self._close(stack.pop(), position)
+
+            if is_item:
+                if stack:
+                    stack[-1][3] = True
+                else:
+                    stack.append([indent, (root_items,), position, True])
+                    self.children[()].append(root_items)
+                    self.children[(root_items,)] = []
+                    root_items += 1
+                # Nothing inside a list is indexed, jump to the line that closes it
+                match = outdent_pattern(stack[-1][0]).search(data, line_end)
+                position = size if match is None else match.start() + 1
+                continue
+            elif not stack or not stack[-1][3]:
+                key, sep, value = text.partition(b':')
+                if sep:
+                    parent = stack[-1][1] if stack else ()
+                    path = parent + (key.rstrip().decode('utf-8'),)
+                    self.children.setdefault(parent, []).append(path[-1])
+                    self.children.setdefault(path, [])
+                    # Column blocks of a table are not keys of the value
+                    stack.append([indent, path, position, value.strip().startswith(TABLE_MARKER)])
+            position = next_line
+
+        while stack:
+            self._close(stack.pop(), size)
+
+    def _close(self, frame: list, end: int):
+        self.index[frame[1]] = (frame[2], end, frame[0])
+
+    def save_index(self):
+        # Entries in pre-order as (parent entry, start, end, indent) plus a key table,
+        # parents precede their children so loading is a single pass
+        numbers = array('q')
+        keys: List[str] = []
+        ids: Dict[Path, int] = {}
+        pending = [()]
+        while pending:
+            parent = pending.pop()
+            for key in self.children.get(parent, ()):
+                path = parent + (key,)
+                ids[path] = len(keys)
+                start, end, indent = self.index[path]
+                owner = ids[parent] if parent else (ROOT_ITEM if key.__class__ is int else ROOT_KEY)
+                numbers.extend((owner, start, end, indent))
+                keys.append(str(key))
+                pending.append(path)
+
+        header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.signature[0], self.signature[1], len(keys))
+        # Written beside the index and swapped in, readers never see a partial file
+        temporary = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, 'wb') as file:
+                file.write(header)
+                file.write(numbers.tobytes())
+                file.write('\n'.join(keys).encode('utf-8'))
+            os.replace(temporary, self.index_path)
+        except OSError:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+
+    def _load_index(self) -> bool:
+        # The sidecar is only trusted while the file size and mtime are unchanged
+        try:
+            with open(self.index_path, 'rb') as file:
+                blob = file.read()
+            magic, version, size, mtime, count = INDEX_HEADER.unpack_from(blob)
+        except (OSError, struct.error):
+            return False
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or (size, mtime) != self.signature:
+            return False
+
+        try:
+            self._read_entries(blob, count)
+        except (ValueError, IndexError, KeyError, UnicodeDecodeError):
+            # Truncated or corrupt entries behind a valid header, the caller rebuilds the index
+            self.index = {}
+            self.children = {(): []}
+            return False
+        return True
+
+    def _read_entries(self, blob: bytes, count: int):
+        offset = INDEX_HEADER.size + count * 32
+        numbers = array('q')
+        numbers.frombytes(blob[INDEX_HEADER.size:offset])
+        keys = blob[offset:].decode('utf-8').split('\n') if count else []
+        if len(numbers) != count * 4 or len(keys) != count:
+            raise ValueError("Index entries do not match the header")
+
+        paths: List[Path] = []
+        index = self.index
+        children = self.children
+        records = zip(numbers[0::4], numbers[1::4], numbers[2::4], numbers[3::4], keys)
+        for owner, start, end, indent, key in records:
+            if owner >= 0:
+                parent = paths[owner]
+            elif owner == ROOT_ITEM:
+                parent = ()
+                key = int(key)
+            elif owner == ROOT_KEY:
+                parent = ()
+            else:
+                raise ValueError(f"Invalid index owner: {owner}")
+            path = parent + (key,)
+            paths.append(path)
+            index[path] = (start, end, indent)
+            children[parent].append(key)
+            children[path] = []
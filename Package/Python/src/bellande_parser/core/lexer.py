@@ -0,0 +1,131 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Dict, Optional, Tuple
+import re
+import sys
+from .custom_types import CustomTypeRegistry
+
+KEY = 1
+ITEM = 2
+
+# (indent, kind, key, value, column)
+Token = Tuple[int, int, Optional[str], str, int]
+
+# A list item only opens a mapping when its colon is followed by whitespace,
+# so scalars such as "type:point2d:1,2" or "http://host" stay scalars
+ITEM_KEY_PATTERN = re.compile(r'^([^\s"#:][^:]*?)\s*:(?:\s+(.*))?$')
+
+LITERALS = {'true': True, 'false': False, 'null': None}
+LITERAL_STARTS = frozenset('tTfFnN')
+NUMBER_STARTS = frozenset('-.0123456789')
+
+class Reference:
+    # Placeholder for a ref: value, replaced by its target once the whole document is parsed
+    __slots__ = ("target",)
+
+    def __init__(self, target: str):
+        self.target = target
+
+    def __repr__(self) -> str:
+        return f"Reference({self.target!r})"
+
+class Lexer:
+    def __init__(self, type_registry: CustomTypeRegistry, references: Dict[str, Any]):
+        self.type_registry = type_registry
+        self.references = references
+        # Bumped for every placeholder, a parse only walks its result for them when this moved
+        self.deferred_references = 0
+
+    def scan(self, line: str) -> Optional[Token]:
+        text = line.lstrip()
+        if not text or text[0] == '#':
+            return None
+        indent = len(line) - len(text)
+        text = text.rstrip()
+
+        # Same as scan_text, which this runs once per line, except that like the classic backend
+        # a "-value" line without a key is an item too
+        if text[0] == '-' and (len(text) == 1 or text[1].isspace() or ':' not in text):
+            value = text[1:].lstrip()
+            return (indent, ITEM, None, value, indent + len(text) - len(value))
+
+        key, sep, value = text.partition(':')
+        if not sep:
+            return None
+        return (indent, KEY, sys.intern(key.rstrip()), value.strip(), indent)
+
+    def scan_text(self, text: str, indent: int) -> Optional[Token]:
+        # Reads the rest of an item line, only "- x" nests there so "- -2" stays a number
+        if text[0] == '-' and (len(text) == 1 or text[1].isspace()):
+            value = text[1:].lstrip()
+            return (indent, ITEM, None, value, indent + len(text) - len(value))
+
+        key, sep, value = text.partition(':')
+        if not sep:
+            return None
+        return (indent, KEY, sys.intern(key.rstrip()), value.strip(), indent)
+
+    def split_item(self, value: str) -> Optional[Tuple[str, str]]:
+        if ':' not in value:
+            return None
+        match = ITEM_KEY_PATTERN.match(value)
+        if match is None:
+            return None
+        return sys.intern(match.group(1)), (match.group(2) or "").strip()
+
+    def scalar(self, value: str) -> Any:
+        if not value:
+            return value
+        first = value[0]
+
+        if first == 't' and value.startswith('type:'):
+            type_name, sep, type_value = value[5:].partition(':')
+            deserializer = self.type_registry.deserializer_for(type_name) if sep else None
+            if deserializer is not None:
+                return deserializer(type_value)
+
+        if first in LITERAL_STARTS and len(value) in (4, 5):
+            literal = value.lower()
+            if literal in LITERALS:
+                return LITERALS[literal]
+
+        if first == '"':
+            if value.endswith('"'):
+                return value[1:-1]
+        elif first == 'r' and value.startswith('ref:'):
+            return self.reference(value[4:].strip())
+        elif first in NUMBER_STARTS or first.isdecimal():
+            return parse_number(value)
+
+        return value
+
+    def reference(self, ref_key: str) -> Any:
+        if ref_key in self.references:
+            return self.references[ref_key]
+        self.deferred_references += 1
+        return Reference(ref_key)
+
+def parse_number(value: str) -> Any:
+    # Same grammar as the classic -?\d+ and -?\d*\.\d+ patterns, anything else comes back unchanged
+    body = value[1:] if value[0] == '-' else value
+    if body.isdecimal():
+        return int(value)
+    whole, dot, fraction = body.partition('.')
+    if dot and fraction.isdecimal() and (not whole or whole.isdecimal()):
+        return float(value)
+    return value
@@ -0,0 +1,138 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+import threading
+import time
+
+PARSE_STAGES = ("scan", "value", "custom_type", "reference")
+
+# report -> None, called once per instrumented operation
+MetricsCallback = Callable[[Dict[str, Any]], None]
+
+class ParseProbe:
+    # Accumulates one parse, the scan stage is whatever the value stages leave of the total
+    def __init__(self, known_types: Callable[[str], Any]):
+        self.known_types = known_types
+        self.seconds = {stage: 0.0 for stage in PARSE_STAGES}
+        self.custom_types: Dict[str, int] = {}
+        self.references = 0
+        self.values = 0
+        self.lines = 0
+        self.bytes = 0
+
+    def count_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        for line in lines:
+            self.lines += 1
+            self.bytes += (len(line) if line.isascii() else len(line.encode('utf-8'))) + 1
+            yield line
+
+    def wrap_value(self, function: Callable[[str], Any]) -> Callable[[str], Any]:
+        clock = time.perf_counter
+        seconds = self.seconds
+
+        def timed(value: str) -> Any:
+            start = clock()
+            result = function(value)
+            elapsed = clock() - start
+            self.values += 1
+            if value.startswith('ref:'):
+                self.references += 1
+                seconds["reference"] += elapsed
+            elif value.startswith('type:'):
+                type_name = value[5:].partition(':')[0]
+                if self.known_types(type_name) is not None:
+                    self.custom_types[type_name] = self.custom_types.get(type_name, 0) + 1
+                    seconds["custom_type"] += elapsed
+                else:
+                    seconds["value"] += elapsed
+            else:
+                seconds["value"] += elapsed
+            return result
+
+        return timed
+
+    def report(self, operation: str, backend: str, total: float) -> Dict[str, Any]:
+        stages = dict(self.seconds)
+        stages["scan"] = max(0.0, total - stages["value"] - stages["custom_type"] - stages["reference"])
+        return {"operation": operation, "backend": backend, "seconds": total, "stages": stages,
+                "lines": self.lines, "bytes": self.bytes, "values": self.values,
+                "references": self.references, "custom_types": dict(self.custom_types)}
+
+class MetricsSink:
+    def __init__(self, callback: Optional[MetricsCallback] = None):
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.operations: Dict[str, int] = {}
+        self.operation_seconds: Dict[str, float] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {"lines": 0, "bytes": 0, "values": 0, "references": 0,
+                                         "validation_errors": 0}
+        self.custom_types: Dict[str, int] = {}
+
+    def record(self, report: Dict[str, Any]):
+        operation = report["operation"]
+        with self.lock:
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+            self.operation_seconds[operation] = self.operation_seconds.get(operation, 0.0) + report["seconds"]
+            for stage, seconds in report.get("stages", {}).items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            for name in self.counters:
+                self.counters[name] += report.get(name, 0)
+            for type_name, hits in report.get("custom_types", {}).items():
+                self.custom_types[type_name] = self.custom_types.get(type_name, 0) + hits
+        if self.callback is not None:
+            self.callback(report)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"operations": dict(self.operations), "operation_seconds": dict(self.operation_seconds),
+                    "stage_seconds": dict(self.stage_seconds), "counters": dict(self.counters),
+                    "custom_types": dict(self.custom_types)}
+
+def to_prometheus(snapshot: Dict[str, Any], prefix: str = "bellande") -> str:
+    # Prometheus text exposition format from a metrics snapshot dict
+    lines = []
+
+    def family(name: str, kind: str, help_text: str, samples: Iterable):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{escape(str(val))}"' for key, val in labels.items())
+            lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+    family("operations_total", "counter", "Instrumented operations",
+           (({"operation": name}, count) for name, count in snapshot.get("operations", {}).items()))
+    family("operation_seconds_total", "counter", "Time spent per operation",
+           (({"operation": name}, seconds) for name, seconds in snapshot.get("operation_seconds", {}).items()))
+    family("stage_seconds_total", "counter", "Time spent per parse stage",
+           (({"stage": name}, seconds) for name, seconds in snapshot.get("stage_seconds", {}).items()))
+    for name, value in snapshot.get("counters", {}).items():
+        family(f"{name}_total", "counter", f"Total {name.replace('_', ' ')}", [({}, value)])
+    family("custom_type_hits_total", "counter", "Custom type values decoded",
+           (({"type": name}, hits) for name, hits in snapshot.get("custom_types", {}).items()))
+    for name, value in snapshot.get("cache", {}).items():
+        kind = "gauge" if name in ("entries", "bytes") else "counter"
+        suffix = "" if kind == "gauge" else "_total"
+        family(f"cache_{name}{suffix}", kind, f"Parse cache {name}", [({}, value)])
+    return "\n".join(lines) + "\n"
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
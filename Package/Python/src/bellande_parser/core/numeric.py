@@ -0,0 +1,130 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from array import array
+import re
+import sys
+from .lexer import NUMBER_STARTS
+
+# numpy is optional and imported on first use, it costs more than the rest of the package
+_numpy: Any = None
+
+def load_numpy() -> Any:
+    # The numpy module, None when it is not installed
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+class _NumpyArrayType(type):
+    def __instancecheck__(cls, instance: Any) -> bool:
+        # An ndarray can only exist once something imported numpy
+        numpy = sys.modules.get("numpy")
+        return numpy is not None and isinstance(instance, numpy.ndarray)
+
+class NumpyArray(metaclass=_NumpyArrayType):
+    pass
+
+NUMERIC_LIST_MODES = ("list", "array", "numpy")
+
+# A buffered run is joined with newlines, so one match checks every item
+INT_RUN = re.compile(r'-?\d+(?:\n-?\d+)*')
+FLOAT_RUN = re.compile(r'-?\d*\.\d+(?:\n-?\d*\.\d+)*')
+
+TYPECODES = {int: 'q', float: 'd'}
+
+# Typed sequences the emitter and binary encoder treat as lists
+ARRAY_TYPES: Tuple[type, ...] = (array, NumpyArray)
+
+# id(list) -> (element class, length, list) for lists filled by a single homogeneous run. The entry keeps
+# the list alive, a list dropped by a repeated key could otherwise pass its id on to a new one
+KnownLists = Dict[int, Tuple[type, int, List]]
+
+def check_mode(mode: str):
+    if mode not in NUMERIC_LIST_MODES:
+        raise ValueError(f"Unknown numeric_lists mode {mode}, expected one of {', '.join(NUMERIC_LIST_MODES)}")
+    if mode == "numpy" and load_numpy() is None:
+        raise ValueError("numeric_lists='numpy' requires numpy")
+
+def is_number_start(value: str) -> bool:
+    # Cheap filter for list items worth buffering, "- x" style nested items never pass
+    first = value[:1]
+    if first == '-':
+        return len(value) > 1 and not value[1].isspace()
+    return first in NUMBER_STARTS or first.isdecimal()
+
+def decode_numbers(values: List[str], fallback: Callable[[str], Any]) -> Tuple[List, Optional[type]]:
+    joined = '\n'.join(values)
+    if INT_RUN.fullmatch(joined):
+        return list(map(int, values)), int
+    if FLOAT_RUN.fullmatch(joined):
+        return list(map(float, values)), float
+    # Mixed or non-numeric runs decode item by item, exactly as without buffering
+    return [fallback(value) for value in values], None
+
+def list_kind(items: List, known: Optional[KnownLists] = None) -> Optional[type]:
+    if known is not None:
+        entry = known.get(id(items))
+        if entry is not None and entry[1] == len(items):
+            return entry[0]
+    if not items:
+        return None
+    kind = items[0].__class__
+    if kind is not int and kind is not float:
+        return None
+    for item in items:
+        if item.__class__ is not kind:
+            return None
+    return kind
+
+def to_typed(items: List, kind: type, mode: str) -> Any:
+    try:
+        if mode == "numpy":
+            np = load_numpy()
+            return np.array(items, dtype=np.int64 if kind is int else np.float64)
+        return array(TYPECODES[kind], items)
+    except OverflowError:
+        # Integers beyond 64 bits stay a plain list
+        return items
+
+def convert_lists(data: Any, mode: str, known: Optional[KnownLists] = None) -> Any:
+    if mode == "list" or (data.__class__ is not dict and data.__class__ is not list):
+        return data
+    if data.__class__ is list:
+        kind = list_kind(data, known)
+        if kind is not None:
+            return to_typed(data, kind, mode)
+
+    stack: List[Union[Dict, List]] = [data]
+    while stack:
+        container = stack.pop()
+        slots = container.items() if container.__class__ is dict else enumerate(container)
+        for slot, value in slots:
+            if value.__class__ is list:
+                kind = list_kind(value, known)
+                if kind is not None:
+                    container[slot] = to_typed(value, kind, mode)
+                else:
+                    stack.append(value)
+            elif value.__class__ is dict:
+                stack.append(value)
+    return data
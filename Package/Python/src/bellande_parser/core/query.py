@@ -0,0 +1,396 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+from collections.abc import Mapping
+from functools import lru_cache
+import operator
+import re
+from .lexer import KEY, NUMBER_STARTS, Token, parse_number
+from .numeric import ARRAY_TYPES
+from .streaming import StreamEvent, build_tree
+from .tabular import Table
+
+# users[*].name, servers.primary.port, hosts[0], hosts[-1], items[1:3], config.*.port,
+# users[?role == "admin" and age >= 30].name, ["key with spaces"], $ for the root
+SEGMENT = re.compile(r'\s*(?:(\*)|([^.\[\]\s*"\']+))')
+INDEX = re.compile(r'(-?\d+)\]')
+SLICE = re.compile(r'(-?\d*):(-?\d*)(?::(-?\d+))?\]')
+QUOTED_KEY = re.compile(r'(["\'])(.*?)\1\]')
+CONDITION = re.compile(r'\s*(!?)\s*(@(?:\.[^\s=!<>]+)?|[^\s=!<>@]+)\s*(?:(==|!=|<=|>=|<|>)\s*'
+                       r'("[^"]*"|\'[^\']*\'|[^\s]+))?\s*$')
+# Quoted literals are matched first so "and"/"or" inside them never split a filter
+LOGICAL = re.compile(r'"[^"]*"|\'[^\']*\'|\s+(and|or)\s+')
+
+OPERATORS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+             ">": operator.gt, ">=": operator.ge}
+
+SEQUENCE_TYPES = (list, tuple, Table) + ARRAY_TYPES
+
+# ("key", name), ("wildcard",), ("index", n), ("slice", start, stop, step) or ("filter", text, predicate)
+Step = Tuple
+
+Visitor = Callable[[Any, Callable[[Any], None]], None]
+
+_MISSING = object()
+
+def parse_literal(text: str) -> Any:
+    if len(text) > 1 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    if text[:1] in NUMBER_STARTS or text[:1].isdecimal():
+        return parse_number(text)
+    return text
+
+def child(value: Any, key: Any) -> Any:
+    # Child of a mapping, a sequence or a table row, _MISSING when there is none
+    if value.__class__ is dict or isinstance(value, Mapping):
+        return value.get(key, _MISSING)
+    if key.__class__ is int and isinstance(value, SEQUENCE_TYPES):
+        return value[key] if -len(value) <= key < len(value) else _MISSING
+    if hasattr(value, "_fields") and key in value._fields:
+        return getattr(value, key)
+    return _MISSING
+
+def children(value: Any) -> Iterable[Any]:
+    if value.__class__ is dict or isinstance(value, Mapping):
+        return value.values()
+    if isinstance(value, SEQUENCE_TYPES):
+        return value
+    return ()
+
+def compile_condition(text: str) -> Callable[[Any], bool]:
+    match = CONDITION.match(text)
+    if match is None:
+        raise ValueError(f"Invalid filter: {text}")
+    negate, field, op, literal = match.groups()
+    path = tuple(int(key) if key.lstrip('-').isdecimal() else key
+                 for key in field.lstrip('@').lstrip('.').split('.') if key)
+    if op is not None and negate:
+        raise ValueError(f"Invalid filter: {text}")
+
+    def lookup(item: Any) -> Any:
+        for key in path:
+            item = child(item, key)
+            if item is _MISSING:
+                break
+        return item
+
+    if op is None:
+        if negate:
+            return lambda item: not truthy(lookup(item))
+        return lambda item: truthy(lookup(item))
+
+    compare = OPERATORS[op]
+    expected = parse_literal(literal)
+
+    def predicate(item: Any) -> bool:
+        value = lookup(item)
+        if value is _MISSING:
+            return False
+        try:
+            return bool(compare(value, expected))
+        except TypeError:
+            # Values of another type never match an ordering
+            return False
+
+    return predicate
+
+def truthy(value: Any) -> bool:
+    return value is not _MISSING and value is not None and value is not False
+
+def split_logical(text: str, word: str) -> List[str]:
+    parts = []
+    start = 0
+    for match in LOGICAL.finditer(text):
+        if match.group(1) == word:
+            parts.append(text[start:match.start()])
+            start = match.end()
+    parts.append(text[start:])
+    return parts
+
+def all_of(tests: List[Callable[[Any], bool]]) -> Callable[[Any], bool]:
+    if len(tests) == 1:
+        return tests[0]
+    return lambda item: all(test(item) for test in tests)
+
+def compile_filter(text: str) -> Callable[[Any], bool]:
+    # "or" of "and" groups, no parentheses
+    groups = [all_of([compile_condition(part) for part in split_logical(group, "and")])
+              for group in split_logical(text.strip(), "or")]
+    if len(groups) == 1:
+        return groups[0]
+    return lambda item: any(test(item) for test in groups)
+
+def parse_query(expression: str) -> Tuple[Step, ...]:
+    text = expression.strip()
+    if text.startswith('$'):
+        text = text[1:]
+    steps: List[Step] = []
+    position = 0
+    expect_segment = not text.startswith(('[', '.'))
+    while position < len(text):
+        char = text[position]
+        if char == '.' or expect_segment:
+            if char == '.':
+                position += 1
+            match = SEGMENT.match(text, position)
+            if match is None or match.end() == position:
+                raise ValueError(f"Invalid query: {expression}")
+            steps.append(("wildcard",) if match.group(1) else ("key", match.group(2)))
+            position = match.end()
+            expect_segment = False
+        elif char == '[':
+            position += 1
+            if text.startswith('*]', position):
+                steps.append(("wildcard",))
+                position += 2
+            elif text.startswith('?', position):
+                end = closing_bracket(text, position)
+                if end is None:
+                    raise ValueError(f"Invalid query: {expression}")
+                condition = text[position + 1:end]
+                steps.append(("filter", condition.strip(), compile_filter(condition)))
+                position = end + 1
+            else:
+                for pattern in (INDEX, SLICE, QUOTED_KEY):
+                    match = pattern.match(text, position)
+                    if match is not None:
+                        break
+                else:
+                    raise ValueError(f"Invalid query: {expression}")
+                if pattern is INDEX:
+                    steps.append(("index", int(match.group(1))))
+                elif pattern is SLICE:
+                    start, stop, step = (int(group) if group else None for group in match.groups())
+                    if step == 0:
+                        raise ValueError(f"Invalid query: {expression}")
+                    steps.append(("slice", start, stop, step))
+                else:
+                    steps.append(("key", match.group(2)))
+                position = match.end()
+        else:
+            raise ValueError(f"Invalid query: {expression}")
+    return tuple(steps)
+
+def closing_bracket(text: str, start: int) -> Optional[int]:
+    # Index of the ']' closing a filter, brackets inside quoted literals do not count
+    quote = None
+    for index in range(start, len(text)):
+        char = text[index]
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == ']':
+            return index
+    return None
+
+def compile_steps(steps: Tuple[Step, ...]) -> Visitor:
+    # One closure per step, built from the last step back; runs of keys share one closure
+    def emit(value: Any, out: Callable[[Any], None]):
+        out(value)
+
+    visit: Visitor = emit
+    index = len(steps)
+    while index > 0:
+        index -= 1
+        step = steps[index]
+        if step[0] == "key":
+            keys = [step[1]]
+            while index > 0 and steps[index - 1][0] == "key":
+                index -= 1
+                keys.insert(0, steps[index][1])
+            visit = key_visitor(tuple(keys), visit)
+        elif step[0] == "wildcard":
+            visit = wildcard_visitor(visit)
+        elif step[0] == "index":
+            visit = index_visitor(step[1], visit)
+        elif step[0] == "slice":
+            visit = slice_visitor(slice(*step[1:]), visit)
+        else:
+            visit = filter_visitor(step[2], visit)
+    return visit
+
+def key_visitor(keys: Tuple[str, ...], following: Visitor) -> Visitor:
+    if len(keys) == 1:
+        key = keys[0]
+
+        def visit(value: Any, out: Callable[[Any], None]):
+            if value.__class__ is dict:
+                value = value.get(key, _MISSING)
+            else:
+                value = child(value, key)
+            if value is not _MISSING:
+                following(value, out)
+        return visit
+
+    def visit_path(value: Any, out: Callable[[Any], None]):
+        for key in keys:
+            if value.__class__ is dict:
+                value = value.get(key, _MISSING)
+            else:
+                value = child(value, key)
+            if value is _MISSING:
+                return
+        following(value, out)
+    return visit_path
+
+def wildcard_visitor(following: Visitor) -> Visitor:
+    def visit(value: Any, out: Callable[[Any], None]):
+        for item in children(value):
+            following(item, out)
+    return visit
+
+def index_visitor(position: int, following: Visitor) -> Visitor:
+    def visit(value: Any, out: Callable[[Any], None]):
+        if isinstance(value, SEQUENCE_TYPES):
+            if -len(value) <= position < len(value):
+                following(value[position], out)
+    return visit
+
+def slice_visitor(window: slice, following: Visitor) -> Visitor:
+    def visit(value: Any, out: Callable[[Any], None]):
+        if isinstance(value, SEQUENCE_TYPES):
+            for position in range(*window.indices(len(value))):
+                following(value[position], out)
+    return visit
+
+def filter_visitor(predicate: Callable[[Any], bool], following: Visitor) -> Visitor:
+    def visit(value: Any, out: Callable[[Any], None]):
+        for item in children(value):
+            if predicate(item):
+                following(item, out)
+    return visit
+
+class Query:
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.steps = parse_query(expression)
+        self.visit = compile_steps(self.steps)
+        # Entries below the root are matched against the first step, the rest runs on their values
+        self.rest = compile_steps(self.steps[1:])
+        # Leading plain keys, every other key on their way can be skipped unparsed
+        self.prefix: List[str] = []
+        for step in self.steps:
+            if step[0] != "key":
+                break
+            self.prefix.append(step[1])
+
+    def __repr__(self) -> str:
+        return f"Query({self.expression!r})"
+
+    def run(self, data: Any) -> List[Any]:
+        results: List[Any] = []
+        self.visit(data, results.append)
+        return results
+
+    def first(self, data: Any, default: Any = None) -> Any:
+        results = self.run(data)
+        return results[0] if results else default
+
+    def run_events(self, events: Iterable[StreamEvent]) -> Iterator[Any]:
+        # Results of every top-level entry as soon as it is parsed
+        if not self.steps:
+            yield build_tree(events)
+            return
+        step = self.steps[0]
+        if step[0] in ("index", "slice") and not streamable(step):
+            # Negative positions need the length of the root list
+            yield from self.run(build_tree(events))
+            return
+        results: List[Any] = []
+        for event in events:
+            if self.accepts(step, event):
+                self.rest(event.value, results.append)
+                yield from results
+                results.clear()
+
+    def accepts(self, step: Step, event: StreamEvent) -> bool:
+        kind = step[0]
+        if kind == "key":
+            return event.kind == "key" and event.key == step[1]
+        if kind == "wildcard":
+            return True
+        if kind == "filter":
+            return step[2](event.value)
+        if event.kind != "item":
+            return False
+        if kind == "index":
+            return event.key == step[1]
+        start, stop, stride = step[1] or 0, step[2], step[3] or 1
+        return event.key >= start and (stop is None or event.key < stop) and (event.key - start) % stride == 0
+
+    def prune(self, lines: Iterable[str], scan: Callable[[str], Optional[Token]]) -> Iterator[str]:
+        return prune_lines(lines, self.prefix, scan)
+
+def streamable(step: Step) -> bool:
+    if step[0] == "index":
+        return step[1] >= 0
+    return all(bound is None or bound >= 0 for bound in step[1:])
+
+def prune_lines(lines: Iterable[str], prefix: List[str],
+                scan: Callable[[str], Optional[Token]]) -> Iterator[str]:
+    # Keys off the prefix are dropped with their subtree, dropped lines stay as blanks for line numbers.
+    # Anything but a key where the prefix expects one is passed on whole
+    if not prefix:
+        yield from lines
+        return
+    depth = len(prefix)
+    # (indent, open) of the kept keys around the current line, open once pruning stopped there
+    kept: List[Tuple[int, bool]] = []
+    skip = -1
+    for line in lines:
+        if skip >= 0:
+            text = line.lstrip()
+            indent = len(line) - len(text)
+            item = text[:1] == '-' and (len(text) == 1 or text[1].isspace() or ':' not in text)
+            if not text or text[0] == '#' or indent > skip or (indent == skip and item):
+                yield ""
+                continue
+            skip = -1
+        token = scan(line)
+        if token is None:
+            yield line
+            continue
+        indent = token[0]
+        while kept and kept[-1][0] >= indent and not (kept[-1][0] == indent and token[1] != KEY and
+                                                       not kept[-1][1]):
+            kept.pop()
+        if len(kept) >= depth or (kept and kept[-1][1]):
+            yield line
+        elif token[1] != KEY:
+            kept.append((indent, True))
+            yield line
+        elif token[2] == prefix[len(kept)]:
+            kept.append((indent, False))
+            yield line
+        else:
+            skip = indent
+            yield ""
+
+@lru_cache(maxsize=1024)
+def compile_query(expression: str) -> Query:
+    return Query(expression)
+
+def select(data: Any, expression: str) -> List[Any]:
+    return compile_query(expression).run(data)
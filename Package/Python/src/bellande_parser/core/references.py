@@ -0,0 +1,225 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from collections.abc import Mapping
+from functools import lru_cache
+import os
+import re
+import threading
+from .lexer import Reference
+from .numeric import ARRAY_TYPES
+from .tabular import Table
+
+Path = Tuple[Union[str, int], ...]
+
+# "key", ".key" or "[index]", a target is "path", "file#path" or "file#" for a whole file
+PATH_TOKEN = re.compile(r'(\.?)([^.\[\]]+)|\[(-?\d+)\]')
+
+SEQUENCE_TYPES = (list, tuple) + ARRAY_TYPES
+
+_MISSING = object()
+
+def parse_path(text: str) -> Path:
+    path: List[Union[str, int]] = []
+    position = 0
+    while position < len(text):
+        match = PATH_TOKEN.match(text, position)
+        if match is None or (match.group(1) and not path) or (match.group(2) and path and not match.group(1)):
+            raise ValueError(f"Invalid reference path: {text}")
+        path.append(match.group(2) if match.group(2) is not None else int(match.group(3)))
+        position = match.end()
+    return tuple(path)
+
+@lru_cache(maxsize=4096)
+def split_target(target: str) -> Tuple[Optional[str], Path]:
+    file_part, sep, path_part = target.partition('#')
+    if sep and file_part:
+        return file_part, parse_path(path_part)
+    return None, parse_path(target)
+
+def contained_path(base_dir: str, file_part: str, name: str) -> str:
+    # Targets stay inside the referring document's directory, after symlinks are followed
+    base = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(base, file_part))
+    if os.path.commonpath([base, path]) != base:
+        raise ValueError(f"Reference outside {base_dir}: ref:{name}")
+    return path
+
+class Scope:
+    # One document of a resolution, index maps resolved paths to their targets
+    __slots__ = ("key", "root", "base_dir", "index")
+
+    def __init__(self, key: Any, root: Any, base_dir: str):
+        self.key = key
+        self.root = root
+        self.base_dir = base_dir
+        self.index: Dict[Path, Any] = {}
+
+class Resolution:
+    def __init__(self):
+        self.scopes: Dict[Any, Scope] = {}
+        # (document, target) pairs being resolved, in order, for cycle reports
+        self.active: List[Tuple[Any, str]] = []
+
+class ReferenceResolver:
+    def __init__(self, references: Dict[str, Any], load: Callable[[str], Any], file_references: bool = False):
+        # load(file_path) returns the unresolved tree of another document
+        self.references = references
+        self.load = load
+        # Off by default, an untrusted document could otherwise read any file the process can
+        self.file_references = file_references
+        self.documents: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self.lock = threading.RLock()
+        self.local = threading.local()
+
+    def clear(self):
+        with self.lock:
+            self.documents.clear()
+
+    def resolve(self, tree: Any, base_dir: Optional[str] = None, root: Any = None) -> Any:
+        # Replaces the placeholders in tree, targets are looked up from root (tree by default)
+        state = getattr(self.local, "state", None)
+        owner = state is None
+        if owner:
+            state = self.local.state = Resolution()
+        try:
+            root = tree if root is None else root
+            scope = state.scopes.get(id(root))
+            if scope is None:
+                scope = state.scopes[id(root)] = Scope(id(root), root, base_dir or os.getcwd())
+            return self._substitute(state, scope, tree)
+        finally:
+            if owner:
+                self.local.state = None
+
+    def document(self, state: Resolution, file_path: str) -> Scope:
+        file_path = os.path.abspath(file_path)
+        scope = state.scopes.get(file_path)
+        if scope is not None:
+            return scope
+        with self.lock:
+            stat = os.stat(file_path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            entry = self.documents.get(file_path)
+            fresh = entry is None or entry[0] != signature
+            root = self.load(file_path) if fresh else entry[1]
+            scope = state.scopes[file_path] = Scope(file_path, root, os.path.dirname(file_path))
+            if fresh:
+                # Cached before its own references are resolved, so documents can refer to each other
+                self.documents[file_path] = (signature, root)
+                try:
+                    self._substitute(state, scope, root)
+                except Exception:
+                    self.documents.pop(file_path, None)
+                    raise
+            return scope
+
+    def target(self, state: Resolution, scope: Scope, reference: Reference) -> Any:
+        name = reference.target
+        if name in self.references:
+            return self.references[name]
+        file_part, path = split_target(name)
+        if file_part is not None:
+            if not self.file_references:
+                raise ValueError(f"Cross-file references are disabled: ref:{name}")
+            scope = self.document(state, contained_path(scope.base_dir, file_part, name))
+        value = scope.index.get(path, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        marker = (scope.key, path)
+        if any(active[0] == marker for active in state.active):
+            chain = [active[1] for active in state.active] + [name]
+            raise ValueError(f"Circular reference: {' -> '.join(chain)}")
+        state.active.append((marker, name))
+        try:
+            value = self._walk(state, scope, path, name)
+        finally:
+            state.active.pop()
+        scope.index[path] = value
+        return value
+
+    def _walk(self, state: Resolution, scope: Scope, path: Path, name: str) -> Any:
+        current = scope.root
+        for segment in path:
+            if current.__class__ is Reference:
+                current = self.target(state, scope, current)
+            if isinstance(current, Mapping):
+                current = current.get(segment, _MISSING)
+            elif segment.__class__ is int and isinstance(current, SEQUENCE_TYPES):
+                current = current[segment] if -len(current) <= segment < len(current) else _MISSING
+            else:
+                current = _MISSING
+            if current is _MISSING:
+                raise ValueError(f"Reference not found: {name}")
+        if current.__class__ is Reference:
+            current = self.target(state, scope, current)
+        return current
+
+    def _substitute(self, state: Resolution, scope: Scope, tree: Any) -> Any:
+        if tree.__class__ is Reference:
+            return self.target(state, scope, tree)
+        if tree.__class__ is not dict and tree.__class__ is not list:
+            return tree
+
+        # Targets are shared, only the original location of each container is walked
+        targets: Dict[int, str] = {}
+        seen = set()
+        stack = [tree]
+        while stack:
+            container = stack.pop()
+            if id(container) in seen:
+                continue
+            seen.add(id(container))
+            slots = container.items() if container.__class__ is dict else enumerate(container)
+            for slot, value in slots:
+                if value.__class__ is Reference:
+                    resolved = self.target(state, scope, value)
+                    container[slot] = resolved
+                    if resolved.__class__ is dict or resolved.__class__ is list:
+                        targets[id(resolved)] = value.target
+                elif value.__class__ is dict or value.__class__ is list:
+                    stack.append(value)
+                elif value.__class__ is Table:
+                    stack.append(value.columns)
+        if targets:
+            check_cycles(tree, targets)
+        return tree
+
+def check_cycles(tree: Union[Dict, List], targets: Dict[int, str]):
+    # Depth first with an on-path set, every container is finished once however often it is shared
+    on_path = {id(tree)}
+    done = set()
+    stack = [(tree, iter(tree.values() if tree.__class__ is dict else tree))]
+    while stack:
+        container, children = stack[-1]
+        for child in children:
+            if child.__class__ is not dict and child.__class__ is not list:
+                continue
+            if id(child) in on_path:
+                path_targets = [targets[id(frame[0])] for frame in stack if id(frame[0]) in targets]
+                name = targets.get(id(child)) or (path_targets[-1] if path_targets else "?")
+                raise ValueError(f"Circular reference: ref:{name} contains itself")
+            if id(child) not in done:
+                on_path.add(id(child))
+                stack.append((child, iter(child.values() if child.__class__ is dict else child)))
+                break
+        else:
+            stack.pop()
+            on_path.discard(id(container))
+            done.add(id(container))
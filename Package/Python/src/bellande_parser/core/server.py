@@ -0,0 +1,234 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, List, Optional, TextIO
+import io
+import json
+import os
+import socket
+import stat
+import struct
+import threading
+
+# Commands a running server answers, everything else always runs in process
+SERVED_COMMANDS = ("parse", "write", "validate", "query", "diff", "patch", "merge")
+
+# Set to skip the server, e.g. BELLANDE_NO_SERVER=1
+NO_SERVER_ENV = "BELLANDE_NO_SERVER"
+SOCKET_ENV = "BELLANDE_SOCKET"
+
+CONNECT_TIMEOUT = 0.5
+MAX_REQUEST = 16 * 1024 * 1024
+
+# pid, uid, gid of a SO_PEERCRED reply
+PEER_CREDENTIALS = struct.Struct("3i")
+
+RunCommand = Callable[[Any, List[str], TextIO, TextIO], int]
+
+def default_socket_path() -> str:
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    directory = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(directory, f"bellande_format-{os.getuid()}.sock")
+
+def owned_by_user(client: socket.socket) -> bool:
+    # The peer process runs as this user, checked after connect so a replaced socket is caught too
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    credentials = client.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size)
+    return PEER_CREDENTIALS.unpack(credentials)[1] == os.getuid()
+
+def read_message(connection: socket.socket) -> bytes:
+    chunks = []
+    size = 0
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_REQUEST:
+            raise ValueError("Request too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def forward(argv: List[str], stdout: TextIO, stderr: TextIO,
+            socket_path: Optional[str] = None) -> Optional[int]:
+    # Exit code of the command run by the server, None when no server answers
+    if not argv or argv[0] not in SERVED_COMMANDS or os.environ.get(NO_SERVER_ENV):
+        return None
+    socket_path = socket_path or default_socket_path()
+    # Commands and the files they write go to the server, only one run by this user is trusted
+    try:
+        info = os.stat(socket_path)
+    except OSError:
+        return None
+    if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CONNECT_TIMEOUT)
+        try:
+            client.connect(socket_path)
+        except OSError:
+            # Stale socket file or a server that is shutting down
+            return None
+        if not owned_by_user(client):
+            return None
+        client.settimeout(None)
+        client.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode('utf-8'))
+        client.shutdown(socket.SHUT_WR)
+        reply = read_message(client)
+    finally:
+        client.close()
+    if not reply:
+        return None
+    try:
+        response = json.loads(reply)
+        output, errors, exit_code = response["stdout"], response["stderr"], int(response["exit"])
+    except (ValueError, KeyError, TypeError):
+        # Truncated or malformed reply, the caller runs the command in process
+        return None
+    stdout.write(output)
+    stderr.write(errors)
+    return exit_code
+
+class ParseServer:
+    # One warm formatter with a parse cache, requests are (argv, cwd) in and (exit, stdout, stderr) out
+    def __init__(self, formatter: Any, run: RunCommand, socket_path: Optional[str] = None):
+        self.formatter = formatter
+        self.run = run
+        self.socket_path = socket_path or default_socket_path()
+        # The formatter's lexer is not thread safe and commands run in the client's directory,
+        # connections are accepted concurrently but commands run one at a time
+        self.lock = threading.Lock()
+        self.listener: Optional[socket.socket] = None
+        self.requests = 0
+
+    def bind(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                try:
+                    os.unlink(self.socket_path)
+                except OSError as e:
+                    # e.g. a stale socket left by another user in a shared directory
+                    raise RuntimeError(f"Cannot remove stale socket {self.socket_path}: {e.strerror}")
+            else:
+                raise RuntimeError(f"A server is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the owner can connect, requests read and write files as the server's user
+        previous = os.umask(0o177)
+        try:
+            listener.bind(self.socket_path)
+        except OSError as e:
+            listener.close()
+            raise RuntimeError(f"Cannot listen on {self.socket_path}: {e.strerror}")
+        finally:
+            os.umask(previous)
+        listener.listen(64)
+        self.listener = listener
+
+    def serve_forever(self):
+        if self.listener is None:
+            self.bind()
+        try:
+            while True:
+                try:
+                    connection, _ = self.listener.accept()
+                except OSError:
+                    # Listener closed by shutdown()
+                    break
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+        finally:
+            self.close()
+
+    def handle(self, connection: socket.socket):
+        with connection:
+            try:
+                request = json.loads(read_message(connection))
+                argv = [str(argument) for argument in request["argv"]]
+                if not argv or argv[0] not in SERVED_COMMANDS:
+                    raise ValueError(f"Command not served: {argv[0] if argv else ''}")
+                stdout = io.StringIO()
+                stderr = io.StringIO()
+                with self.lock:
+                    self.requests += 1
+                    # Relative paths and messages match a run in the client's directory
+                    os.chdir(request["cwd"])
+                    exit_code = self.run(self.formatter, argv, stdout, stderr)
+                response = {"exit": exit_code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+            except Exception as e:
+                response = {"exit": 1, "stdout": "", "stderr": f"Error: {e}\n"}
+            try:
+                connection.sendall(json.dumps(response).encode('utf-8'))
+            except OSError:
+                pass
+
+    def shutdown(self):
+        # Wakes a blocked accept() in another thread, close alone does not
+        if self.listener is not None:
+            try:
+                self.listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.listener.close()
+
+    def close(self):
+        self.shutdown()
+        self.listener = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+def serve_main(argv: List[str], factory: Callable[..., Any], run: RunCommand) -> int:
+    import argparse
+    import signal
+    import sys
+    parser = argparse.ArgumentParser(prog="bellande_format serve",
+                                     description="Keep a warm parser on a Unix socket for the CLI client")
+    parser.add_argument("--socket", default=None, help=f"socket path (default ${SOCKET_ENV} or per-user)")
+    parser.add_argument("--backend", default="classic")
+    parser.add_argument("--cache-entries", type=int, default=None)
+    parser.add_argument("--file-references", action="store_true", help="resolve ref:file#path targets")
+    args = parser.parse_args(argv)
+
+    formatter = factory(backend=args.backend, file_references=args.file_references)
+    if args.cache_entries is None:
+        formatter.enable_cache()
+    else:
+        formatter.enable_cache(max_entries=args.cache_entries)
+    server = ParseServer(formatter, run, args.socket)
+    try:
+        server.bind()
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"Serving on {server.socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
@@ -0,0 +1,331 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from dataclasses import dataclass
+import codecs
+import os
+from .lexer import Lexer, Token, KEY, ITEM, NUMBER_STARTS
+from .numeric import KnownLists, check_mode, convert_lists, decode_numbers, is_number_start
+from .tabular import build_table, check_tables_mode, table_rows
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+@dataclass
+class StreamEvent:
+    kind: str
+    key: Union[str, int]
+    value: Any
+    line: int
+
+class StreamingParser:
+    def __init__(self, lexer: Lexer, emit: bool = True, numeric_lists: str = "list",
+                 bulk_numbers: bool = True, tables: str = "dicts"):
+        check_mode(numeric_lists)
+        check_tables_mode(tables)
+        self.lexer = lexer
+        self.scalar = lexer.scalar
+        self.emit = emit
+        self.numeric_lists = numeric_lists
+        self.tables_mode = tables
+        # Runs of numeric list items are buffered and decoded together, off when scalar must see every value
+        self.bulk_numbers = bulk_numbers
+        self.reset()
+
+    def reset(self):
+        self.line_num = 0
+        self.entry_line = 0
+        self.index = 0
+        self.root: Union[Dict, List, None] = None
+        self.stack: List[Tuple[int, Union[Dict, List]]] = []
+        self.pending: Optional[tuple] = None
+        self.buffer = ""
+        self.numbers: List[str] = []
+        self.numbers_target: Optional[List] = None
+        self.numbers_indent = 0
+        self.numbers_prefix = ""
+        self.known: Optional[KnownLists] = {} if self.numeric_lists != "list" else None
+        # (parent, slot, columns, rows) of every table block, built once their columns are complete
+        self.tables: List[tuple] = []
+
+    def feed(self, chunk: str) -> Iterator[StreamEvent]:
+        self.buffer += chunk
+        if '\n' not in chunk:
+            return
+        lines = self.buffer.split('\n')
+        self.buffer = lines.pop()
+        yield from self._run(lines)
+
+    def close(self) -> Iterator[StreamEvent]:
+        if self.buffer:
+            line, self.buffer = self.buffer, ""
+            yield from self._run((line,))
+        if self.numbers_target is not None:
+            self._flush_numbers()
+        if self.emit and self.root:
+            yield self._take_entry()
+
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[StreamEvent]:
+        yield from self._run(lines)
+        yield from self.close()
+
+    def parse_tree(self, lines: Iterable[str]) -> Union[Dict, List]:
+        self.emit = False
+        for _ in self._run(lines):
+            pass
+        if self.numbers_target is not None:
+            self._flush_numbers()
+        if self.root is None:
+            return {}
+        if self.tables:
+            self._finish_tables()
+        return convert_lists(self.root, self.numeric_lists, self.known)
+
+    def iter_events(self, source: Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[StreamEvent]:
+        return self.parse_lines(iter_lines(source, chunk_size))
+
+    def _run(self, lines: Iterable[str]) -> Iterator[StreamEvent]:
+        scan = self.lexer.scan
+        handle = self._handle_token
+        try:
+            for line in lines:
+                self.line_num += 1
+                if self.numbers_target is not None and line.startswith(self.numbers_prefix):
+                    # Continuation of a numeric run, taken without going through the lexer
+                    value = line[len(self.numbers_prefix):].strip()
+                    if value and ':' not in value and is_number_start(value):
+                        self.numbers.append(value)
+                        continue
+                token = scan(line)
+                if token is not None:
+                    event = handle(token)
+                    if event is not None:
+                        yield event
+        except Exception as e:
+            raise ValueError(f"Error parsing line {self.line_num}: {str(e)}")
+
+    def _handle_token(self, token: Token) -> Optional[StreamEvent]:
+        indent, kind, key, value, _ = token
+        if self.numbers_target is not None:
+            # Later items of a buffered run stay in the buffer without touching the stack
+            if (kind == ITEM and indent == self.numbers_indent and value and ':' not in value and
+                    ((value[0] in NUMBER_STARTS and (value[0] != '-' or is_number_start(value))) or
+                     value[0].isdecimal())):
+                self.numbers.append(value)
+                return None
+            self._flush_numbers()
+
+        stack = self.stack
+        if self.root is None:
+            self.root = [] if kind == ITEM else {}
+            stack.append((indent, self.root))
+
+        pending = self.pending
+        if pending is not None:
+            self.pending = None
+            if len(pending) > 4:
+                if indent > pending[0]:
+                    if kind == ITEM:
+                        raise ValueError("Table columns must be keys")
+                    columns: Dict = {}
+                    pending[1][pending[2]] = columns
+                    self.tables.append((pending[1], pending[2], columns, pending[4], self.line_num))
+                    stack.append((indent, columns))
+                    self._add_entry(columns, token)
+                    return None
+            elif indent > pending[0] or (kind == ITEM and pending[3] and indent == pending[0]):
+                # First child decides whether an opener holds a list or a mapping
+                container = [] if kind == ITEM else {}
+                pending[1][pending[2]] = container
+                stack.append((indent, container))
+                self._add_entry(container, token)
+                return None
+
+        top_indent, container = stack[-1]
+        if indent != top_indent or (kind == KEY and container.__class__ is list):
+            # A key at the same indent as a list closes that list
+            while len(stack) > 1 and (indent < stack[-1][0] or
+                                      (indent == stack[-1][0] and kind == KEY and
+                                       stack[-1][1].__class__ is list)):
+                stack.pop()
+            top_indent, container = stack[-1]
+            if indent > top_indent:
+                raise ValueError("Unexpected indentation")
+
+        event = None
+        if len(stack) == 1:
+            # Top-level entries own their subtree, so the previous one is complete
+            if self.emit and self.root:
+                event = self._take_entry()
+            self.entry_line = self.line_num
+
+        if kind == KEY and container.__class__ is dict:
+            if value:
+                container[key] = self.scalar(value)
+                if value[0] == 't' and table_rows(value) is not None:
+                    # Stays the plain string when no column block follows
+                    self.pending = (indent, container, key, False, table_rows(value))
+            else:
+                container[key] = []
+                self.pending = (indent, container, key, True)
+        elif (kind == ITEM and container.__class__ is list and value and ':' not in value and
+              (value[0] != '-' or is_number_start(value))):
+            if self.bulk_numbers and is_number_start(value) and not (self.emit and len(stack) == 1):
+                self.numbers_target = container
+                self.numbers_indent = indent
+                self.numbers_prefix = ' ' * indent + '- '
+                self.numbers.append(value)
+            else:
+                container.append(self.scalar(value))
+        else:
+            self._add_entry(container, token)
+        return event
+
+    def _flush_numbers(self):
+        container = self.numbers_target
+        values = self.numbers
+        self.numbers_target = None
+        self.numbers = []
+        items, kind = decode_numbers(values, self.scalar)
+        known = self.known
+        if known is not None and kind is not None:
+            if not container or (len(container) == 1 and container[0].__class__ is kind):
+                known[id(container)] = (kind, len(container) + len(items), container)
+        container.extend(items)
+
+    def _finish_tables(self):
+        # Inner tables first, their rows become cells of the enclosing table's columns
+        tables, self.tables = self.tables, []
+        for parent, slot, columns, rows, line_num in reversed(tables):
+            try:
+                table = build_table(columns, rows, self.tables_mode, self.numeric_lists, self.known)
+            except ValueError as e:
+                raise ValueError(f"Error parsing line {line_num}: {str(e)}")
+            # Unless the key was assigned again later in the document
+            if parent[slot] is columns:
+                parent[slot] = table
+
+    def _take_entry(self) -> StreamEvent:
+        if self.tables:
+            self._finish_tables()
+        root = self.root
+        if root.__class__ is dict:
+            key, value = root.popitem()
+            event = StreamEvent("key", key, value, self.entry_line)
+        else:
+            self.index += 1
+            event = StreamEvent("item", self.index - 1, root.pop(), self.entry_line)
+        if self.known is not None:
+            event.value = convert_lists(event.value, self.numeric_lists, self.known)
+            # Emitted lists can be freed and their ids reused
+            self.known.clear()
+        return event
+
+    def _add_entry(self, container: Union[Dict, List], token: Token):
+        if token[1] == ITEM:
+            if container.__class__ is not list:
+                raise ValueError("List item inside a mapping")
+            container.append(None)
+            self._add_item(container, len(container) - 1, token)
+        else:
+            if container.__class__ is not dict:
+                raise ValueError("Key inside a list")
+            self._add_key(container, token[2], token[3], token[0])
+
+    def _add_key(self, container: Dict, key: str, value: str, indent: int):
+        if value:
+            container[key] = self.scalar(value)
+            if value[0] == 't' and table_rows(value) is not None:
+                self.pending = (indent, container, key, False, table_rows(value))
+        else:
+            container[key] = []
+            self.pending = (indent, container, key, True)
+
+    def _add_item(self, container: Union[Dict, List], slot: Any, token: Token):
+        indent, _, _, value, column = token
+
+        if not value:
+            container[slot] = value
+            self.pending = (indent, container, slot, False)
+            return
+
+        nested = self.lexer.scan_text(value, column) if value[0] == '-' else None
+        if nested is not None and nested[1] == ITEM:
+            items: List = []
+            container[slot] = items
+            self.stack.append((column, items))
+            self._add_entry(items, nested)
+            return
+
+        pair = self.lexer.split_item(value)
+        if pair is None:
+            container[slot] = self.scalar(value)
+            return
+        mapping: Dict = {}
+        container[slot] = mapping
+        self.stack.append((column, mapping))
+        self._add_key(mapping, pair[0], pair[1], column)
+
+def iter_lines(source: Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    # Lines of a path, a text/binary file object or an iterable of chunks, read chunk by chunk
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield from iter_lines(file, chunk_size)
+        return
+
+    if hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = iter(source)
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ""
+    for chunk in chunks:
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = decoder.decode(chunk)
+        if '\n' not in chunk:
+            buffer += chunk
+            continue
+        lines = (buffer + chunk).split('\n')
+        buffer = lines.pop()
+        yield from lines
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield from buffer.split('\n')
+
+def build_tree(events: Iterable[StreamEvent]) -> Union[Dict, List]:
+    result: Union[Dict, List, None] = None
+    for event in events:
+        if event.kind == "item":
+            if result is None:
+                result = []
+            result.append(event.value)
+        else:
+            if result is None:
+                result = {}
+            result[event.key] = event.value
+    return {} if result is None else result
+
+def tree_events(parse: Callable[[Iterable[str]], Any], lines: Iterable[str]) -> Iterator[StreamEvent]:
+    # Top-level entries of a tree parsed in one piece, for backends that cannot stream
+    tree = parse(lines)
+    if isinstance(tree, list):
+        for index, item in enumerate(tree):
+            yield StreamEvent("item", index, item, 0)
+    else:
+        for key, value in tree.items():
+            yield StreamEvent("key", key, value, 0)
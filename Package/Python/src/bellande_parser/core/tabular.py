@@ -0,0 +1,121 @@
+# Copyright (C) 2024 Bellande Architecture Mechanism Research Innovation Center, Ronaldson Bellande
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from collections import namedtuple
+from .numeric import ARRAY_TYPES, KnownLists, convert_lists
+
+# "key: table:<rows>" followed by one list block per column:
+#   users: table:2
+#     name:
+#       - John
+#       - Jane
+#     role:
+#       - admin
+#       - user
+TABLE_PREFIX = "table:"
+
+TABLE_MODES = ("dicts", "table")
+
+# Lists of dicts shorter than this stay in the row form
+DEFAULT_MIN_ROWS = 2
+
+_row_classes: Dict[Tuple[str, ...], type] = {}
+
+def check_tables_mode(mode: str):
+    if mode not in TABLE_MODES:
+        raise ValueError(f"Unknown tables mode {mode}, expected one of {', '.join(TABLE_MODES)}")
+
+def table_rows(value: str) -> Optional[int]:
+    # Row count of a table marker, None for any other value
+    if value[:6] != TABLE_PREFIX or not value[6:].isdecimal():
+        return None
+    return int(value[6:])
+
+def row_class(names: Tuple[str, ...]) -> type:
+    # Rows are namedtuples (__slots__ = ()), names that are not identifiers become _0, _1, ...
+    cls = _row_classes.get(names)
+    if cls is None:
+        cls = _row_classes[names] = namedtuple("Row", names, rename=True)
+    return cls
+
+class Table:
+    # Column-oriented table, each column a list or typed array, rows built on access
+    __slots__ = ("columns", "length")
+
+    def __init__(self, columns: Dict[str, Sequence], length: int):
+        self.columns = columns
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> Any:
+        if not -self.length <= index < self.length:
+            raise IndexError("table row out of range")
+        return row_class(tuple(self.columns))(*[column[index] for column in self.columns.values()])
+
+    def __iter__(self) -> Iterator[Any]:
+        return map(row_class(tuple(self.columns))._make, zip(*self.columns.values()))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Table):
+            return self.tolist() == other.tolist()
+        if isinstance(other, list):
+            return self.tolist() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Table({len(self.columns)} columns, {self.length} rows)"
+
+    def column(self, name: str) -> Sequence:
+        return self.columns[name]
+
+    def tolist(self) -> List[Dict[str, Any]]:
+        names = tuple(self.columns)
+        return [dict(zip(names, values)) for values in zip(*self.columns.values())]
+
+def build_table(columns: Any, rows: int, mode: str, numeric_lists: str = "list",
+                known: Optional[KnownLists] = None) -> Union[List[Dict[str, Any]], Table]:
+    if columns.__class__ is not dict:
+        raise ValueError("Table columns must be keys")
+    for name, column in columns.items():
+        if column.__class__ is not list and not isinstance(column, ARRAY_TYPES):
+            raise ValueError(f"Table column {name} must be a list")
+        if len(column) != rows:
+            raise ValueError(f"Table column {name} has {len(column)} values, expected {rows}")
+    if mode == "table":
+        # Numeric columns become typed arrays under numeric_lists
+        return Table({name: convert_lists(column, numeric_lists, known) for name, column in columns.items()}, rows)
+    names = tuple(columns)
+    # Every row shares the column name strings
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+def table_columns(value: Any, min_rows: int = DEFAULT_MIN_ROWS) -> Optional[List[str]]:
+    # Column names when value is a list of dicts with the same keys, None otherwise
+    if not isinstance(value, list) or len(value) < min_rows:
+        return None
+    first = value[0]
+    if not isinstance(first, dict) or not first:
+        return None
+    keys = first.keys()
+    for item in value:
+        if not isinstance(item, dict) or item.keys() != keys:
+            return None
+    if not all(isinstance(key, str) for key in keys):
+        return None
+    return list(keys)
@@ -16,9 +16,10 @@
 #!/usr/bin/env python3
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union
 from datetime import datetime
-import hashlib
+import copy
+from .history import DEFAULT_SNAPSHOT_INTERVAL, MISSING, Change, MerkleTree, VersionHistory, apply_changes, diff_values, same_value
 
 @dataclass
 class ValidationResult:
@@ -28,6 +29,23 @@ class ValidationResult:
     path: str = ""
     details: Dict[str, Any] = field(default_factory=dict)
 
+@dataclass
+class ValidationStats:
+    total: int = 0
+    valid: int = 0
+    invalid: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    stopped: bool = False
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
 @dataclass
 class VersionInfo:
     version: int
@@ -36,6 +54,14 @@ class VersionInfo:
     changes: Dict[str, Any]
     checksum: str
 
+@dataclass
+class MergeConflict:
+    # Path of the conflicting value, a key or list position that is absent on a side is MISSING
+    path: Tuple[Union[str, int], ...]
+    base: Any
+    ours: Any
+    theirs: Any
+
 @dataclass
 class SchemaDefinition:
     type: str
@@ -48,31 +74,71 @@ class SchemaDefinition:
     format: Optional[str] = None
 
 class BellandeValue:
-    def __init__(self, value: Any, metadata: Dict = None):
+    def __init__(self, value: Any, metadata: Dict = None, snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+                 max_versions: Optional[int] = None):
         self.value = value
         self.metadata = metadata or {}
         self.created_at = datetime.now()
         self.modified_at = self.created_at
         self.version = 1
+        # Private copy of the last committed value, callers may change value in place or share
+        # subtrees with what they pass to update, deltas are always taken against this copy
+        self._committed = copy.deepcopy(value)
+        self.merkle = MerkleTree(self._committed)
         self.checksum = self._calculate_checksum()
-        self.history: List[VersionInfo] = []
+        # Deltas per version with periodic snapshots, max_versions bounds what is kept
+        self.history = VersionHistory(self._committed, self.version, snapshot_interval, max_versions)
 
     def _calculate_checksum(self) -> str:
-        return hashlib.sha256(str(self.value).encode()).hexdigest()
+        return self.merkle.hexdigest()
 
     def update(self, new_value: Any, author: str):
-        old_value = self.value
+        self._commit(new_value, diff_values(self._committed, new_value), author)
+
+    def set(self, path: Sequence[Union[str, int]], new_value: Any, author: str):
+        # Changes one nested value in place, a list index equal to the length appends
+        path = tuple(path)
+        if not path:
+            return self.update(new_value, author)
+        container = self.value
+        committed = self._committed
+        for segment in path[:-1]:
+            container = container[segment]
+            committed = committed[segment]
+        slot = path[-1]
+        if committed.__class__ is list and slot == len(committed):
+            old_value = MISSING
+        else:
+            old_value = committed.get(slot, MISSING) if committed.__class__ is dict else committed[slot]
+        if container.__class__ is list and slot == len(container):
+            container.append(new_value)
+        else:
+            container[slot] = new_value
+        changes = [] if old_value is not MISSING and same_value(old_value, new_value) else \
+            [(path, old_value, new_value)]
+        self._commit(self.value, changes, author)
+
+    def _commit(self, new_value: Any, changes: List[Change], author: str):
         self.value = new_value
+        self._committed = apply_changes(self._committed, changes)
         self.modified_at = datetime.now()
         self.version += 1
+        self.merkle.apply(changes)
         new_checksum = self._calculate_checksum()
-        
+
         version_info = VersionInfo(
             version=self.version,
             timestamp=self.modified_at,
             author=author,
-            changes={"old": old_value, "new": new_value},
+            changes={"delta": copy.deepcopy(changes)},
             checksum=new_checksum
         )
-        self.history.append(version_info)
+        self.history.record(version_info, self._committed)
         self.checksum = new_checksum
+
+    def value_at(self, version: int) -> Any:
+        return self.history.value_at(version, self._committed, self.version)
+
+    def verify_checksum(self) -> bool:
+        # Full rehash, detects in-place changes made without update or set
+        return MerkleTree(self.value).hexdigest() == self.checksum
@@ -15,10 +15,20 @@
 
 #!/usr/bin/env python3
 
-from typing import Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from collections import deque
+from itertools import islice
 import re
+import time
 from decimal import Decimal
-from .types import SchemaDefinition, ValidationResult
+from .types import SchemaDefinition, ValidationResult, ValidationStats
+
+NUMBER_TYPES = (int, float, Decimal)
+
+# check(data) -> bool, collect(data, path, errors) -> None
+Check = Callable[[Any], bool]
+Collect = Callable[[Any, str, List[str]], None]
 
 class Validator:
     def __init__(self):
@@ -32,6 +42,9 @@ class Validator:
             'null': self._validate_null
         }
 
+    def compile(self, schema: SchemaDefinition) -> 'CompiledSchema':
+        return SchemaCompiler().compile(schema)
+
     def validate(self, data: Any, schema: SchemaDefinition, path: str = "") -> ValidationResult:
         if schema.type not in self.type_validators:
             return ValidationResult(False, [f"Unknown type: {schema.type}"], [])
@@ -108,3 +121,286 @@ class Validator:
         if data is not None:
             return ValidationResult(False, [f"{path}: Expected null, got {type(data).__name__}"], [])
         return ValidationResult(True, [], [])
+
+class CompiledSchema:
+    __slots__ = ("schema", "check", "collect")
+
+    def __init__(self, schema: SchemaDefinition):
+        self.schema = schema
+
+    def is_valid(self, data: Any) -> bool:
+        return self.check(data)
+
+    def validate(self, data: Any, path: str = "") -> ValidationResult:
+        # Error paths are only built once the fast check has failed
+        if self.check(data):
+            return ValidationResult(True, [], [])
+        errors: List[str] = []
+        self.collect(data, path, errors)
+        return ValidationResult(not errors, errors, [])
+
+class SchemaCompiler:
+    def __init__(self):
+        self.builders = {
+            'string': self._compile_string,
+            'number': self._compile_number,
+            'integer': self._compile_integer,
+            'boolean': self._compile_boolean,
+            'array': self._compile_array,
+            'object': self._compile_object,
+            'null': self._compile_null
+        }
+
+    def compile(self, schema: SchemaDefinition) -> CompiledSchema:
+        return self._compile(schema, {})
+
+    def _compile(self, schema: SchemaDefinition, memo: Dict[int, CompiledSchema]) -> CompiledSchema:
+        if id(schema) in memo:
+            return memo[id(schema)]
+        compiled = CompiledSchema(schema)
+        memo[id(schema)] = compiled
+
+        if schema.type not in self.builders:
+            message = f"Unknown type: {schema.type}"
+            compiled.check = lambda data: False
+            compiled.collect = lambda data, path, errors: errors.append(message)
+        else:
+            compiled.check, compiled.collect = self.builders[schema.type](schema, memo)
+        return compiled
+
+    def _child(self, schema: SchemaDefinition, memo: Dict[int, CompiledSchema]) -> Tuple[Check, Collect]:
+        child = self._compile(schema, memo)
+        if hasattr(child, "check"):
+            return child.check, child.collect
+        # Recursive schema still being compiled, bind late
+        return (lambda data: child.check(data)), (lambda data, path, errors: child.collect(data, path, errors))
+
+    def _enum(self, values: List[Any]):
+        try:
+            return frozenset(values)
+        except TypeError:
+            return tuple(values)
+
+    def _type_error(self, expected: str) -> Collect:
+        def collect(data: Any, path: str, errors: List[str]):
+            errors.append(f"{path}: Expected {expected}, got {type(data).__name__}")
+        return collect
+
+    def _compile_string(self, schema: SchemaDefinition, memo: Dict) -> Tuple[Check, Collect]:
+        match = re.compile(schema.pattern).match if schema.pattern else None
+        enum = self._enum(schema.enum) if schema.enum else None
+        type_error = self._type_error("string")
+
+        def check(data: Any) -> bool:
+            if not isinstance(data, str):
+                return False
+            if match is not None and match(data) is None:
+                return False
+            return enum is None or data in enum
+
+        def collect(data: Any, path: str, errors: List[str]):
+            if not isinstance(data, str):
+                return type_error(data, path, errors)
+            if match is not None and match(data) is None:
+                errors.append(f"{path}: String does not match pattern {schema.pattern}")
+            if enum is not None and data not in enum:
+                errors.append(f"{path}: Value not in enum: {schema.enum}")
+
+        return check, collect
+
+    def _compile_range(self, schema: SchemaDefinition, types: Any, expected: str) -> Tuple[Check, Collect]:
+        minimum, maximum = schema.minimum, schema.maximum
+        type_error = self._type_error(expected)
+
+        def check(data: Any) -> bool:
+            if not isinstance(data, types):
+                return False
+            if minimum is not None and data < minimum:
+                return False
+            return maximum is None or not data > maximum
+
+        def collect(data: Any, path: str, errors: List[str]):
+            if not isinstance(data, types):
+                return type_error(data, path, errors)
+            if minimum is not None and data < minimum:
+                errors.append(f"{path}: Value below minimum: {minimum}")
+            if maximum is not None and data > maximum:
+                errors.append(f"{path}: Value above maximum: {maximum}")
+
+        return check, collect
+
+    def _compile_number(self, schema: SchemaDefinition, memo: Dict) -> Tuple[Check, Collect]:
+        return self._compile_range(schema, NUMBER_TYPES, "number")
+
+    def _compile_integer(self, schema: SchemaDefinition, memo: Dict) -> Tuple[Check, Collect]:
+        return self._compile_range(schema, int, "integer")
+
+    def _compile_exact(self, kind: Any, expected: str) -> Tuple[Check, Collect]:
+        type_error = self._type_error(expected)
+
+        def check(data: Any) -> bool:
+            return isinstance(data, kind)
+
+        def collect(data: Any, path: str, errors: List[str]):
+            if not isinstance(data, kind):
+                type_error(data, path, errors)
+
+        return check, collect
+
+    def _compile_boolean(self, schema: SchemaDefinition, memo: Dict) -> Tuple[Check, Collect]:
+        return self._compile_exact(bool, "boolean")
+
+    def _compile_null(self, schema: SchemaDefinition, memo: Dict) -> Tuple[Check, Collect]:
+        return self._compile_exact(type(None), "null")
+
+    def _compile_array(self, schema: SchemaDefinition, memo: Dict) -> Tuple[Check, Collect]:
+        type_error = self._type_error("array")
+        if 'items' not in schema.properties:
+            return self._compile_exact(list, "array")
+        item_check, item_collect = self._child(schema.properties['items'], memo)
+
+        def check(data: Any) -> bool:
+            if not isinstance(data, list):
+                return False
+            for item in data:
+                if not item_check(item):
+                    return False
+            return True
+
+        def collect(data: Any, path: str, errors: List[str]):
+            if not isinstance(data, list):
+                return type_error(data, path, errors)
+            for i, item in enumerate(data):
+                if not item_check(item):
+                    item_collect(item, f"{path}[{i}]", errors)
+
+        return check, collect
+
+    def _compile_object(self, schema: SchemaDefinition, memo: Dict) -> Tuple[Check, Collect]:
+        type_error = self._type_error("object")
+        required = tuple(schema.required)
+        properties = {key: self._child(prop, memo) for key, prop in schema.properties.items()}
+        checks = {key: pair[0] for key, pair in properties.items()}
+        check_items = tuple(checks.items())
+
+        def check(data: Any) -> bool:
+            if not isinstance(data, dict):
+                return False
+            for key in required:
+                if key not in data:
+                    return False
+            if len(check_items) <= len(data):
+                for key, prop_check in check_items:
+                    if key in data and not prop_check(data[key]):
+                        return False
+            else:
+                for key, value in data.items():
+                    prop_check = checks.get(key)
+                    if prop_check is not None and not prop_check(value):
+                        return False
+            return True
+
+        def collect(data: Any, path: str, errors: List[str]):
+            if not isinstance(data, dict):
+                return type_error(data, path, errors)
+            for key in required:
+                if key not in data:
+                    errors.append(f"{path}: Missing required field: {key}")
+            for key, value in data.items():
+                if key in properties:
+                    prop_check, prop_collect = properties[key]
+                    if not prop_check(value):
+                        prop_collect(value, f"{path}.{key}", errors)
+
+        return check, collect
+
+# Each pool worker compiles the schema once in its initializer
+_worker_schema: Optional[CompiledSchema] = None
+
+def schema_from_dict(definition: Dict[str, Any]) -> SchemaDefinition:
+    # JSON schema style mapping, "items" and nested "properties" become SchemaDefinitions
+    if not isinstance(definition, dict) or 'type' not in definition:
+        raise ValueError("Schema definition must be a mapping with a type")
+    properties = {key: schema_from_dict(value) for key, value in definition.get('properties', {}).items()}
+    if 'items' in definition:
+        properties['items'] = schema_from_dict(definition['items'])
+    return SchemaDefinition(type=definition['type'], properties=properties,
+                            required=list(definition.get('required', [])), pattern=definition.get('pattern'),
+                            enum=definition.get('enum'), minimum=definition.get('minimum'),
+                            maximum=definition.get('maximum'), format=definition.get('format'))
+
+def _init_worker(schema: SchemaDefinition):
+    global _worker_schema
+    _worker_schema = SchemaCompiler().compile(schema)
+
+def _validate_chunk(job: Tuple[int, List[Any]]) -> List[Tuple[int, Optional[ValidationResult]]]:
+    start, records = job
+    return _check_records(_worker_schema, start, records)
+
+def _check_records(compiled: CompiledSchema, start: int,
+                   records: List[Any]) -> List[Tuple[int, Optional[ValidationResult]]]:
+    # Valid records come back as None so only failures are pickled
+    check = compiled.check
+    return [(start + i, None if check(record) else compiled.validate(record))
+            for i, record in enumerate(records)]
+
+def validate_records(records: Iterable[Any], schema: SchemaDefinition, workers: Optional[int] = None,
+                     chunk_size: int = 1000, ordered: bool = True, fail_fast: bool = False,
+                     max_errors: Optional[int] = None, stats: Optional[ValidationStats] = None,
+                     compiled: Optional[CompiledSchema] = None) -> Iterator[Tuple[int, ValidationResult]]:
+    stats = ValidationStats() if stats is None else stats
+    started = time.perf_counter()
+    iterator = iter(records)
+    chunks = iter(lambda: list(islice(iterator, chunk_size)), [])
+    numbered = ((i * chunk_size, chunk) for i, chunk in enumerate(chunks))
+
+    if workers and workers > 1:
+        batches = _pool_batches(numbered, schema, workers, ordered)
+    else:
+        compiled = compiled or SchemaCompiler().compile(schema)
+        batches = (_check_records(compiled, start, chunk) for start, chunk in numbered)
+
+    try:
+        for batch in batches:
+            for index, result in batch:
+                stats.total += 1
+                if result is None:
+                    stats.valid += 1
+                    yield index, ValidationResult(True, [], [])
+                    continue
+                stats.invalid += 1
+                stats.errors += len(result.errors)
+                yield index, result
+                if fail_fast or (max_errors is not None and stats.invalid >= max_errors):
+                    stats.stopped = True
+                    return
+    finally:
+        batches.close()
+        stats.elapsed += time.perf_counter() - started
+
+def _pool_batches(numbered: Iterator[Tuple[int, List[Any]]], schema: SchemaDefinition, workers: int,
+                  ordered: bool) -> Iterator[List[Tuple[int, Optional[ValidationResult]]]]:
+    # Only a bounded number of chunks is in flight, so generators stay lazy
+    limit = workers * 2
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(schema,))
+    try:
+        if ordered:
+            pending = deque()
+            for job in numbered:
+                pending.append(executor.submit(_validate_chunk, job))
+                if len(pending) >= limit:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        else:
+            pending = set()
+            for job in numbered:
+                pending.add(executor.submit(_validate_chunk, job))
+                if len(pending) >= limit:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in as_completed(pending):
+                yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)